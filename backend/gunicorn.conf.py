@@ -73,6 +73,10 @@ def post_fork(server, worker):
     """Called just after a worker has been forked."""
     server.log.info("Worker spawned (pid: %s)", worker.pid)
 
+    # Don't share the master's OpenAI connection pool with the worker
+    from src.services.openai_client_service import openai_client_service
+    openai_client_service.reset()
+
 def worker_abort(worker):
     """Called when a worker receives the SIGABRT signal."""
     worker.log.info("Worker received SIGABRT signal")
@@ -0,0 +1,125 @@
+"""
+Throughput of platform image optimization: the previous inline path on
+request threads against the image process pool.
+
+    python -m src.image_benchmark --images 24 --size 4096x4096 --threads 4
+
+Three runs over the same generated sources (JPEG and PNG, alternating),
+each resized to a random platform spec:
+
+    inline       full-resolution decode, crop, LANCZOS, JPEG on request threads
+    inline-fast  the pool's draft/reduce worker called on request threads
+    pool         the same worker submitted to image_processing_service
+"""
+
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from src.services.image_processing_service import image_processing_service, optimize_image
+
+SPECS = [(1080, 1080), (1080, 1920), (1200, 630), (820, 312), (1200, 627), (1200, 675), (1000, 1500)]
+
+
+def legacy_optimize(source_path: str, output_path: str, width: int, height: int,
+                    fmt: str = 'jpeg', quality: int = 95):
+    """optimize_image_for_platform before the process pool"""
+    with Image.open(source_path) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img_ratio = img.width / img.height
+        target_ratio = width / height
+        if img_ratio > target_ratio:
+            new_width = int(img.height * target_ratio)
+            left = (img.width - new_width) // 2
+            img = img.crop((left, 0, left + new_width, img.height))
+        elif img_ratio < target_ratio:
+            new_height = int(img.width / target_ratio)
+            top = (img.height - new_height) // 2
+            img = img.crop((0, top, img.width, top + new_height))
+        img = img.resize((width, height), Image.Resampling.LANCZOS)
+        img.save(output_path, 'JPEG', quality=quality, optimize=True)
+
+
+def make_sources(directory: str, size, count: int):
+    """Noisy gradients: photographic enough that codecs do real work"""
+    width, height = size
+    base = Image.radial_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 48)
+    image = Image.merge('RGB', (base, noise, Image.linear_gradient('L').resize((width, height))))
+
+    paths = []
+    for index in range(min(count, 2)):
+        extension = 'jpg' if index % 2 == 0 else 'png'
+        path = os.path.join(directory, f"source_{index}.{extension}")
+        if extension == 'jpg':
+            image.save(path, quality=92)
+        else:
+            image.save(path)
+        paths.append(path)
+    return paths
+
+
+def run(label: str, jobs, call):
+    started = time.perf_counter()
+    call(jobs)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} {len(jobs):>5} images  {elapsed:8.2f} s  {len(jobs) / elapsed:8.2f} images/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=24)
+    parser.add_argument('--size', default='4096x4096', help='source WxH')
+    parser.add_argument('--threads', type=int, default=4, help='request threads for the inline runs')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    size = tuple(int(part) for part in args.size.lower().split('x'))
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix='image_benchmark_')
+    try:
+        sources = make_sources(directory, size, args.images)
+        jobs = [(sources[index % len(sources)], rng.choice(SPECS)) for index in range(args.images)]
+
+        def outputs(name):
+            return [(source, os.path.join(directory, f"{name}_{index}.jpg"), spec)
+                    for index, (source, spec) in enumerate(jobs)]
+
+        def on_threads(fn):
+            def call(batch):
+                with ThreadPoolExecutor(max_workers=args.threads) as threads:
+                    list(threads.map(lambda job: fn(job[0], job[1], *job[2], 'jpeg', 95), batch))
+            return call
+
+        def on_pool(batch):
+            futures = [image_processing_service.submit(optimize_image, source, output, *spec, 'jpeg', 95)
+                       for source, output, spec in batch]
+            for future in futures:
+                future.result()
+
+        # Start the workers outside the measurement
+        image_processing_service.run(optimize_image, sources[0], os.path.join(directory, 'warmup.jpg'), 64, 64)
+
+        print(f"{args.images} images from {size[0]}x{size[1]} sources, "
+              f"{args.threads} request threads, {image_processing_service.max_workers} pool workers")
+        baseline = run('inline', outputs('inline'), on_threads(legacy_optimize))
+        run('inline-fast', outputs('fast'), on_threads(optimize_image))
+        pooled = run('pool', outputs('pool'), on_pool)
+        print(f"pool speedup over inline: {baseline / pooled:.2f}x")
+
+        print()
+        for name, entry in image_processing_service.get_stats()['operations'].items():
+            print(f"{name:<28} n={entry['count']:<5} avg={entry['avg_ms']:>9.2f} ms  max={entry['max_ms']:>9.2f} ms")
+    finally:
+        image_processing_service.get_executor().shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
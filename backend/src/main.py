@@ -10,6 +10,8 @@ from src.models.user import db
 from src.routes.user import user_bp
 from src.routes.content import content_bp
 from src.routes.platform import platform_bp
+from src.routes.webhooks import webhooks_bp
+from src.routes.media import media_bp
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -32,6 +34,8 @@ db.init_app(app)
 app.register_blueprint(user_bp, url_prefix='/api/auth')
 app.register_blueprint(content_bp, url_prefix='/api/content')
 app.register_blueprint(platform_bp, url_prefix='/api/platforms')
+app.register_blueprint(webhooks_bp, url_prefix='/api')
+app.register_blueprint(media_bp, url_prefix='/api')
 
 # Only serve the root path for the frontend
 @app.route('/')
@@ -42,8 +46,9 @@ def serve_root():
 # This allows the blueprints to work correctly without interference
 
 if __name__ == '__main__':
-    # Create database tables if they don't exist
+    # Create database tables if they don't exist and add new columns
+    from src.services.database_service import database_service
     with app.app_context():
-        db.create_all()
+        database_service.upgrade_schema()
     # Run the app
     app.run(debug=True, host='0.0.0.0', port=int(os.environ.get('BACKEND_PORT', 3088)))
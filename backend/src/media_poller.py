@@ -0,0 +1,23 @@
+"""
+Dedicated poller for submitted media generations (Runway, Leonardo).
+
+Web workers run a poller thread themselves by default. To poll from a
+single process instead, set MEDIA_POLLER_IN_PROCESS=false for the web tier
+and start:
+
+    python -m src.media_poller
+"""
+
+import logging
+from src.services.media_task_service import media_task_service
+
+
+def main():
+    from src.main import app
+
+    logging.basicConfig(level=logging.INFO)
+    media_task_service.run_forever(app)
+
+
+if __name__ == '__main__':
+    main()
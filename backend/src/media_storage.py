@@ -0,0 +1,42 @@
+"""
+Media blob storage maintenance.
+
+    python -m src.media_storage stats
+    python -m src.media_storage migrate [--batch-size 100]
+
+migrate moves files written before blob storage (absolute storage_path)
+into the configured backend, batch by batch until none are left.
+"""
+
+import json
+import logging
+import argparse
+from src.services.storage_service import storage_service
+
+
+def main():
+    from src.main import app
+
+    parser = argparse.ArgumentParser(description='Media blob storage maintenance')
+    parser.add_argument('command', choices=['stats', 'migrate'])
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with app.app_context():
+        if args.command == 'migrate':
+            totals = {'migrated': 0, 'missing': 0, 'failed': 0}
+            while True:
+                stats = storage_service.migrate_legacy_files(args.batch_size)
+                for key, value in stats.items():
+                    totals[key] += value
+                logging.info(f"Migrated batch: {stats}")
+                if not stats['migrated']:
+                    break
+            print(json.dumps(totals))
+        else:
+            print(json.dumps(storage_service.get_stats()))
+
+
+if __name__ == '__main__':
+    main()
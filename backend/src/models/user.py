@@ -183,6 +183,49 @@ class GeneratedContent(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class GenerationJob(db.Model):
+    __tablename__ = 'generation_jobs'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    project_id = db.Column(db.String(36), db.ForeignKey('content_projects.id'), nullable=False, index=True)
+    user_id = db.Column(db.String(36), nullable=False)
+    job_type = db.Column(db.String(50), default='generate', nullable=False)
+    idempotency_key = db.Column(db.String(255), nullable=True)
+    status = db.Column(db.String(50), default='queued', nullable=False)
+    parameters = db.Column(db.JSON, nullable=False)
+    celery_task_id = db.Column(db.String(255), nullable=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    next_retry_at = db.Column(db.DateTime, nullable=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    # Constraints
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idempotency_key', name='unique_user_idempotency_key'),
+        db.CheckConstraint(job_type.in_(['generate', 'regenerate']), name='valid_job_type'),
+        db.CheckConstraint(status.in_(['queued', 'running', 'retrying', 'succeeded', 'failed']), name='valid_status'),
+    )
+    
+    def to_dict(self):
+        """Convert generation job to dictionary"""
+        return {
+            'id': self.id,
+            'project_id': self.project_id,
+            'job_type': self.job_type,
+            'idempotency_key': self.idempotency_key,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'next_retry_at': self.next_retry_at.isoformat() if self.next_retry_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class ScheduledPost(db.Model):
     __tablename__ = 'scheduled_posts'
     
@@ -231,17 +274,31 @@ class MediaFile(db.Model):
     original_filename = db.Column(db.String(255), nullable=True)
     file_type = db.Column(db.String(50), nullable=False)
     file_size = db.Column(db.BigInteger, nullable=False)
+    # Blob key on the storage_provider backend (local or s3); absolute paths are pre-blob files
     storage_path = db.Column(db.Text, nullable=False)
     storage_provider = db.Column(db.String(50), default='local', nullable=False)
     mime_type = db.Column(db.String(100), nullable=True)
     dimensions = db.Column(db.JSON, nullable=True)  # {width: 1080, height: 1080}
     duration = db.Column(db.Integer, nullable=True)  # for videos in seconds
     file_metadata = db.Column(db.JSON, nullable=True)
+    # SHA-256 of the file and fingerprint of the generation request, for dedup and reuse
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
+    prompt_fingerprint = db.Column(db.String(64), nullable=True, index=True)
+    # Derivative variants point at their source image
+    parent_id = db.Column(db.String(36), db.ForeignKey('media_files.id'), nullable=True, index=True)
+    variant_platform = db.Column(db.String(50), nullable=True)
+    variant_content_type = db.Column(db.String(50), nullable=True)
+    variant_format = db.Column(db.String(10), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
+    # Relationships
+    variants = db.relationship('MediaFile', backref=db.backref('parent', remote_side=[id]), lazy=True)
+    
     # Constraints
     __table_args__ = (
         db.CheckConstraint(file_type.in_(['image', 'video', 'audio']), name='valid_file_type'),
+        db.UniqueConstraint('parent_id', 'variant_platform', 'variant_content_type', 'variant_format',
+                            name='unique_media_variant'),
     )
     
     def to_dict(self):
@@ -258,5 +315,121 @@ class MediaFile(db.Model):
             'dimensions': self.dimensions,
             'duration': self.duration,
             'file_metadata': self.file_metadata,
+            'content_hash': self.content_hash,
+            'prompt_fingerprint': self.prompt_fingerprint,
+            'parent_id': self.parent_id,
+            'variant_platform': self.variant_platform,
+            'variant_content_type': self.variant_content_type,
+            'variant_format': self.variant_format,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class MediaBlob(db.Model):
+    __tablename__ = 'media_blobs'
+    
+    # Content-addressed: one row and one stored object per distinct file
+    content_hash = db.Column(db.String(64), primary_key=True)
+    backend = db.Column(db.String(20), nullable=False)  # local or s3
+    storage_key = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    mime_type = db.Column(db.String(100), nullable=True)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        """Convert media blob to dictionary"""
+        return {
+            'content_hash': self.content_hash,
+            'backend': self.backend,
+            'storage_key': self.storage_key,
+            'size': self.size,
+            'mime_type': self.mime_type,
+            'ref_count': self.ref_count,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+class MediaGenerationTask(db.Model):
+    __tablename__ = 'media_generation_tasks'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.String(36), nullable=True, index=True)
+    provider = db.Column(db.String(50), nullable=False)
+    provider_task_id = db.Column(db.String(255), nullable=False)
+    media_type = db.Column(db.String(20), nullable=False)
+    delivery = db.Column(db.String(20), default='poll', nullable=False)  # poll or webhook
+    status = db.Column(db.String(50), default='pending', nullable=False)
+    parameters = db.Column(db.JSON, nullable=False)
+    output_url = db.Column(db.Text, nullable=True)
+    media_file_id = db.Column(db.String(36), db.ForeignKey('media_files.id'), nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    poll_attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_poll_at = db.Column(db.DateTime, nullable=True, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    # Constraints
+    __table_args__ = (
+        db.UniqueConstraint('provider', 'provider_task_id', name='unique_provider_task'),
+        db.CheckConstraint(media_type.in_(['image', 'video']), name='valid_task_media_type'),
+        db.CheckConstraint(delivery.in_(['poll', 'webhook']), name='valid_task_delivery'),
+        db.CheckConstraint(status.in_(['pending', 'processing', 'succeeded', 'failed', 'timed_out', 'cancelled']),
+                           name='valid_task_status'),
+    )
+    
+    def to_dict(self):
+        """Convert media generation task to dictionary"""
+        return {
+            'id': self.id,
+            'provider': self.provider,
+            'provider_task_id': self.provider_task_id,
+            'media_type': self.media_type,
+            'delivery': self.delivery,
+            'status': self.status,
+            'parameters': self.parameters,
+            'media_file_id': self.media_file_id,
+            'result': self.result,
+            'last_error': self.last_error,
+            'poll_attempts': self.poll_attempts,
+            'next_poll_at': self.next_poll_at.isoformat() if self.next_poll_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class TrendObservation(db.Model):
+    __tablename__ = 'trend_observations'
+    
+    # One row per topic per source per ingestion run; the trend time series
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    topic_key = db.Column(db.String(200), nullable=False)  # normalised topic
+    topic = db.Column(db.String(300), nullable=False)
+    source = db.Column(db.String(20), nullable=False)  # twitter, google, reddit
+    location = db.Column(db.String(50), default='worldwide', nullable=False)
+    category = db.Column(db.String(50), default='general', nullable=False)
+    score = db.Column(db.Float, default=0.0, nullable=False)
+    engagement = db.Column(db.Float, default=0.0, nullable=False)
+    url = db.Column(db.Text, nullable=True)
+    observed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Series per topic, latest runs per location
+    __table_args__ = (
+        db.Index('ix_trend_observations_topic_time', 'topic_key', 'observed_at'),
+        db.Index('ix_trend_observations_location_time', 'location', 'observed_at'),
+    )
+    
+    def to_dict(self):
+        """Convert trend observation to dictionary"""
+        return {
+            'topic': self.topic,
+            'source': self.source,
+            'location': self.location,
+            'category': self.category,
+            'score': self.score,
+            'engagement': self.engagement,
+            'url': self.url,
+            'observed_at': self.observed_at.isoformat() if self.observed_at else None
+        }
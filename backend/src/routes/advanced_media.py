@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, request
 from src.routes.auth import token_required
 from src.services.advanced_media_service import advanced_media_service
+from src.services.media_task_service import media_task_service
 from src.services.security_service import security_service
 import logging
 
@@ -55,14 +56,15 @@ def generate_with_stability(current_user):
             style=style,
             quality=quality,
             aspect_ratio=aspect_ratio,
-            user_id=current_user.id
+            user_id=current_user.id,
+            reuse_existing=bool(data.get('reuse_existing', False))
         )
         
         if result['success']:
             return jsonify({
                 'message': 'Image generated successfully with Stability AI',
                 'result': result
-            }), 201
+            }), 200 if result.get('reused') else 201
         else:
             return jsonify({
                 'error': result.get('error', 'Generation failed'),
@@ -99,8 +101,8 @@ def generate_with_runway(current_user):
         quality = data.get('quality', 'standard')
         reference_image = data.get('reference_image')
         
-        # Generate video
-        result = advanced_media_service.generate_video_with_runway(
+        # Submit video generation; the central poller finishes it
+        result = advanced_media_service.submit_video_with_runway(
             prompt=prompt,
             duration=duration,
             style=style,
@@ -240,19 +242,25 @@ def generate_with_leonardo(current_user):
         style = data.get('style', 'photorealistic')
         model = data.get('model', 'leonardo-vision-xl')
         
-        # Generate image
-        result = advanced_media_service.generate_with_leonardo(
+        # Submit image generation; the central poller finishes it
+        result = advanced_media_service.submit_with_leonardo(
             prompt=prompt,
             style=style,
             model=model,
-            user_id=current_user.id
+            user_id=current_user.id,
+            reuse_existing=bool(data.get('reuse_existing', False))
         )
         
-        if result['success']:
+        if result.get('reused'):
             return jsonify({
-                'message': 'Image generated successfully with Leonardo AI',
+                'message': 'Reused an earlier Leonardo AI image for this prompt',
                 'result': result
-            }), 201
+            }), 200
+        elif result['success']:
+            return jsonify({
+                'message': 'Image generation started with Leonardo AI',
+                'result': result
+            }), 202
         else:
             return jsonify({
                 'error': result.get('error', 'Generation failed')
@@ -262,6 +270,61 @@ def generate_with_leonardo(current_user):
         logging.error(f"Leonardo AI generation failed: {str(e)}")
         return jsonify({'error': 'Failed to generate image with Leonardo AI'}), 500
 
+@advanced_media_bp.route('/advanced-media/tasks', methods=['GET'])
+@token_required
+def list_generation_tasks(current_user):
+    """List the user's submitted media generations"""
+    try:
+        status = request.args.get('status')
+        limit = min(int(request.args.get('limit', 50)), 200)
+        tasks = media_task_service.list_tasks(current_user.id, status=status, limit=limit)
+        
+        return jsonify({
+            'tasks': [task.to_dict() for task in tasks],
+            'total_count': len(tasks)
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Failed to list media tasks: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve generation tasks'}), 500
+
+@advanced_media_bp.route('/advanced-media/tasks/<task_id>', methods=['GET'])
+@token_required
+def get_generation_task(current_user, task_id):
+    """Get status of a submitted media generation"""
+    try:
+        task = media_task_service.get_task(task_id, user_id=current_user.id)
+        
+        if not task:
+            return jsonify({'error': 'Task not found'}), 404
+        
+        response = jsonify(task.to_dict())
+        if task.status not in media_task_service.TERMINAL_STATUSES:
+            # Hint for client polling; the server-side poller does the provider checks
+            response.headers['Retry-After'] = str(int(media_task_service.poll_base_delay * 2))
+        return response, 200
+        
+    except Exception as e:
+        logging.error(f"Failed to get media task: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve generation task'}), 500
+
+@advanced_media_bp.route('/advanced-media/tasks/<task_id>/cancel', methods=['POST'])
+@token_required
+def cancel_generation_task(current_user, task_id):
+    """Stop tracking a submitted media generation"""
+    try:
+        task = media_task_service.get_task(task_id, user_id=current_user.id)
+        
+        if not task:
+            return jsonify({'error': 'Task not found'}), 404
+        
+        task = media_task_service.cancel(task.id)
+        return jsonify(task.to_dict()), 200
+        
+    except Exception as e:
+        logging.error(f"Failed to cancel media task: {str(e)}")
+        return jsonify({'error': 'Failed to cancel generation task'}), 500
+
 @advanced_media_bp.route('/advanced-media/generate/multi-provider', methods=['POST'])
 @token_required
 @security_service.rate_limit_decorator('api_media')
@@ -288,18 +351,28 @@ def generate_multi_provider(current_user):
         providers = data.get('providers', [])
         style = data.get('style', 'photorealistic')
         quality = data.get('quality', 'standard')
+        policy = data.get('policy', 'all_within_deadline')
+        deadline = data.get('deadline')
         
         if media_type not in ['image', 'video']:
             return jsonify({'error': 'Media type must be "image" or "video"'}), 400
         
-        # Generate with multiple providers
+        if policy not in ['all_within_deadline', 'first_success', 'sequential']:
+            return jsonify({'error': 'Policy must be "all_within_deadline", "first_success" or "sequential"'}), 400
+        
+        if deadline is not None and (not isinstance(deadline, (int, float)) or not 0 < deadline <= 600):
+            return jsonify({'error': 'Deadline must be between 0 and 600 seconds'}), 400
+        
+        # Generate with multiple providers in parallel
         result = advanced_media_service.generate_media_multi_provider(
             prompt=prompt,
             media_type=media_type,
             providers=providers,
             style=style,
             quality=quality,
-            user_id=current_user.id
+            user_id=current_user.id,
+            policy=policy,
+            deadline=deadline
         )
         
         if result['success']:
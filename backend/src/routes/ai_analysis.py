@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, request
 from src.routes.auth import token_required
 from src.services.ai_service import ai_content_service, media_generation_service
+from src.services.structured_output_service import structured_output_service
 from src.models.user import GeneratedContent, ContentProject, db
 import uuid
 
@@ -23,7 +24,9 @@ def analyze_content(current_user):
         platform = data['platform']
         
         # Analyze content using AI service
-        analysis = ai_content_service.analyze_content_quality(content, platform)
+        analysis = ai_content_service.analyze_content_quality(
+            content, platform, subscription_tier=current_user.subscription_tier
+        )
         
         return jsonify({
             'analysis': analysis,
@@ -53,7 +56,11 @@ def generate_hashtags(current_user):
         count = data.get('count', 5)
         
         # Generate hashtags using AI service
-        hashtags = ai_content_service.generate_hashtags(content, platform, count)
+        hashtags = ai_content_service.generate_hashtags(
+            content, platform, count,
+            subscription_tier=current_user.subscription_tier,
+            refine=data.get('refine')
+        )
         
         return jsonify({
             'hashtags': hashtags,
@@ -86,7 +93,8 @@ def generate_image_prompt(current_user):
         image_prompt = ai_content_service.generate_image_prompt(
             content_prompt=content,
             platform=platform,
-            style=style
+            style=style,
+            subscription_tier=current_user.subscription_tier
         )
         
         return jsonify({
@@ -144,7 +152,8 @@ def analyze_generated_content(current_user, content_id):
         # Analyze content using AI service
         analysis = ai_content_service.analyze_content_quality(
             content.generated_text, 
-            content.platform
+            content.platform,
+            subscription_tier=current_user.subscription_tier
         )
         
         # Update content with analysis results
@@ -209,28 +218,27 @@ def improve_content(current_user, content_id):
             Geef je antwoord in JSON format met keys: improved_content, improvements, reasoning
             """
             
-            response = ai_content_service.openai_client.chat.completions.create(
-                model="gpt-4",
+            route = ai_content_service.route(
+                'improvement', platform=content.platform, subscription_tier=current_user.subscription_tier
+            )
+            suggestions = structured_output_service.complete(
+                ai_content_service.get_client(current_user.subscription_tier),
+                call_site='improvement',
+                schema=structured_output_service.object_schema({
+                    'improved_content': {'type': 'string'},
+                    'improvements': {'type': 'array', 'items': {'type': 'string'}},
+                    'reasoning': {'type': 'string'}
+                }),
+                cache=False,
+                model=route['model'],
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                max_tokens=800,
+                max_tokens=route['max_tokens'],
                 temperature=0.7
             )
             
-            # Try to parse JSON response
-            import json
-            try:
-                suggestions = json.loads(response.choices[0].message.content)
-            except json.JSONDecodeError:
-                # Fallback if JSON parsing fails
-                suggestions = {
-                    'improved_content': response.choices[0].message.content,
-                    'improvements': ['AI response kon niet worden geparseerd'],
-                    'reasoning': 'Zie improved_content voor suggesties'
-                }
-            
             return jsonify({
                 'content_id': content_id,
                 'original_content': content.generated_text,
@@ -287,28 +295,25 @@ def check_tone(current_user):
         Antwoord in JSON format met keys: tone_match_score, explanation, suggestions
         """
         
-        response = ai_content_service.openai_client.chat.completions.create(
-            model="gpt-4",
+        route = ai_content_service.route('tone_check', subscription_tier=current_user.subscription_tier)
+        tone_analysis = structured_output_service.complete(
+            ai_content_service.get_client(current_user.subscription_tier),
+            call_site='tone_check',
+            schema=structured_output_service.object_schema({
+                'tone_match_score': {'type': 'number'},
+                'explanation': {'type': 'string'},
+                'suggestions': {'type': 'array', 'items': {'type': 'string'}}
+            }),
+            cache=False,
+            model=route['model'],
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            max_tokens=400,
+            max_tokens=route['max_tokens'],
             temperature=0.3
         )
         
-        # Try to parse JSON response
-        import json
-        try:
-            tone_analysis = json.loads(response.choices[0].message.content)
-        except json.JSONDecodeError:
-            # Fallback if JSON parsing fails
-            tone_analysis = {
-                'tone_match_score': 7,
-                'explanation': 'Toon analyse uitgevoerd maar JSON parsing gefaald',
-                'suggestions': ['Controleer de toon handmatig']
-            }
-        
         return jsonify({
             'content': content,
             'intended_tone': intended_tone,
@@ -1,9 +1,17 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from src.models.user import ContentProject, GeneratedContent, db
 from src.routes.auth import token_required
 from src.services.ai_service import ai_content_service, media_generation_service
+from src.services.llm_provider_service import llm_provider_service
+from src.services.generation_executor_service import generation_executor_service
+from src.services.generation_job_service import generation_job_service
+from src.services.media_delivery_service import media_delivery_service
 from datetime import datetime
+from functools import partial
+import json
 import uuid
+import logging
+import queue
 import asyncio
 import threading
 
@@ -43,6 +51,9 @@ PLATFORM_CONFIGS = {
     }
 }
 
+# Models recorded on rows whose generation failed
+FAILED_MODEL_MARKERS = ('error', 'dall-e-3-failed')
+
 def validate_generation_request(data):
     """Validate content generation request"""
     errors = []
@@ -72,183 +83,263 @@ def validate_generation_request(data):
     
     return errors
 
-def generate_content_async(app, project_id, prompt, platforms, content_types, tone, brand_guidelines):
-    """Generate content asynchronously"""
-    with app.app_context():
-        print(f"DEBUG: Starting async generation for project {project_id}")
+def _text_content_row(project_id, prompt, platform, tone, result):
+    """Build the row for a generated text result"""
+    return GeneratedContent(
+        project_id=project_id,
+        platform=platform,
+        content_type='text',
+        generated_text=result['text'],
+        generated_hashtags=result['hashtags'],
+        tone_of_voice=tone or 'neutraal',
+        generation_parameters={
+            'prompt': prompt,
+            'platform': platform,
+            'content_type': 'text',
+            'tone': tone,
+            'batched': result.get('batched', False)
+        },
+        ai_model_used=result.get('model_used', 'gpt-4'),
+        quality_score=0.75
+    )
+
+def _error_content_row(project_id, prompt, platform, content_type, tone, error):
+    """Build the row recorded when generation failed"""
+    return GeneratedContent(
+        project_id=project_id,
+        platform=platform,
+        content_type=content_type,
+        generated_text=f"Error generating content: {str(error)}",
+        generated_hashtags=f"#{platform} #error",
+        tone_of_voice=tone or 'neutraal',
+        generation_parameters={
+            'prompt': prompt,
+            'platform': platform,
+            'content_type': content_type,
+            'error': str(error)
+        },
+        ai_model_used='error',
+        quality_score=0.0
+    )
+
+def _build_generated_content(project_id, prompt, platform, content_type, tone, brand_guidelines, subscription_tier=None):
+    """Generate a single platform/content type combination and build its row"""
+    if content_type == 'text':
+        # Generate text content using AI
+        result = ai_content_service.generate_text_content(
+            prompt=prompt,
+            platform=platform,
+            tone=tone,
+            brand_guidelines=brand_guidelines,
+            subscription_tier=subscription_tier
+        )
+        
+        return _text_content_row(project_id, prompt, platform, tone, result)
+    
+    elif content_type == 'image':
+        # Generate actual image using DALL-E
         try:
+            # Create image prompt
+            image_prompt = ai_content_service.generate_image_prompt(
+                content_prompt=prompt,
+                platform=platform,
+                style=tone,
+                subscription_tier=subscription_tier
+            )
+            
+            # Generate image with DALL-E
+            image_result = media_generation_service.generate_image(
+                prompt=image_prompt,
+                size="1024x1024",
+                quality="standard"
+            )
+            
+            # Download into media storage; served by /api/media/<id> like every other image
             project = ContentProject.query.get(project_id)
-            if not project:
-                return
+            media_file = media_generation_service.save_generated_image(
+                image_url=image_result['image_url'],
+                user_id=project.user_id,
+                metadata={'prompt': image_prompt, 'platform': platform, 'content_type': content_type}
+            )
+            logging.info(f"Image for {platform} stored as {media_file.storage_provider}:{media_file.storage_path} ({media_file.file_size} bytes)")
             
-            project.status = 'generating'
-            db.session.commit()
+            # Signed URL the browser can load without a session; re-signed when read
+            media_url = media_delivery_service.signed_url(media_file) or f"/api/media/{media_file.id}"
             
-            for platform in platforms:
-                platform_config = PLATFORM_CONFIGS[platform]
-                
-                for content_type in content_types:
-                    if content_type in platform_config['supported_content_types']:
-                        try:
-                            if content_type == 'text':
-                                # Generate text content using AI
-                                result = ai_content_service.generate_text_content(
-                                    prompt=prompt,
-                                    platform=platform,
-                                    tone=tone,
-                                    brand_guidelines=brand_guidelines
-                                )
-                                
-                                generated_content = GeneratedContent(
-                                    project_id=project_id,
-                                    platform=platform,
-                                    content_type=content_type,
-                                    generated_text=result['text'],
-                                    generated_hashtags=result['hashtags'],
-                                    tone_of_voice=tone or 'neutraal',
-                                    generation_parameters={
-                                        'prompt': prompt,
-                                        'platform': platform,
-                                        'content_type': content_type,
-                                        'tone': tone
-                                    },
-                                    ai_model_used=result.get('model_used', 'gpt-4'),
-                                    quality_score=0.75
-                                )
-                            
-                            elif content_type == 'image':
-                                # Generate actual image using DALL-E with extensive debugging
-                                print(f"🖼️  DEBUG: Starting image generation for {platform}")
-                                try:
-                                    # Create image prompt
-                                    print(f"🖼️  DEBUG: Creating image prompt for: {prompt}")
-                                    image_prompt = ai_content_service.generate_image_prompt(
-                                        content_prompt=prompt,
-                                        platform=platform,
-                                        style=tone
-                                    )
-                                    print(f"🖼️  DEBUG: Generated image prompt: {image_prompt}")
-                                    
-                                    # Generate image with DALL-E
-                                    print(f"🖼️  DEBUG: Calling DALL-E API...")
-                                    try:
-                                        print(f"🖼️  DEBUG: About to call media_generation_service.generate_image()")
-                                        image_result = media_generation_service.generate_image(
-                                            prompt=image_prompt,
-                                            size="1024x1024",
-                                            quality="standard"
-                                        )
-                                        print(f"🖼️  DEBUG: DALL-E API call completed successfully!")
-                                        print(f"🖼️  DEBUG: DALL-E response: {image_result}")
-                                    except Exception as dalle_error:
-                                        print(f"🖼️  ERROR: DALL-E API call failed: {dalle_error}")
-                                        print(f"🖼️  ERROR: DALL-E error type: {type(dalle_error)}")
-                                        import traceback
-                                        print(f"🖼️  ERROR: DALL-E traceback: {traceback.format_exc()}")
-                                        raise dalle_error
-                                    
-                                    # Create media storage directory if it doesn't exist
-                                    import os
-                                    import uuid
-                                    media_dir = "/opt/socials/media"
-                                    print(f"🖼️  DEBUG: Creating media directory: {media_dir}")
-                                    os.makedirs(media_dir, exist_ok=True)
-                                    print(f"🖼️  DEBUG: Media directory exists: {os.path.exists(media_dir)}")
-                                    
-                                    # Download and save image
-                                    filename = f"{uuid.uuid4()}.png"
-                                    print(f"🖼️  DEBUG: Generated filename: {filename}")
-                                    print(f"🖼️  DEBUG: Downloading image from: {image_result['image_url']}")
-                                    
-                                    local_path = media_generation_service.download_and_save_image(
-                                        image_url=image_result['image_url'],
-                                        filename=filename,
-                                        storage_path=media_dir
-                                    )
-                                    print(f"🖼️  DEBUG: Image saved to: {local_path}")
-                                    print(f"🖼️  DEBUG: File exists after save: {os.path.exists(local_path)}")
-                                    
-                                    if os.path.exists(local_path):
-                                        file_size = os.path.getsize(local_path)
-                                        print(f"🖼️  DEBUG: File size: {file_size} bytes")
-                                    else:
-                                        print(f"🖼️  ERROR: File does not exist after save!")
-                                    
-                                    # Create content with image URL
-                                    media_url = f"/media/{filename}"
-                                    print(f"🖼️  DEBUG: Storing media URL in database: {media_url}")
-                                    
-                                    generated_content = GeneratedContent(
-                                        project_id=project_id,
-                                        platform=platform,
-                                        content_type=content_type,
-                                        generated_text=f"AI-generated image voor {platform}: {prompt}",
-                                        generated_hashtags=f"#{platform} #AIgenerated #image",
-                                        media_urls=[media_url],  # Store relative path
-                                        tone_of_voice=tone or 'neutraal',
-                                        generation_parameters={
-                                            'prompt': prompt,
-                                            'image_prompt': image_prompt,
-                                            'platform': platform,
-                                            'content_type': content_type,
-                                            'tone': tone,
-                                            'local_path': local_path,
-                                            'media_url': media_url
-                                        },
-                                        ai_model_used='dall-e-3',
-                                        quality_score=0.85
-                                    )
-                                    print(f"🖼️  DEBUG: Created GeneratedContent with media_urls: {generated_content.media_urls}")
-                                except Exception as img_error:
-                                    print(f"Image generation failed: {img_error}")
-                                    # Fallback to text description
-                                    generated_content = GeneratedContent(
-                                        project_id=project_id,
-                                        platform=platform,
-                                        content_type=content_type,
-                                        generated_text=f"Image generatie gefaald voor {platform}: {prompt}. Error: {str(img_error)}",
-                                        generated_hashtags=f"#{platform} #error",
-                                        tone_of_voice=tone or 'neutraal',
-                                        generation_parameters={
-                                            'prompt': prompt,
-                                            'platform': platform,
-                                            'content_type': content_type,
-                                            'tone': tone
-                                        },
-                                        ai_model_used='dall-e-3-failed',
-                                        quality_score=0.30
-                                    )
-                            
-                            db.session.add(generated_content)
-                            
-                        except Exception as e:
-                            print(f"Error generating {content_type} for {platform}: {e}")
-                            # Create error content
-                            error_content = GeneratedContent(
-                                project_id=project_id,
-                                platform=platform,
-                                content_type=content_type,
-                                generated_text=f"Error generating content: {str(e)}",
-                                generated_hashtags=f"#{platform} #error",
-                                tone_of_voice=tone or 'neutraal',
-                                generation_parameters={
-                                    'prompt': prompt,
-                                    'platform': platform,
-                                    'content_type': content_type,
-                                    'error': str(e)
-                                },
-                                ai_model_used='error',
-                                quality_score=0.0
-                            )
-                            db.session.add(error_content)
+            generated_content = GeneratedContent(
+                project_id=project_id,
+                platform=platform,
+                content_type=content_type,
+                generated_text=f"AI-generated image voor {platform}: {prompt}",
+                generated_hashtags=f"#{platform} #AIgenerated #image",
+                media_urls=[media_url],
+                tone_of_voice=tone or 'neutraal',
+                generation_parameters={
+                    'prompt': prompt,
+                    'image_prompt': image_prompt,
+                    'platform': platform,
+                    'content_type': content_type,
+                    'tone': tone,
+                    'media_file_id': media_file.id,
+                    'media_url': media_url
+                },
+                ai_model_used='dall-e-3',
+                quality_score=0.85
+            )
+            return generated_content
+        except Exception as img_error:
+            logging.exception(f"Image generation for {platform} failed: {str(img_error)}")
+            # Fallback to text description
+            return GeneratedContent(
+                project_id=project_id,
+                platform=platform,
+                content_type=content_type,
+                generated_text=f"Image generatie gefaald voor {platform}: {prompt}. Error: {str(img_error)}",
+                generated_hashtags=f"#{platform} #error",
+                tone_of_voice=tone or 'neutraal',
+                generation_parameters={
+                    'prompt': prompt,
+                    'platform': platform,
+                    'content_type': content_type,
+                    'tone': tone
+                },
+                ai_model_used='dall-e-3-failed',
+                quality_score=0.30
+            )
+    
+    return None
+
+def _generate_and_store(app, project_id, prompt, platform, content_type, tone, brand_guidelines, subscription_tier=None):
+    """Generate one platform/content type and commit its row as soon as it is done"""
+    with app.app_context():
+        try:
+            generated_content = _build_generated_content(
+                project_id, prompt, platform, content_type, tone, brand_guidelines, subscription_tier
+            )
+            if generated_content is None:
+                return []
             
-            # Update project status
-            project.status = 'ready'
+            db.session.add(generated_content)
             db.session.commit()
+            if generated_content.ai_model_used in FAILED_MODEL_MARKERS:
+                return [(platform, content_type)]
+            return []
             
         except Exception as e:
-            print(f"Error in async content generation: {e}")
+            logging.error(f"Generating {content_type} for {platform} failed: {str(e)}")
+            db.session.rollback()
+            # Create error content
+            db.session.add(_error_content_row(project_id, prompt, platform, content_type, tone, e))
+            db.session.commit()
+            return [(platform, content_type)]
+
+def _generate_text_batch_and_store(app, project_id, prompt, platforms, tone, brand_guidelines, subscription_tier=None):
+    """Generate text for several platforms in one LLM call and store a row per platform"""
+    with app.app_context():
+        results = ai_content_service.generate_text_content_batch(
+            prompt=prompt,
+            platforms=platforms,
+            tone=tone,
+            brand_guidelines=brand_guidelines,
+            subscription_tier=subscription_tier
+        )
+        
+        failed = []
+        for platform in platforms:
+            result = results.get(platform)
+            if isinstance(result, dict):
+                db.session.add(_text_content_row(project_id, prompt, platform, tone, result))
+            else:
+                logging.error(f"Generating text for {platform} failed: {str(result)}")
+                db.session.add(_error_content_row(project_id, prompt, platform, 'text', tone, result))
+                failed.append((platform, 'text'))
+        
+        db.session.commit()
+        return failed
+
+def run_project_generation(app, project_id, prompt, platforms, content_types, tone, brand_guidelines):
+    """Generate all missing content for a project.
+    
+    Rows that already succeeded are kept and failed rows are replaced, so a
+    retried job only redoes the combinations that failed. Returns the list of
+    (platform, content_type) combinations that failed in this run.
+    """
+    with app.app_context():
+        project = ContentProject.query.get(project_id)
+        if not project:
+            return []
+        
+        project.status = 'generating'
+        subscription_tier = llm_provider_service.tier_for_user(project.user_id)
+        
+        completed = set()
+        for content in GeneratedContent.query.filter_by(project_id=project_id).all():
+            if content.ai_model_used in FAILED_MODEL_MARKERS:
+                db.session.delete(content)
+            else:
+                completed.add((content.platform, content.content_type))
+        db.session.commit()
+    
+    # Fan out every supported platform/content type combination on the
+    # shared generation pool; each job commits its own rows when done
+    combinations = [
+        (platform, content_type)
+        for platform in platforms
+        for content_type in content_types
+        if content_type in PLATFORM_CONFIGS[platform]['supported_content_types']
+        and (platform, content_type) not in completed
+    ]
+    
+    # Text for all platforms shares one prompt, so it goes out as one batched call
+    text_platforms = [platform for platform, content_type in combinations if content_type == 'text']
+    batch_text = ai_content_service.batch_text_generation and len(text_platforms) > 1
+    
+    job_combinations = []
+    jobs = []
+    if batch_text:
+        job_combinations.append([(platform, 'text') for platform in text_platforms])
+        jobs.append(partial(_generate_text_batch_and_store, app, project_id, prompt, text_platforms, tone, brand_guidelines, subscription_tier))
+    
+    for platform, content_type in combinations:
+        if batch_text and content_type == 'text':
+            continue
+        job_combinations.append([(platform, content_type)])
+        jobs.append(partial(_generate_and_store, app, project_id, prompt, platform, content_type, tone, brand_guidelines, subscription_tier))
+    
+    results = generation_executor_service.run_all(jobs)
+    
+    failed = []
+    for covered, result in zip(job_combinations, results):
+        # A job that raised counts as failed for everything it covered
+        failed.extend(covered if isinstance(result, Exception) else result)
+    return failed
+
+def finish_project_generation(app, project_id, failed):
+    """Set the final project status after generation"""
+    with app.app_context():
+        project = ContentProject.query.get(project_id)
+        if not project:
+            return
+        
+        has_content = GeneratedContent.query.filter(
+            GeneratedContent.project_id == project_id,
+            GeneratedContent.ai_model_used.notin_(FAILED_MODEL_MARKERS)
+        ).count() > 0
+        
+        project.status = 'ready' if has_content or not failed else 'failed'
+        db.session.commit()
+
+def generate_content_async(app, project_id, prompt, platforms, content_types, tone, brand_guidelines):
+    """Generate content asynchronously"""
+    try:
+        failed = run_project_generation(app, project_id, prompt, platforms, content_types, tone, brand_guidelines)
+        finish_project_generation(app, project_id, failed)
+        
+    except Exception as e:
+        logging.exception(f"Content generation for project {project_id} failed: {str(e)}")
+        with app.app_context():
             try:
+                db.session.rollback()
                 project = ContentProject.query.get(project_id)
                 if project:
                     project.status = 'failed'
@@ -256,6 +347,21 @@ def generate_content_async(app, project_id, prompt, platforms, content_types, to
             except:
                 pass
 
+def _content_dict(content):
+    """Generated content for a response, with freshly signed media URLs"""
+    content_dict = content.to_dict()
+    content_dict['media_urls'] = media_delivery_service.media_urls(content)
+    return content_dict
+
+def _existing_job_response(job):
+    """Response for a replayed generation request"""
+    return jsonify({
+        'project_id': job.project_id,
+        'job_id': job.id,
+        'status': job.status,
+        'message': 'Content generation already started'
+    }), 200
+
 @content_bp.route('/generate', methods=['POST'])
 def generate_content():
     """Generate new content for specified platforms"""
@@ -268,9 +374,17 @@ def generate_content():
         if errors:
             return jsonify({'error': 'Validation failed', 'details': errors}), 400
         
+        # Replay of an earlier request: return the existing job
+        user_id = "demo-user-id"
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        if idempotency_key:
+            existing_job = generation_job_service.find_by_idempotency_key(user_id, idempotency_key)
+            if existing_job:
+                return _existing_job_response(existing_job)
+        
         # Create content project
         project = ContentProject(
-            user_id="demo-user-id",
+            user_id=user_id,
             title=data.get('title', f"Content voor {', '.join(data['platforms'])}"),
             description=data.get('description'),
             original_prompt=data['prompt'].strip(),
@@ -286,19 +400,31 @@ def generate_content():
         tone = data.get('tone')
         brand_guidelines = data.get('brand_guidelines')
         
-        # Start async content generation
+        # Queue durable content generation job. The project commits together with
+        # the job, so a request that loses the race for the idempotency key rolls
+        # its project back and answers with the winner's job
         from flask import current_app
-        thread = threading.Thread(
-            target=generate_content_async,
-            args=(current_app._get_current_object(), project.id, data['prompt'], data['platforms'], content_types, tone, brand_guidelines)
+        job, created = generation_job_service.submit(
+            current_app._get_current_object(),
+            project_id=project.id,
+            user_id=project.user_id,
+            job_type='generate',
+            parameters={
+                'prompt': data['prompt'],
+                'platforms': data['platforms'],
+                'content_types': content_types,
+                'tone': tone,
+                'brand_guidelines': brand_guidelines
+            },
+            idempotency_key=idempotency_key
         )
-        thread.daemon = True
-        thread.start()
-        
-        db.session.commit()
+        if not created:
+            db.session.rollback()
+            return _existing_job_response(job)
         
         return jsonify({
             'project_id': project.id,
+            'job_id': job.id,
             'status': 'draft',
             'estimated_completion': datetime.utcnow().isoformat(),
             'message': 'Content generation started'
@@ -308,6 +434,146 @@ def generate_content():
         db.session.rollback()
         return jsonify({'error': 'Content generation failed', 'details': str(e)}), 500
 
+def _stream_text_and_store(app, project_id, prompt, platform, tone, brand_guidelines, events, subscription_tier=None):
+    """Stream text for one platform into the event queue and store the final row"""
+    with app.app_context():
+        try:
+            result = None
+            for kind, value in ai_content_service.stream_text_content(
+                prompt=prompt,
+                platform=platform,
+                tone=tone,
+                brand_guidelines=brand_guidelines,
+                subscription_tier=subscription_tier
+            ):
+                if kind == 'delta':
+                    events.put(('delta', {'platform': platform, 'content_type': 'text', 'delta': value}))
+                else:
+                    result = value
+            
+            generated_content = _text_content_row(project_id, prompt, platform, tone, result)
+            db.session.add(generated_content)
+            db.session.commit()
+            events.put(('content', {'platform': platform, 'content_type': 'text', 'content': _content_dict(generated_content)}))
+            return []
+            
+        except Exception as e:
+            logging.error(f"Streaming text for {platform} failed: {str(e)}")
+            db.session.rollback()
+            db.session.add(_error_content_row(project_id, prompt, platform, 'text', tone, e))
+            db.session.commit()
+            events.put(('error', {'platform': platform, 'content_type': 'text', 'error': str(e)}))
+            return [(platform, 'text')]
+
+def _generate_store_and_notify(app, project_id, prompt, platform, content_type, tone, brand_guidelines, events,
+                               subscription_tier=None):
+    """Generate non-streamable content and announce the stored row"""
+    failed = _generate_and_store(app, project_id, prompt, platform, content_type, tone, brand_guidelines, subscription_tier)
+    with app.app_context():
+        generated_content = GeneratedContent.query.filter_by(
+            project_id=project_id, platform=platform, content_type=content_type
+        ).order_by(GeneratedContent.created_at.desc()).first()
+        events.put(('error' if failed else 'content', {
+            'platform': platform,
+            'content_type': content_type,
+            'content': _content_dict(generated_content) if generated_content else None
+        }))
+    return failed
+
+def _sse_event(event, data):
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@content_bp.route('/generate/stream', methods=['POST'])
+def generate_content_stream():
+    """Generate content and stream text tokens per platform as Server-Sent Events"""
+    try:
+        data = request.get_json()
+        
+        # Validate request
+        errors = validate_generation_request(data)
+        if errors:
+            return jsonify({'error': 'Validation failed', 'details': errors}), 400
+        
+        # Create content project
+        project = ContentProject(
+            user_id="demo-user-id",
+            title=data.get('title', f"Content voor {', '.join(data['platforms'])}"),
+            description=data.get('description'),
+            original_prompt=data['prompt'].strip(),
+            target_platforms=data['platforms'],
+            brand_guidelines=data.get('brand_guidelines'),
+            status='generating'
+        )
+        db.session.add(project)
+        db.session.commit()
+        subscription_tier = llm_provider_service.tier_for_user(project.user_id)
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Content generation failed', 'details': str(e)}), 500
+    
+    from flask import current_app
+    app = current_app._get_current_object()
+    project_id = project.id
+    prompt = data['prompt']
+    platforms = data['platforms']
+    content_types = data.get('content_types', ['text'])
+    tone = data.get('tone')
+    brand_guidelines = data.get('brand_guidelines')
+    
+    events = queue.Queue()
+    job_combinations = []
+    jobs = []
+    for platform in platforms:
+        for content_type in content_types:
+            if content_type not in PLATFORM_CONFIGS[platform]['supported_content_types']:
+                continue
+            job_combinations.append((platform, content_type))
+            if content_type == 'text':
+                jobs.append(partial(_stream_text_and_store, app, project_id, prompt, platform, tone, brand_guidelines, events, subscription_tier))
+            else:
+                jobs.append(partial(_generate_store_and_notify, app, project_id, prompt, platform, content_type, tone, brand_guidelines, events, subscription_tier))
+    
+    def run_jobs():
+        failed = []
+        try:
+            for (platform, content_type), result in zip(job_combinations, generation_executor_service.run_all(jobs)):
+                if isinstance(result, Exception):
+                    # The job raised before it could announce its own error
+                    logging.error(f"Generating {content_type} for {platform} failed: {str(result)}")
+                    events.put(('error', {'platform': platform, 'content_type': content_type, 'error': str(result)}))
+                    failed.append((platform, content_type))
+                else:
+                    failed.extend(result)
+            finish_project_generation(app, project_id, failed)
+        finally:
+            events.put(('done', None))
+    
+    threading.Thread(target=run_jobs, daemon=True).start()
+    
+    def stream():
+        yield _sse_event('project', {'project_id': project_id, 'status': 'generating'})
+        while True:
+            event, payload = events.get()
+            if event == 'done':
+                break
+            yield _sse_event(event, payload)
+        
+        with app.app_context():
+            project = ContentProject.query.get(project_id)
+            status = project.status if project else 'failed'
+        yield _sse_event('done', {'project_id': project_id, 'status': status})
+    
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Don't let nginx buffer the stream
+        }
+    )
+
 @content_bp.route('/projects/<project_id>', methods=['GET'])
 def get_project(project_id):
     """Get content project with generated content"""
@@ -325,7 +591,7 @@ def get_project(project_id):
         generated_content = GeneratedContent.query.filter_by(project_id=project.id).all()
         
         project_data = project.to_dict()
-        project_data['generated_content'] = [content.to_dict() for content in generated_content]
+        project_data['generated_content'] = [_content_dict(content) for content in generated_content]
         
         return jsonify(project_data), 200
         
@@ -389,22 +655,42 @@ def regenerate_content(current_user, project_id):
         content_types = data.get('content_types', ['text'])
         tone = data.get('tone', project.generation_parameters.get('tone') if project.generation_parameters else None)
         
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        if idempotency_key:
+            existing_job = generation_job_service.find_by_idempotency_key(project.user_id, idempotency_key)
+            if existing_job:
+                return jsonify({
+                    'project_id': project.id,
+                    'job_id': existing_job.id,
+                    'status': existing_job.status,
+                    'message': 'Content regeneration already started'
+                }), 200
+        
         # Delete existing generated content
         GeneratedContent.query.filter_by(project_id=project.id).delete()
         
-        # Start async regeneration
+        db.session.commit()
+        
+        # Queue durable regeneration job
         from flask import current_app
-        thread = threading.Thread(
-            target=generate_content_async,
-            args=(current_app._get_current_object(), project.id, project.original_prompt, project.target_platforms, content_types, tone, project.brand_guidelines)
+        job, _ = generation_job_service.submit(
+            current_app._get_current_object(),
+            project_id=project.id,
+            user_id=project.user_id,
+            job_type='regenerate',
+            parameters={
+                'prompt': project.original_prompt,
+                'platforms': project.target_platforms,
+                'content_types': content_types,
+                'tone': tone,
+                'brand_guidelines': project.brand_guidelines
+            },
+            idempotency_key=idempotency_key
         )
-        thread.daemon = True
-        thread.start()
-        
-        db.session.commit()
         
         return jsonify({
             'project_id': project.id,
+            'job_id': job.id,
             'status': 'regenerating',
             'message': 'Content regeneration started'
         }), 202
@@ -437,31 +723,13 @@ def get_project_content(project_id):
         content_list = []
         for content in generated_content:
             # Convert media_urls array to media_url string for frontend compatibility
-            media_url = None
-            if content.media_urls:
+            urls = media_delivery_service.media_urls(content)
+            if isinstance(urls, str):
                 try:
-                    # Parse JSON array and get first URL
-                    import json
-                    print(f"🔍 DEBUG: Raw media_urls from DB: {content.media_urls} (type: {type(content.media_urls)})")
-                    
-                    if isinstance(content.media_urls, str):
-                        # Try to parse as JSON array
-                        urls = json.loads(content.media_urls)
-                        print(f"🔍 DEBUG: Parsed JSON array: {urls}")
-                    else:
-                        # Already a list/array
-                        urls = content.media_urls
-                        print(f"🔍 DEBUG: Already array: {urls}")
-                    
-                    media_url = urls[0] if urls and len(urls) > 0 else None
-                    print(f"🔍 DEBUG: Extracted media_url: {media_url}")
-                    
-                except Exception as parse_error:
-                    print(f"🔍 ERROR: Media URL parsing failed: {parse_error}")
-                    print(f"🔍 ERROR: Raw content.media_urls: {repr(content.media_urls)}")
-                    # Fallback: treat as string
-                    media_url = content.media_urls if content.media_urls else None
-                    print(f"🔍 DEBUG: Fallback media_url: {media_url}")
+                    urls = json.loads(urls)
+                except ValueError:
+                    urls = [urls]
+            media_url = urls[0] if urls else None
             
             content_dict = {
                 'id': content.id,
@@ -479,3 +747,18 @@ def get_project_content(project_id):
         
     except Exception as e:
         return jsonify({'error': 'Failed to retrieve content', 'details': str(e)}), 500
+
+
+@content_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_generation_job(job_id):
+    """Get status of a content generation job"""
+    try:
+        job = generation_job_service.get_job(job_id)
+        
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify(job.to_dict()), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to retrieve job', 'details': str(e)}), 500
@@ -1,6 +1,9 @@
 from flask import Blueprint, jsonify, request
 from src.routes.auth import token_required
 from src.services.database_service import database_service
+from src.services.llm_cache_service import llm_cache_service
+from src.services.model_router_service import model_router_service
+from src.services.structured_output_service import structured_output_service
 from src.models.user import db, User
 import logging
 
@@ -93,6 +96,24 @@ def flush_cache(current_user):
         logging.error(f"Cache flush failed: {str(e)}")
         return jsonify({'error': 'Failed to flush cache'}), 500
 
+@database_bp.route('/database/cache/llm-stats', methods=['GET'])
+@token_required
+def llm_cache_stats(current_user):
+    """Get LLM cache, token usage and structured output statistics (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        return jsonify({
+            'llm_cache': llm_cache_service.get_stats(),
+            'token_usage': model_router_service.get_stats(),
+            'structured_output': structured_output_service.get_stats()
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"LLM cache stats failed: {str(e)}")
+        return jsonify({'error': 'Failed to get LLM cache statistics'}), 500
+
 @database_bp.route('/database/sessions/cleanup', methods=['POST'])
 @token_required
 def cleanup_sessions(current_user):
@@ -184,11 +205,12 @@ def run_migrations(current_user):
         if not current_user.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
         
-        # Create all tables
-        db.create_all()
+        # Create new tables and add new columns to existing ones
+        statements = database_service.upgrade_schema()
         
         return jsonify({
-            'message': 'Database migrations completed successfully'
+            'message': 'Database migrations completed successfully',
+            'statements': statements
         }), 200
         
     except Exception as e:
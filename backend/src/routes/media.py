@@ -1,6 +1,11 @@
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, jsonify, request
 from src.routes.auth import token_required
 from src.services.media_generation_service import media_generation_service
+from src.services.media_variant_service import media_variant_service
+from src.services.image_processing_service import image_processing_service
+from src.services.media_dedup_service import media_dedup_service
+from src.services.storage_service import storage_service
+from src.services.media_delivery_service import media_delivery_service
 from src.models.user import MediaFile
 import logging
 import os
@@ -43,15 +48,16 @@ def generate_image(current_user):
             prompt=prompt,
             platform=platform,
             content_type=content_type,
-            user_id=current_user.id
+            user_id=current_user.id,
+            reuse_existing=bool(data.get('reuse_existing', False))
         )
         
         if result['success']:
             return jsonify({
-                'message': 'Image generated successfully',
+                'message': 'Reused an earlier image for this prompt' if result.get('reused') else 'Image generated successfully',
                 'image': result,
                 'prompt_used': prompt
-            }), 201
+            }), 200 if result.get('reused') else 201
         else:
             return jsonify({
                 'error': result.get('error', 'Unknown error'),
@@ -152,9 +158,10 @@ def optimize_image(current_user):
         
         # Optimize image
         result = media_generation_service.optimize_image_for_platform(
-            image_path=media_file.storage_path,
+            image_path=storage_service.local_path(media_file),
             platform=platform,
-            content_type=content_type
+            content_type=content_type,
+            source_id=media_file.id if not media_file.parent_id else None
         )
         
         if result['success']:
@@ -182,12 +189,20 @@ def get_media_file(current_user, file_id):
         if not media_file or media_file.user_id != current_user.id:
             return jsonify({'error': 'Media file not found'}), 404
         
-        # Check if file exists on disk
-        if not os.path.exists(media_file.storage_path):
+        # Return file info or serve file based on request
+        serve_file = request.args.get('info') != 'true'
+        
+        # Cached copies are answered before touching storage
+        if serve_file:
+            not_modified = media_delivery_service.not_modified(media_file)
+            if not_modified is not None:
+                return not_modified
+        
+        # Check if file exists in storage
+        if not storage_service.exists(media_file):
             return jsonify({'error': 'Media file not found on storage'}), 404
         
-        # Return file info or serve file based on request
-        if request.args.get('info') == 'true':
+        if not serve_file:
             return jsonify({
                 'id': media_file.id,
                 'filename': media_file.filename,
@@ -201,18 +216,110 @@ def get_media_file(current_user, file_id):
                 'metadata': media_file.file_metadata
             }), 200
         else:
-            # Serve the actual file
-            return send_file(
-                media_file.storage_path,
-                mimetype=media_file.mime_type,
-                as_attachment=False,
-                download_name=media_file.original_filename
-            )
+            # Serve the actual file (ranges, ETag, caching; nginx streams it in X-Accel mode)
+            return media_delivery_service.send(media_file)
             
     except Exception as e:
         logging.error(f"Failed to get media file {file_id}: {str(e)}")
         return jsonify({'error': 'Failed to retrieve media file'}), 500
 
+@media_bp.route('/media/<file_id>/variants', methods=['GET'])
+@token_required
+def list_media_variants(current_user, file_id):
+    """List pre-rendered platform variants of an image"""
+    try:
+        media_file = media_generation_service.get_media_file(file_id)
+        
+        if not media_file or media_file.user_id != current_user.id:
+            return jsonify({'error': 'Media file not found'}), 404
+        
+        variants = media_variant_service.list_variants(media_file.id)
+        return jsonify({
+            'variants': [dict(variant.to_dict(), url=f"/api/media/{variant.id}",
+                             signed_url=media_delivery_service.signed_url(variant)) for variant in variants],
+            'total_count': len(variants),
+            'formats': media_variant_service.formats
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Failed to list variants of {file_id}: {str(e)}")
+        return jsonify({'error': 'Failed to list media variants'}), 500
+
+@media_bp.route('/media/<file_id>/similar', methods=['GET'])
+@token_required
+def list_similar_media(current_user, file_id):
+    """List the user's near-identical images by perceptual hash"""
+    try:
+        media_file = media_generation_service.get_media_file(file_id)
+        
+        if not media_file or media_file.user_id != current_user.id:
+            return jsonify({'error': 'Media file not found'}), 404
+        
+        max_distance = request.args.get('max_distance', type=int)
+        matches = media_dedup_service.find_similar(media_file, max_distance=max_distance)
+        return jsonify({
+            'similar': [
+                dict(match.to_dict(), url=f"/api/media/{match.id}",
+                     signed_url=media_delivery_service.signed_url(match), distance=distance)
+                for match, distance in matches
+            ],
+            'total_count': len(matches)
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Failed to find images similar to {file_id}: {str(e)}")
+        return jsonify({'error': 'Failed to find similar media'}), 500
+
+@media_bp.route('/media/<file_id>/variants/<platform>/<content_type>', methods=['GET'])
+@token_required
+def get_media_variant(current_user, file_id, platform, content_type):
+    """Serve a platform variant, picking AVIF/WebP when the client accepts it"""
+    try:
+        media_file = media_generation_service.get_media_file(file_id)
+        
+        if not media_file or media_file.user_id != current_user.id:
+            return jsonify({'error': 'Media file not found'}), 404
+        
+        if content_type not in media_generation_service.platform_specs.get(platform, {}):
+            return jsonify({'error': 'Unknown platform or content type'}), 400
+        
+        fmt = request.args.get('format') or media_variant_service.preferred_format(request.headers.get('Accept'))
+        if fmt not in media_variant_service.formats:
+            return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+        
+        variant = media_variant_service.get_or_create_variant(media_file.id, platform, content_type, fmt)
+        if not variant:
+            return jsonify({'error': 'Variant not available'}), 404
+        
+        response = media_delivery_service.not_modified(variant)
+        if response is None:
+            if not storage_service.exists(variant):
+                return jsonify({'error': 'Variant not available'}), 404
+            response = media_delivery_service.send(variant)
+        response.headers['Vary'] = 'Accept'
+        return response
+        
+    except Exception as e:
+        logging.error(f"Failed to get variant of {file_id}: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve media variant'}), 500
+
+@media_bp.route('/media/s/<backend>/<path:key>', methods=['GET'])
+def get_signed_media(backend, key):
+    """Serve a blob by signed URL; no session or database lookup"""
+    try:
+        expires = request.args.get('e')
+        if not media_delivery_service.verify(backend, key, expires, request.args.get('s')):
+            return jsonify({'error': 'Invalid or expired media URL'}), 403
+        
+        response = media_delivery_service.send_signed(backend, key, expires)
+        if response is None:
+            return jsonify({'error': 'Media file not found on storage'}), 404
+        return response
+        
+    except Exception as e:
+        logging.error(f"Failed to serve signed media {backend}/{key}: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve media file'}), 500
+
 @media_bp.route('/media/<file_id>', methods=['DELETE'])
 @token_required
 def delete_media_file(current_user, file_id):
@@ -266,6 +373,34 @@ def get_platform_specifications():
         'supported_platforms': list(media_generation_service.platform_specs.keys())
     }), 200
 
+@media_bp.route('/media/processing-stats', methods=['GET'])
+@token_required
+def get_processing_stats(current_user):
+    """Get image process pool timings per operation (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        return jsonify(image_processing_service.get_stats()), 200
+        
+    except Exception as e:
+        logging.error(f"Image processing stats failed: {str(e)}")
+        return jsonify({'error': 'Failed to get image processing statistics'}), 500
+
+@media_bp.route('/media/storage-stats', methods=['GET'])
+@token_required
+def get_storage_stats(current_user):
+    """Get media blob storage usage and dedup savings (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        return jsonify(storage_service.get_stats()), 200
+        
+    except Exception as e:
+        logging.error(f"Storage stats failed: {str(e)}")
+        return jsonify({'error': 'Failed to get storage statistics'}), 500
+
 @media_bp.route('/media/generate-prompt', methods=['POST'])
 @token_required
 def generate_image_prompt(current_user):
@@ -1,6 +1,8 @@
 from flask import Blueprint, jsonify, request
 from src.routes.auth import token_required
 from src.services.sentiment_scraper_service import sentiment_scraper_service
+from src.services.scraper_fetch_service import scraper_fetch_service
+from src.services.trend_store_service import trend_store_service
 from src.services.security_service import security_service
 from src.services.database_service import database_service
 import logging
@@ -147,29 +149,19 @@ def get_trending_topics(current_user):
             category = security_service.sanitize_text(category, max_length=50)
         
         location = security_service.sanitize_text(location, max_length=50)
+        sort = request.args.get('sort', 'score')
+        if sort not in ('score', 'velocity'):
+            return jsonify({'error': 'Sort must be one of: score, velocity'}), 400
         
-        # Check cache first
-        cache_key = f"trending_topics:{platform}:{category}:{location}"
-        cached_result = database_service.cache_get(cache_key)
-        
-        if cached_result:
-            return jsonify({
-                'message': 'Trending topics (cached)',
-                'result': cached_result,
-                'cached': True
-            }), 200
-        
-        # Get trending topics
-        result = sentiment_scraper_service.get_trending_topics(
+        # Read from the trend store; the ingest_trends task keeps it current
+        result = trend_store_service.get_trending_topics(
             platform=platform,
             category=category,
-            location=location
+            location=location,
+            sort=sort
         )
         
         if result['success']:
-            # Cache result for 15 minutes (trends change quickly)
-            database_service.cache_set(cache_key, result, 900)
-            
             return jsonify({
                 'message': 'Trending topics retrieved successfully',
                 'result': result
@@ -183,6 +175,30 @@ def get_trending_topics(current_user):
         logging.error(f"Trending topics fetch failed: {str(e)}")
         return jsonify({'error': 'Failed to get trending topics'}), 500
 
+@sentiment_bp.route('/sentiment/trending-topics/series', methods=['GET'])
+@token_required
+@security_service.rate_limit_decorator('api_general')
+def get_trend_series(current_user):
+    """Score history, velocity and acceleration of one trending topic"""
+    try:
+        topic = request.args.get('topic')
+        if not topic:
+            return jsonify({'error': 'Topic is required'}), 400
+        
+        topic = security_service.sanitize_text(topic, max_length=200)
+        location = security_service.sanitize_text(request.args.get('location', 'worldwide'), max_length=50)
+        window = min(max(request.args.get('window', trend_store_service.velocity_window, type=int), 300), 86400)
+        windows = min(max(request.args.get('windows', 24, type=int), 3), 336)
+        
+        return jsonify({
+            'message': 'Trend series retrieved successfully',
+            'result': trend_store_service.get_series(topic, location, window, windows)
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Trend series fetch failed: {str(e)}")
+        return jsonify({'error': 'Failed to get trend series'}), 500
+
 @sentiment_bp.route('/sentiment/content-opportunities', methods=['POST'])
 @token_required
 @security_service.rate_limit_decorator('api_general')
@@ -222,7 +238,7 @@ def get_content_opportunities(current_user):
             if platform == 'all':
                 platform = 'all'
             
-            trending_result = sentiment_scraper_service.get_trending_topics(platform=platform)
+            trending_result = trend_store_service.get_trending_topics(platform=platform)
             
             if trending_result['success']:
                 # Filter trends related to the topic
@@ -297,25 +313,27 @@ def analyze_hashtags(current_user):
         
         hashtag_analysis = []
         
-        for hashtag in hashtags:
-            # Remove # if present
-            clean_hashtag = hashtag.lstrip('#')
-            
-            # Analyze each hashtag
+        # Remove # if present
+        clean_hashtags = [hashtag.lstrip('#') for hashtag in hashtags]
+        
+        def analyze(clean_hashtag):
             if platform == 'twitter':
-                analysis = sentiment_scraper_service.search_twitter_sentiment(
+                return sentiment_scraper_service.search_twitter_sentiment(
                     query=f"#{clean_hashtag}",
                     max_results=50,
                     days_back=7
                 )
-            else:
-                analysis = sentiment_scraper_service.search_reddit_sentiment(
-                    query=clean_hashtag,
-                    max_posts=30,
-                    days_back=7
-                )
-            
-            if analysis['success']:
+            return sentiment_scraper_service.search_reddit_sentiment(
+                query=clean_hashtag,
+                max_posts=30,
+                days_back=7
+            )
+        
+        # Analyze all hashtags concurrently
+        results = scraper_fetch_service.run_all([lambda tag=tag: analyze(tag) for tag in clean_hashtags])
+        
+        for clean_hashtag, analysis in zip(clean_hashtags, results):
+            if not isinstance(analysis, Exception) and analysis['success']:
                 hashtag_analysis.append({
                     'hashtag': f"#{clean_hashtag}",
                     'platform': platform,
@@ -366,6 +384,26 @@ def analyze_competitors(current_user):
         
         competitor_analysis = []
         
+        def analyze(competitor, platform):
+            if platform == 'twitter':
+                return sentiment_scraper_service.search_twitter_sentiment(
+                    query=competitor,
+                    max_results=100,
+                    days_back=14
+                )
+            return sentiment_scraper_service.search_reddit_sentiment(
+                query=competitor,
+                max_posts=50,
+                days_back=14
+            )
+        
+        # Analyze every competitor on every platform concurrently
+        pairs = [(competitor, platform) for competitor in competitors
+                 for platform in platforms if platform in ('twitter', 'reddit')]
+        results = dict(zip(pairs, scraper_fetch_service.run_all(
+            [lambda pair=pair: analyze(*pair) for pair in pairs]
+        )))
+        
         for competitor in competitors:
             comp_data = {
                 'competitor': competitor,
@@ -376,19 +414,8 @@ def analyze_competitors(current_user):
             }
             
             for platform in platforms:
-                if platform == 'twitter':
-                    analysis = sentiment_scraper_service.search_twitter_sentiment(
-                        query=competitor,
-                        max_results=100,
-                        days_back=14
-                    )
-                elif platform == 'reddit':
-                    analysis = sentiment_scraper_service.search_reddit_sentiment(
-                        query=competitor,
-                        max_posts=50,
-                        days_back=14
-                    )
-                else:
+                analysis = results.get((competitor, platform))
+                if analysis is None or isinstance(analysis, Exception):
                     continue
                 
                 if analysis['success']:
@@ -0,0 +1,27 @@
+from flask import Blueprint, jsonify, request, Response
+from src.models.user import db
+from src.services.webhook_service import webhook_service
+from src.services.fake_media_provider_service import fake_media_provider_service
+import logging
+
+webhooks_bp = Blueprint('webhooks', __name__)
+
+@webhooks_bp.route('/webhooks/<provider>', methods=['POST'])
+def receive_webhook(provider):
+    """Receive a signed status callback from an async media provider"""
+    try:
+        result, status_code = webhook_service.handle(provider, request.get_data(), request.headers)
+        return jsonify(result), status_code
+        
+    except Exception as e:
+        logging.error(f"{provider} webhook failed: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'Failed to process webhook'}), 500
+
+@webhooks_bp.route('/webhooks/fake/outputs/<task_id>.png', methods=['GET'])
+def get_fake_provider_output(task_id):
+    """Serve an output image of the local fake provider"""
+    if not fake_media_provider_service.enabled:
+        return jsonify({'error': 'Not found'}), 404
+    
+    return Response(fake_media_provider_service.render(task_id), mimetype='image/png')
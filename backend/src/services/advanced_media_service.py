@@ -3,24 +3,37 @@ import requests
 import json
 import uuid
 import base64
+import hashlib
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from flask import current_app, has_app_context
 from PIL import Image
 import io
-from openai import OpenAI
+from src.services.openai_client_service import openai_client_service
 from src.models.user import MediaFile, db
-from src.services.database_service import database_service
+from src.services.media_task_service import media_task_service
+from src.services.media_variant_service import media_variant_service
+from src.services.media_dedup_service import media_dedup_service
+from src.services.storage_service import storage_service
+from src.services.media_delivery_service import media_delivery_service
 
 class AdvancedMediaService:
     """Advanced media generation service with multiple AI providers"""
     
+    @property
+    def openai_client(self):
+        """Shared OpenAI client for this process"""
+        return openai_client_service.get_client()
+
     def __init__(self):
-        # API clients and configurations
-        self.openai_client = OpenAI(
-            api_key=os.getenv('OPENAI_API_KEY'),
-            base_url=os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
-        )
+        # The fake provider (tests and local development only) needs its own webhook secret
+        fake_secret = None
+        if os.getenv('MEDIA_FAKE_PROVIDER', 'false').lower() == 'true':
+            fake_secret = os.getenv('FAKE_PROVIDER_WEBHOOK_SECRET') or None
         
         # Provider configurations
         self.providers = {
@@ -52,13 +65,21 @@ class AdvancedMediaService:
                 'name': 'Midjourney',
                 'capabilities': ['image'],
                 'api_key': os.getenv('MIDJOURNEY_API_KEY'),
-                'base_url': 'https://api.midjourney.com'
+                'base_url': 'https://api.midjourney.com',
+                'webhook_secret': os.getenv('MIDJOURNEY_WEBHOOK_SECRET')
             },
             'leonardo': {
                 'name': 'Leonardo AI',
                 'capabilities': ['image'],
                 'api_key': os.getenv('LEONARDO_API_KEY'),
                 'base_url': 'https://cloud.leonardo.ai/api'
+            },
+            'fake': {
+                'name': 'Local fake provider',
+                'capabilities': ['image'],
+                'api_key': 'local' if fake_secret else None,
+                'base_url': os.getenv('BASE_URL', 'http://localhost:5000'),
+                'webhook_secret': fake_secret
             }
         }
         
@@ -66,6 +87,20 @@ class AdvancedMediaService:
         self.storage_base_path = os.getenv('MEDIA_STORAGE_PATH', '/home/ubuntu/media_storage')
         self.ensure_storage_directory()
         
+        # Concurrent multi-provider generation
+        self.provider_max_workers = int(os.getenv('MEDIA_PROVIDER_MAX_WORKERS', '8'))
+        self.multi_provider_deadline = float(os.getenv('MEDIA_MULTI_PROVIDER_DEADLINE', '120'))  # seconds
+        self.provider_timeouts = {
+            'openai': float(os.getenv('MEDIA_PROVIDER_TIMEOUT_OPENAI', '60')),
+            'stability': float(os.getenv('MEDIA_PROVIDER_TIMEOUT_STABILITY', '60')),
+            'leonardo': float(os.getenv('MEDIA_PROVIDER_TIMEOUT_LEONARDO', '90')),
+            'runway': float(os.getenv('MEDIA_PROVIDER_TIMEOUT_RUNWAY', '300')),
+            'google_veo': float(os.getenv('MEDIA_PROVIDER_TIMEOUT_GOOGLE_VEO', '300'))
+        }
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+        
         # Quality and style presets
         self.quality_presets = {
             'draft': {'quality': 'standard', 'steps': 20, 'guidance': 7.5},
@@ -104,7 +139,7 @@ class AdvancedMediaService:
     
     def ensure_storage_directory(self):
         """Ensure media storage directories exist"""
-        directories = ['images', 'videos', 'temp', 'stability', 'runway', 'veo', 'midjourney', 'leonardo']
+        directories = ['images', 'videos', 'temp', 'stability', 'runway', 'veo', 'midjourney', 'leonardo', 'fake']
         for directory in directories:
             os.makedirs(os.path.join(self.storage_base_path, directory), exist_ok=True)
     
@@ -126,13 +161,21 @@ class AdvancedMediaService:
     
     def generate_with_stability_ai(self, prompt: str, style: str = 'photorealistic', 
                                  quality: str = 'standard', aspect_ratio: str = '1:1',
-                                 user_id: str = None) -> Dict[str, Any]:
+                                 user_id: str = None, reuse_existing: bool = False) -> Dict[str, Any]:
         """Generate image using Stability AI"""
         try:
             api_key = self.providers['stability']['api_key']
             if not api_key:
                 return {'success': False, 'error': 'Stability AI API key not configured'}
             
+            fingerprint = media_dedup_service.prompt_fingerprint(prompt, style, aspect_ratio, 'stability')
+            if reuse_existing:
+                existing = media_dedup_service.find_reusable(user_id, fingerprint)
+                if existing:
+                    result = media_dedup_service.reuse_result(existing)
+                    result.update({'provider': 'stability_ai', 'style': style, 'quality': quality})
+                    return result
+            
             # Prepare style-enhanced prompt
             style_prompt = self.style_templates.get(style, {}).get('stability', '')
             enhanced_prompt = f"{prompt}, {style_prompt}" if style_prompt else prompt
@@ -213,18 +256,23 @@ class AdvancedMediaService:
                         'quality': quality,
                         'aspect_ratio': aspect_ratio,
                         'generation_params': payload
-                    }
+                    },
+                    prompt_fingerprint=fingerprint
                 )
+                media_dedup_service.index(media_file, hashlib.sha256(image_data).hexdigest())
+                storage_service.attach(media_file)
                 db.session.add(media_file)
                 db.session.commit()
+                media_variant_service.schedule(media_file.id)
             
             return {
                 'success': True,
                 'provider': 'stability_ai',
                 'file_id': media_file.id if media_file else file_id,
                 'filename': filename,
-                'file_path': file_path,
+                'file_path': storage_service.local_path(media_file) if media_file else file_path,
                 'url': f"/api/media/{media_file.id if media_file else file_id}",
+                'signed_url': media_delivery_service.signed_url(media_file) if media_file else None,
                 'dimensions': dimensions,
                 'file_size': len(image_data),
                 'prompt_used': enhanced_prompt,
@@ -236,10 +284,10 @@ class AdvancedMediaService:
             logging.error(f"Stability AI generation failed: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def generate_video_with_runway(self, prompt: str, duration: int = 10, 
+    def submit_video_with_runway(self, prompt: str, duration: int = 10,
                                  style: str = 'cinematic', quality: str = 'standard',
                                  reference_image: str = None, user_id: str = None) -> Dict[str, Any]:
-        """Generate video using Runway ML Gen-3"""
+        """Start a Runway ML Gen-3 video generation and return a task handle"""
         try:
             api_key = self.providers['runway']['api_key']
             if not api_key:
@@ -283,88 +331,40 @@ class AdvancedMediaService:
             if not task_id:
                 return {'success': False, 'error': 'No task ID received'}
             
-            # Poll for completion (simplified - in production use webhooks)
-            import time
-            max_attempts = 60  # 5 minutes max
-            attempt = 0
-            
-            while attempt < max_attempts:
-                status_url = f"{self.providers['runway']['base_url']}/v1/tasks/{task_id}"
-                status_response = requests.get(status_url, headers=headers)
-                
-                if status_response.status_code == 200:
-                    status_data = status_response.json()
-                    
-                    if status_data.get('status') == 'completed':
-                        video_url = status_data.get('output', {}).get('url')
-                        if video_url:
-                            # Download video
-                            video_response = requests.get(video_url)
-                            if video_response.status_code == 200:
-                                file_id = str(uuid.uuid4())
-                                filename = f"runway_{file_id}.mp4"
-                                file_path = os.path.join(self.storage_base_path, 'runway', filename)
-                                
-                                with open(file_path, 'wb') as f:
-                                    f.write(video_response.content)
-                                
-                                # Store in database
-                                media_file = None
-                                if user_id:
-                                    media_file = MediaFile(
-                                        user_id=user_id,
-                                        filename=filename,
-                                        original_filename=f"runway_{style}_{duration}s.mp4",
-                                        file_type='video',
-                                        file_size=len(video_response.content),
-                                        storage_path=file_path,
-                                        storage_provider='runway',
-                                        mime_type='video/mp4',
-                                        duration=duration,
-                                        file_metadata={
-                                            'provider': 'runway_ml',
-                                            'model': 'gen-3-alpha',
-                                            'prompt': enhanced_prompt,
-                                            'style': style,
-                                            'quality': quality,
-                                            'duration': duration,
-                                            'reference_image': reference_image,
-                                            'task_id': task_id
-                                        }
-                                    )
-                                    db.session.add(media_file)
-                                    db.session.commit()
-                                
-                                return {
-                                    'success': True,
-                                    'provider': 'runway_ml',
-                                    'file_id': media_file.id if media_file else file_id,
-                                    'filename': filename,
-                                    'file_path': file_path,
-                                    'url': f"/api/media/{media_file.id if media_file else file_id}",
-                                    'duration': duration,
-                                    'file_size': len(video_response.content),
-                                    'prompt_used': enhanced_prompt,
-                                    'style': style,
-                                    'quality': quality
-                                }
-                        
-                    elif status_data.get('status') == 'failed':
-                        return {
-                            'success': False,
-                            'error': 'Video generation failed',
-                            'details': status_data.get('error', 'Unknown error')
-                        }
-                
-                time.sleep(5)  # Wait 5 seconds before next check
-                attempt += 1
-            
-            return {'success': False, 'error': 'Video generation timeout'}
+            # The central poller finishes the task
+            task = media_task_service.create_task('runway', task_id, 'video', user_id, {
+                'prompt': enhanced_prompt,
+                'style': style,
+                'quality': quality,
+                'duration': duration,
+                'reference_image': reference_image
+            })
+            
+            handle = media_task_service.task_handle(task)
+            handle.update({
+                'provider': 'runway_ml',
+                'prompt_used': enhanced_prompt,
+                'estimated_time': '60-180 seconds'
+            })
+            return handle
             
         except Exception as e:
             logging.error(f"Runway ML generation failed: {str(e)}")
+            db.session.rollback()
             return {'success': False, 'error': str(e)}
     
+    def generate_video_with_runway(self, prompt: str, duration: int = 10, 
+                                 style: str = 'cinematic', quality: str = 'standard',
+                                 reference_image: str = None, user_id: str = None,
+                                 should_stop: Callable[[], bool] = None) -> Dict[str, Any]:
+        """Generate video using Runway ML Gen-3 and wait for the result"""
+        submitted = self.submit_video_with_runway(
+            prompt, duration, style, quality, reference_image, user_id
+        )
+        if not submitted['success']:
+            return submitted
+        return media_task_service.wait(submitted['task_id'], should_stop=should_stop)
+    
     def generate_video_with_veo3(self, prompt: str, duration: int = 15,
                                style: str = 'cinematic', user_id: str = None) -> Dict[str, Any]:
         """Generate video using Google Veo 3"""
@@ -440,41 +440,52 @@ class AdvancedMediaService:
             result = response.json()
             task_id = result.get('task_id')
             
-            # Store task for webhook processing
-            if user_id and task_id:
-                cache_key = f"midjourney_task:{task_id}"
-                task_data = {
-                    'user_id': user_id,
-                    'prompt': mj_prompt,
-                    'style': style,
-                    'aspect_ratio': aspect_ratio,
-                    'status': 'pending',
-                    'created_at': datetime.utcnow().isoformat()
-                }
-                database_service.cache_set(cache_key, task_data, 3600)  # 1 hour
+            if not task_id:
+                return {'success': False, 'error': 'No task ID received'}
             
-            return {
-                'success': True,
+            # Finished by the signed callback to /api/webhooks/midjourney
+            task = media_task_service.create_task('midjourney', task_id, 'image', user_id, {
+                'prompt': mj_prompt,
+                'style': style,
+                'aspect_ratio': aspect_ratio,
+                'prompt_fingerprint': media_dedup_service.prompt_fingerprint(prompt, style, aspect_ratio, 'midjourney')
+            }, delivery='webhook')
+            
+            handle = media_task_service.task_handle(task)
+            handle.update({
                 'provider': 'midjourney',
-                'task_id': task_id,
-                'status': 'pending',
                 'message': 'Image generation started. You will be notified when complete.',
                 'prompt_used': mj_prompt,
                 'estimated_time': '60-120 seconds'
-            }
+            })
+            return handle
             
         except Exception as e:
             logging.error(f"Midjourney generation failed: {str(e)}")
+            db.session.rollback()
             return {'success': False, 'error': str(e)}
     
-    def generate_with_leonardo(self, prompt: str, style: str = 'photorealistic',
-                             model: str = 'leonardo-vision-xl', user_id: str = None) -> Dict[str, Any]:
-        """Generate image using Leonardo AI"""
+    def submit_with_leonardo(self, prompt: str, style: str = 'photorealistic',
+                             model: str = 'leonardo-vision-xl', user_id: str = None,
+                             reuse_existing: bool = False) -> Dict[str, Any]:
+        """Start a Leonardo AI image generation and return a task handle.
+        
+        With reuse_existing a finished earlier generation of the same prompt
+        is returned instead (with 'reused': True and no task).
+        """
         try:
             api_key = self.providers['leonardo']['api_key']
             if not api_key:
                 return {'success': False, 'error': 'Leonardo AI API key not configured'}
             
+            fingerprint = media_dedup_service.prompt_fingerprint(prompt, f"{style}:{model}", '1:1', 'leonardo')
+            if reuse_existing:
+                existing = media_dedup_service.find_reusable(user_id, fingerprint)
+                if existing:
+                    result = media_dedup_service.reuse_result(existing)
+                    result.update({'status': 'succeeded', 'provider': 'leonardo_ai', 'model': model})
+                    return result
+            
             # Prepare style-enhanced prompt
             style_prompt = self.style_templates.get(style, {}).get('leonardo', '')
             enhanced_prompt = f"{prompt}, {style_prompt}" if style_prompt else prompt
@@ -511,89 +522,256 @@ class AdvancedMediaService:
             if not generation_id:
                 return {'success': False, 'error': 'No generation ID received'}
             
-            # Poll for completion
-            import time
-            max_attempts = 30
-            attempt = 0
-            
-            while attempt < max_attempts:
-                status_url = f"{self.providers['leonardo']['base_url']}/rest/v1/generations/{generation_id}"
-                status_response = requests.get(status_url, headers=headers)
-                
-                if status_response.status_code == 200:
-                    status_data = status_response.json()
-                    generation = status_data.get('generations_by_pk', {})
-                    
-                    if generation.get('status') == 'COMPLETE':
-                        images = generation.get('generated_images', [])
-                        if images:
-                            image_url = images[0].get('url')
-                            if image_url:
-                                # Download image
-                                image_response = requests.get(image_url)
-                                if image_response.status_code == 200:
-                                    file_id = str(uuid.uuid4())
-                                    filename = f"leonardo_{file_id}.jpg"
-                                    file_path = os.path.join(self.storage_base_path, 'leonardo', filename)
-                                    
-                                    with open(file_path, 'wb') as f:
-                                        f.write(image_response.content)
-                                    
-                                    # Store in database
-                                    media_file = None
-                                    if user_id:
-                                        media_file = MediaFile(
-                                            user_id=user_id,
-                                            filename=filename,
-                                            original_filename=f"leonardo_{style}.jpg",
-                                            file_type='image',
-                                            file_size=len(image_response.content),
-                                            storage_path=file_path,
-                                            storage_provider='leonardo',
-                                            mime_type='image/jpeg',
-                                            dimensions={'width': 1024, 'height': 1024},
-                                            file_metadata={
-                                                'provider': 'leonardo_ai',
-                                                'model': model,
-                                                'prompt': enhanced_prompt,
-                                                'style': style,
-                                                'generation_id': generation_id
-                                            }
-                                        )
-                                        db.session.add(media_file)
-                                        db.session.commit()
-                                    
-                                    return {
-                                        'success': True,
-                                        'provider': 'leonardo_ai',
-                                        'file_id': media_file.id if media_file else file_id,
-                                        'filename': filename,
-                                        'file_path': file_path,
-                                        'url': f"/api/media/{media_file.id if media_file else file_id}",
-                                        'dimensions': {'width': 1024, 'height': 1024},
-                                        'file_size': len(image_response.content),
-                                        'prompt_used': enhanced_prompt,
-                                        'style': style,
-                                        'model': model
-                                    }
-                    
-                    elif generation.get('status') == 'FAILED':
-                        return {'success': False, 'error': 'Image generation failed'}
-                
-                time.sleep(2)
-                attempt += 1
-            
-            return {'success': False, 'error': 'Image generation timeout'}
+            # The central poller finishes the task
+            task = media_task_service.create_task('leonardo', generation_id, 'image', user_id, {
+                'prompt': enhanced_prompt,
+                'style': style,
+                'model': model,
+                'prompt_fingerprint': fingerprint
+            })
+            
+            handle = media_task_service.task_handle(task)
+            handle.update({
+                'provider': 'leonardo_ai',
+                'prompt_used': enhanced_prompt,
+                'estimated_time': '10-60 seconds'
+            })
+            return handle
             
         except Exception as e:
             logging.error(f"Leonardo AI generation failed: {str(e)}")
+            db.session.rollback()
+            return {'success': False, 'error': str(e)}
+    
+    def generate_with_leonardo(self, prompt: str, style: str = 'photorealistic',
+                             model: str = 'leonardo-vision-xl', user_id: str = None,
+                             should_stop: Callable[[], bool] = None, reuse_existing: bool = False) -> Dict[str, Any]:
+        """Generate image using Leonardo AI and wait for the result"""
+        submitted = self.submit_with_leonardo(prompt, style, model, user_id, reuse_existing)
+        if not submitted['success'] or submitted.get('reused'):
+            return submitted
+        return media_task_service.wait(submitted['task_id'], should_stop=should_stop)
+    
+    def generate_with_fake_provider(self, prompt: str, style: str = 'artistic',
+                                    user_id: str = None) -> Dict[str, Any]:
+        """Start a generation on the local fake webhook provider"""
+        from src.services.fake_media_provider_service import fake_media_provider_service
+        
+        try:
+            if not self.providers['fake']['api_key']:
+                return {'success': False, 'error': 'Fake provider is disabled (needs MEDIA_FAKE_PROVIDER and FAKE_PROVIDER_WEBHOOK_SECRET)'}
+            
+            config = self.providers['fake']
+            task_id = fake_media_provider_service.submit(
+                prompt,
+                webhook_url=f"{config['base_url']}/api/webhooks/fake",
+                secret=config['webhook_secret']
+            )
+            
+            task = media_task_service.create_task('fake', task_id, 'image', user_id, {
+                'prompt': prompt,
+                'style': style,
+                'prompt_fingerprint': media_dedup_service.prompt_fingerprint(prompt, style, None, 'fake')
+            }, delivery='webhook')
+            
+            handle = media_task_service.task_handle(task)
+            handle['provider'] = 'fake'
+            return handle
+            
+        except Exception as e:
+            logging.error(f"Fake provider generation failed: {str(e)}")
+            db.session.rollback()
             return {'success': False, 'error': str(e)}
     
+    def get_task_status_request(self, provider: str, provider_task_id: str) -> Tuple[str, Dict[str, str]]:
+        """Status URL and headers for a submitted generation"""
+        headers = {'Authorization': f"Bearer {self.providers[provider]['api_key']}"}
+        if provider == 'runway':
+            return f"{self.providers['runway']['base_url']}/v1/tasks/{provider_task_id}", headers
+        if provider == 'leonardo':
+            return f"{self.providers['leonardo']['base_url']}/rest/v1/generations/{provider_task_id}", headers
+        raise ValueError(f'Provider {provider} has no task polling')
+    
+    def parse_task_status(self, provider: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a provider status response to pending/succeeded/failed"""
+        if provider == 'runway':
+            status = data.get('status')
+            output_url = (data.get('output') or {}).get('url')
+            if status == 'completed' and output_url:
+                return {'state': 'succeeded', 'output_url': output_url}
+            if status == 'failed':
+                return {'state': 'failed', 'error': f"Video generation failed: {data.get('error', 'Unknown error')}"}
+            return {'state': 'pending'}
+        
+        generation = data.get('generations_by_pk') or {}
+        images = generation.get('generated_images') or []
+        if generation.get('status') == 'COMPLETE' and images and images[0].get('url'):
+            return {'state': 'succeeded', 'output_url': images[0]['url']}
+        if generation.get('status') == 'FAILED':
+            return {'state': 'failed', 'error': 'Image generation failed'}
+        return {'state': 'pending'}
+    
+    def parse_webhook(self, provider: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a provider callback to its task ID and pending/processing/succeeded/failed"""
+        if provider == 'midjourney':
+            status = (payload.get('status') or '').lower()
+            output_url = payload.get('image_url') or (payload.get('output') or {}).get('image_url')
+            states = {'completed': 'succeeded', 'finished': 'succeeded', 'failed': 'failed',
+                      'processing': 'processing', 'in_progress': 'processing'}
+            return {
+                'provider_task_id': payload.get('task_id'),
+                'state': states.get(status, 'pending'),
+                'output_url': output_url,
+                'error': payload.get('error')
+            }
+        
+        # Generic format, used by the fake provider
+        return {
+            'provider_task_id': payload.get('task_id'),
+            'state': payload.get('status', 'pending'),
+            'output_url': payload.get('output_url'),
+            'error': payload.get('error')
+        }
+    
+    def get_task_output_path(self, provider: str) -> Dict[str, str]:
+        """Pick the storage location for a finished generation"""
+        file_id = str(uuid.uuid4())
+        extension = {'runway': 'mp4', 'leonardo': 'jpg'}.get(provider, 'png')
+        filename = f"{provider}_{file_id}.{extension}"
+        return {
+            'file_id': file_id,
+            'filename': filename,
+            'file_path': os.path.join(self.storage_base_path, provider, filename)
+        }
+    
+    def store_task_output(self, task, output: Dict[str, str], download: Dict[str, Any]) -> Dict[str, Any]:
+        """Create the MediaFile for a downloaded generation and build its result"""
+        parameters = task.parameters or {}
+        file_size = download['file_size']
+        style = parameters.get('style')
+        
+        if task.provider == 'runway':
+            duration = parameters.get('duration')
+            record = {
+                'original_filename': f"runway_{style}_{duration}s.mp4",
+                'file_type': 'video',
+                'mime_type': 'video/mp4',
+                'duration': duration,
+                'dimensions': None,
+                'file_metadata': {
+                    'provider': 'runway_ml',
+                    'model': 'gen-3-alpha',
+                    'prompt': parameters.get('prompt'),
+                    'style': style,
+                    'quality': parameters.get('quality'),
+                    'duration': duration,
+                    'reference_image': parameters.get('reference_image'),
+                    'task_id': task.provider_task_id
+                }
+            }
+            extra = {'provider': 'runway_ml', 'duration': duration, 'quality': parameters.get('quality')}
+        elif task.provider == 'leonardo':
+            record = {
+                'original_filename': f"leonardo_{style}.jpg",
+                'file_type': 'image',
+                'mime_type': 'image/jpeg',
+                'duration': None,
+                'dimensions': {'width': 1024, 'height': 1024},
+                'file_metadata': {
+                    'provider': 'leonardo_ai',
+                    'model': parameters.get('model'),
+                    'prompt': parameters.get('prompt'),
+                    'style': style,
+                    'generation_id': task.provider_task_id
+                }
+            }
+            extra = {'provider': 'leonardo_ai', 'dimensions': record['dimensions'], 'model': parameters.get('model')}
+        else:
+            # Webhook providers (Midjourney, fake): read the size from the image
+            with Image.open(output['file_path']) as image:
+                dimensions = {'width': image.width, 'height': image.height}
+            record = {
+                'original_filename': f"{task.provider}_{style}.png",
+                'file_type': 'image',
+                'mime_type': 'image/png',
+                'duration': None,
+                'dimensions': dimensions,
+                'file_metadata': {
+                    'provider': task.provider,
+                    'prompt': parameters.get('prompt'),
+                    'style': style,
+                    'aspect_ratio': parameters.get('aspect_ratio'),
+                    'task_id': task.provider_task_id
+                }
+            }
+            extra = {'provider': task.provider, 'dimensions': dimensions}
+        
+        record['file_metadata']['sha256'] = download['sha256']
+        
+        # Store in database
+        media_file = None
+        if task.user_id:
+            media_file = MediaFile(
+                user_id=task.user_id,
+                filename=output['filename'],
+                file_size=file_size,
+                storage_path=output['file_path'],
+                storage_provider=task.provider,
+                prompt_fingerprint=parameters.get('prompt_fingerprint'),
+                **record
+            )
+            media_dedup_service.index(media_file, download['sha256'])
+            storage_service.attach(media_file)
+            db.session.add(media_file)
+            db.session.flush()
+        
+        file_id = media_file.id if media_file else output['file_id']
+        result = {
+            'success': True,
+            'file_id': file_id,
+            'media_file_id': media_file.id if media_file else None,
+            'filename': output['filename'],
+            'file_path': storage_service.local_path(media_file) if media_file else output['file_path'],
+            'url': f"/api/media/{file_id}",
+            'signed_url': media_delivery_service.signed_url(media_file) if media_file else None,
+            'file_size': file_size,
+            'prompt_used': parameters.get('prompt'),
+            'style': style
+        }
+        result.update(extra)
+        return result
+    
+    def get_executor(self) -> ThreadPoolExecutor:
+        """Get the shared provider pool, recreating it after a fork"""
+        with self._executor_lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.provider_max_workers,
+                    thread_name_prefix='media-provider'
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+    
     def generate_media_multi_provider(self, prompt: str, media_type: str = 'image',
                                     providers: List[str] = None, style: str = 'photorealistic',
-                                    quality: str = 'standard', user_id: str = None) -> Dict[str, Any]:
-        """Generate media using multiple providers for comparison"""
+                                    quality: str = 'standard', user_id: str = None,
+                                    policy: str = 'all_within_deadline', deadline: float = None,
+                                    provider_timeouts: Dict[str, float] = None) -> Dict[str, Any]:
+        """Generate media using multiple providers for comparison.
+        
+        Providers run in parallel on a shared pool. Policies:
+        - all_within_deadline: collect every result that finishes before the deadline
+        - first_success: return as soon as one provider succeeds, cancel the rest
+        - sequential: call providers one after another (previous behaviour)
+        
+        Each provider also has its own timeout budget, in every policy. Providers
+        still running when their budget or the deadline runs out are reported as
+        timed out; task-based providers (Runway, Leonardo) cancel their task.
+        """
         try:
+            if policy not in ('all_within_deadline', 'first_success', 'sequential'):
+                return {'success': False, 'error': f'Unsupported policy: {policy}'}
+            
             if not providers:
                 # Auto-select best providers for media type
                 if media_type == 'image':
@@ -603,57 +781,35 @@ class AdvancedMediaService:
                 else:
                     return {'success': False, 'error': 'Unsupported media type'}
             
-            results = []
-            
-            for provider in providers:
-                if provider not in self.providers:
-                    continue
-                
-                if not self.providers[provider]['api_key']:
-                    continue
-                
-                if media_type not in self.providers[provider]['capabilities']:
-                    continue
-                
-                try:
-                    if provider == 'openai' and media_type == 'image':
-                        from src.services.media_generation_service import media_generation_service
-                        result = media_generation_service.generate_image_with_dalle(
-                            prompt=prompt, platform='instagram', user_id=user_id
-                        )
-                    elif provider == 'stability' and media_type == 'image':
-                        result = self.generate_with_stability_ai(
-                            prompt=prompt, style=style, quality=quality, user_id=user_id
-                        )
-                    elif provider == 'leonardo' and media_type == 'image':
-                        result = self.generate_with_leonardo(
-                            prompt=prompt, style=style, user_id=user_id
-                        )
-                    elif provider == 'runway' and media_type == 'video':
-                        result = self.generate_video_with_runway(
-                            prompt=prompt, style=style, quality=quality, user_id=user_id
-                        )
-                    elif provider == 'google_veo' and media_type == 'video':
-                        result = self.generate_video_with_veo3(
-                            prompt=prompt, style=style, user_id=user_id
-                        )
-                    else:
-                        continue
-                    
-                    result['provider'] = provider
-                    results.append(result)
-                    
-                except Exception as e:
-                    logging.error(f"Provider {provider} failed: {str(e)}")
-                    results.append({
-                        'success': False,
-                        'provider': provider,
-                        'error': str(e)
-                    })
+            selected = [
+                provider for provider in dict.fromkeys(providers)
+                if provider in self.providers
+                and self.providers[provider]['api_key']
+                and media_type in self.providers[provider]['capabilities']
+            ]
+            
+            started = time.monotonic()
+            deadline_at = started + (deadline or self.multi_provider_deadline)
+            timeouts = dict(self.provider_timeouts, **(provider_timeouts or {}))
+            stop_all = threading.Event()
+            
+            if policy == 'sequential':
+                # One provider at a time, each within its own budget and the deadline
+                results = []
+                for provider in selected:
+                    results.extend(self._run_providers_concurrently(
+                        [provider], media_type, prompt, style, quality, user_id,
+                        policy, deadline_at, timeouts, threading.Event()
+                    ))
+            else:
+                results = self._run_providers_concurrently(
+                    selected, media_type, prompt, style, quality, user_id,
+                    policy, deadline_at, timeouts, stop_all
+                )
             
             successful_results = [r for r in results if r.get('success')]
             
-            return {
+            response = {
                 'success': len(successful_results) > 0,
                 'results': results,
                 'successful_count': len(successful_results),
@@ -661,13 +817,128 @@ class AdvancedMediaService:
                 'media_type': media_type,
                 'prompt': prompt,
                 'style': style,
-                'quality': quality
+                'quality': quality,
+                'policy': policy,
+                'elapsed_ms': int((time.monotonic() - started) * 1000)
             }
+            if policy == 'first_success' and successful_results:
+                response['winner'] = successful_results[0]['provider']
+            return response
             
         except Exception as e:
             logging.error(f"Multi-provider generation failed: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    def _run_providers_concurrently(self, providers: List[str], media_type: str, prompt: str, style: str,
+                                    quality: str, user_id: str, policy: str, deadline_at: float,
+                                    timeouts: Dict[str, float], stop_all: threading.Event) -> List[Dict[str, Any]]:
+        """Run providers in parallel and gather results according to the policy"""
+        app = current_app._get_current_object() if has_app_context() else None
+        executor = self.get_executor()
+        
+        pending = {}
+        provider_deadlines = {}
+        results = []
+        for provider in providers:
+            provider_deadline = min(deadline_at, time.monotonic() + timeouts.get(provider, self.multi_provider_deadline))
+            if provider_deadline <= time.monotonic():
+                # Deadline already passed; don't start a call whose result would be dropped
+                results.append(self._timed_out(provider, False))
+                continue
+            provider_deadlines[provider] = provider_deadline
+            should_stop = lambda at=provider_deadline: stop_all.is_set() or time.monotonic() > at
+            future = executor.submit(
+                self._run_provider, app, provider, media_type, prompt, style, quality, user_id, should_stop
+            )
+            pending[future] = provider
+        
+        stopped_by_policy = False
+        while pending:
+            now = time.monotonic()
+            
+            # Give up on providers whose own budget or the deadline ran out
+            for future, provider in list(pending.items()):
+                if now >= provider_deadlines[provider]:
+                    del pending[future]
+                    results.append(self._timed_out(provider, provider_deadlines[provider] < deadline_at))
+            if not pending:
+                break
+            
+            next_deadline = min(provider_deadlines[provider] for provider in pending.values())
+            done, _ = wait(list(pending), timeout=max(next_deadline - now, 0), return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logging.error(f"Provider {provider} failed: {str(e)}")
+                    result = {'success': False, 'provider': provider, 'error': str(e)}
+                if result is not None:
+                    results.append(result)
+            
+            if policy == 'first_success' and any(r.get('success') for r in results):
+                stopped_by_policy = True
+                break
+        
+        # Anything still running is ignored; task-based providers cancel their task
+        stop_all.set()
+        for provider in pending.values():
+            if stopped_by_policy:
+                results.append({'success': False, 'provider': provider,
+                                'error': 'Cancelled after first success', 'cancelled': True})
+            else:
+                results.append(self._timed_out(provider, provider_deadlines[provider] < deadline_at))
+        
+        return results
+    
+    def _timed_out(self, provider: str, own_budget: bool) -> Dict[str, Any]:
+        """Result of a provider stopped by its own timeout or by the overall deadline"""
+        error = 'Provider timeout exceeded' if own_budget else 'Deadline exceeded'
+        return {'success': False, 'provider': provider, 'error': error, 'timed_out': True}
+    
+    def _run_provider(self, app, provider: str, media_type: str, prompt: str, style: str, quality: str,
+                      user_id: str, should_stop: Callable[[], bool]) -> Optional[Dict[str, Any]]:
+        """Call one provider; runs in its own app context when app is given"""
+        if app is not None:
+            with app.app_context():
+                return self._run_provider(None, provider, media_type, prompt, style, quality, user_id, should_stop)
+        
+        started = time.monotonic()
+        try:
+            if provider == 'openai' and media_type == 'image':
+                from src.services.media_generation_service import media_generation_service
+                result = media_generation_service.generate_image_with_dalle(
+                    prompt=prompt, platform='instagram', user_id=user_id
+                )
+            elif provider == 'stability' and media_type == 'image':
+                result = self.generate_with_stability_ai(
+                    prompt=prompt, style=style, quality=quality, user_id=user_id
+                )
+            elif provider == 'leonardo' and media_type == 'image':
+                result = self.generate_with_leonardo(
+                    prompt=prompt, style=style, user_id=user_id, should_stop=should_stop
+                )
+            elif provider == 'runway' and media_type == 'video':
+                result = self.generate_video_with_runway(
+                    prompt=prompt, style=style, quality=quality, user_id=user_id, should_stop=should_stop
+                )
+            elif provider == 'google_veo' and media_type == 'video':
+                result = self.generate_video_with_veo3(
+                    prompt=prompt, style=style, user_id=user_id
+                )
+            else:
+                return None
+            
+        except Exception as e:
+            logging.error(f"Provider {provider} failed: {str(e)}")
+            db.session.rollback()
+            result = {'success': False, 'error': str(e)}
+        
+        result['provider'] = provider
+        result['elapsed_ms'] = int((time.monotonic() - started) * 1000)
+        return result
+    
     def get_generation_cost_estimate(self, media_type: str, provider: str, 
                                    quality: str = 'standard', duration: int = None) -> Dict[str, Any]:
         """Get cost estimate for media generation"""
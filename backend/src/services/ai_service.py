@@ -1,19 +1,54 @@
 import os
 import json
+import logging
 import requests
-import openai
-from typing import Dict, List, Optional, Any
+import uuid
+from typing import Dict, List, Optional, Any, Iterator, Tuple
 from datetime import datetime
+from src.services.llm_cache_service import llm_cache_service
+from src.services.openai_client_service import openai_client_service
+from src.services.llm_provider_service import llm_provider_service
+from src.services.model_router_service import model_router_service
+from src.services.hashtag_engine_service import hashtag_engine_service
+from src.services.structured_output_service import structured_output_service
+from src.services.download_service import download_service
+from src.services.storage_service import storage_service
+from src.models.user import MediaFile, db
 
 class AIContentService:
     """Service for AI-powered content generation"""
     
-    def __init__(self):
-        # OpenAI configuration
-        self.openai_client = openai.OpenAI(
-            api_key=os.environ.get('OPENAI_API_KEY'),
-            base_url=os.environ.get('OPENAI_API_BASE', 'https://api.openai.com/v1')
+    @property
+    def openai_client(self):
+        """Client for the default LLM provider"""
+        return llm_provider_service.get_client()
+
+    def get_client(self, subscription_tier: str = None):
+        """Client for the LLM provider serving a subscription tier"""
+        return llm_provider_service.get_client(llm_provider_service.provider_for_tier(subscription_tier))
+    
+    def route(self, task: str, platform: str = None, subscription_tier: str = None,
+              platforms: List[str] = None, items: int = 1) -> Dict[str, Any]:
+        """Pick model and max_tokens for a task from the platform limits and the user's tier"""
+        configs = [self.platform_configs.get(name, {}) for name in (platforms or ([platform] if platform else []))]
+        return model_router_service.route(
+            task,
+            subscription_tier=subscription_tier,
+            max_length=sum(config.get('max_length', 1000) for config in configs) or None,
+            hashtag_count=sum(config.get('hashtag_count', 5) for config in configs),
+            items=len(configs) if platforms else items
         )
+    
+    def _model_used(self, subscription_tier: str, model: str) -> str:
+        """Model name to record on generated content"""
+        return llm_provider_service.model_name(llm_provider_service.provider_for_tier(subscription_tier), model)
+
+    def __init__(self):
+        # Generate text for all platforms of a project in one call
+        self.batch_text_generation = os.environ.get('AI_BATCH_TEXT_GENERATION', 'true').lower() == 'true'
+        
+        # Let the LLM pick the final hashtags from the locally ranked candidates
+        self.hashtag_llm_refinement = os.environ.get('HASHTAG_LLM_REFINEMENT', 'false').lower() == 'true'
         
         # Platform-specific configurations
         self.platform_configs = {
@@ -70,17 +105,76 @@ class AIContentService:
         }
     
     def generate_text_content(self, prompt: str, platform: str, tone: str = None, 
-                            brand_guidelines: str = None) -> Dict[str, Any]:
+                            brand_guidelines: str = None, subscription_tier: str = None) -> Dict[str, Any]:
         """Generate text content for a specific platform"""
         try:
-            platform_config = self.platform_configs.get(platform, {})
-            max_length = platform_config.get('max_length', 1000)
+            # Generate content with OpenAI
+            route = self.route('generation', platform=platform, subscription_tier=subscription_tier)
+            response = self.get_client(subscription_tier).chat.completions.create(
+                model=route['model'],
+                messages=self._build_text_messages(prompt, platform, tone, brand_guidelines),
+                max_tokens=route['max_tokens'],
+                temperature=0.7
+            )
+            model_router_service.record_usage('generation', route['model'], route['max_tokens'], response)
             
-            # Build system prompt
-            system_prompt = self._build_system_prompt(platform, tone, brand_guidelines)
+            generated_text = response.choices[0].message.content
             
-            # Build user prompt
-            user_prompt = f"""
+            return self._build_text_result(
+                generated_text, platform, tone, self._model_used(subscription_tier, route['model'])
+            )
+            
+        except Exception as e:
+            raise Exception(f"Failed to generate text content: {str(e)}")
+    
+    def stream_text_content(self, prompt: str, platform: str, tone: str = None,
+                            brand_guidelines: str = None, subscription_tier: str = None) -> Iterator[Tuple[str, Any]]:
+        """Stream text content for a specific platform.
+        
+        Yields ('delta', text) for every token chunk and finally
+        ('result', result) with the same result dict as generate_text_content.
+        """
+        try:
+            route = self.route('generation', platform=platform, subscription_tier=subscription_tier)
+            stream = self.get_client(subscription_tier).chat.completions.create(
+                model=route['model'],
+                messages=self._build_text_messages(prompt, platform, tone, brand_guidelines),
+                max_tokens=route['max_tokens'],
+                temperature=0.7,
+                stream=True,
+                stream_options={'include_usage': True}
+            )
+            
+            parts = []
+            for chunk in stream:
+                # The last chunk carries usage and no choices
+                if getattr(chunk, 'usage', None):
+                    model_router_service.record_usage('generation_stream', route['model'], route['max_tokens'], chunk)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield 'delta', delta
+            
+            yield 'result', self._build_text_result(
+                ''.join(parts), platform, tone, self._model_used(subscription_tier, route['model'])
+            )
+            
+        except Exception as e:
+            raise Exception(f"Failed to stream text content: {str(e)}")
+    
+    def _build_text_messages(self, prompt: str, platform: str, tone: str,
+                             brand_guidelines: str) -> List[Dict[str, str]]:
+        """Build chat messages for single-platform text generation"""
+        platform_config = self.platform_configs.get(platform, {})
+        max_length = platform_config.get('max_length', 1000)
+        
+        # Build system prompt
+        system_prompt = self._build_system_prompt(platform, tone, brand_guidelines)
+        
+        # Build user prompt
+        user_prompt = f"""
             Genereer social media content voor {platform} over het volgende onderwerp:
             {prompt}
             
@@ -91,41 +185,118 @@ class AIContentService:
             - Voeg relevante hashtags toe
             - Maak het engaging en platform-specifiek
             """
-            
-            # Generate content with OpenAI
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.7
-            )
-            
-            generated_text = response.choices[0].message.content
-            
-            # Extract hashtags
-            hashtags = self._extract_hashtags(generated_text)
-            
-            # Clean text (remove hashtags from main text)
-            clean_text = self._clean_text(generated_text)
-            
-            return {
-                'text': clean_text,
-                'hashtags': ' '.join(hashtags),
-                'character_count': len(clean_text),
-                'platform': platform,
-                'tone': tone,
-                'model_used': 'gpt-4.1-mini',
-                'generated_at': datetime.utcnow().isoformat()
-            }
-            
-        except Exception as e:
-            raise Exception(f"Failed to generate text content: {str(e)}")
+        
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def generate_text_content_batch(self, prompt: str, platforms: List[str], tone: str = None,
+                                    brand_guidelines: str = None, subscription_tier: str = None) -> Dict[str, Any]:
+        """Generate text content for several platforms in a single structured call.
+        
+        Returns a dict keyed by platform. Platforms missing from the batch
+        response are generated with per-platform calls; if that also fails the
+        exception is stored in place of the result.
+        """
+        platforms = list(dict.fromkeys(platforms))
+        results = {}
+        
+        if len(platforms) > 1:
+            try:
+                results = self._generate_text_batch(prompt, platforms, tone, brand_guidelines, subscription_tier)
+            except Exception as e:
+                logging.warning(f"Batched text generation failed, falling back to per-platform calls: {str(e)}")
+                results = {}
+        
+        # Fall back to per-platform calls for anything the batch did not cover
+        for platform in platforms:
+            if platform in results:
+                continue
+            try:
+                results[platform] = self.generate_text_content(
+                    prompt=prompt,
+                    platform=platform,
+                    tone=tone,
+                    brand_guidelines=brand_guidelines,
+                    subscription_tier=subscription_tier
+                )
+            except Exception as e:
+                results[platform] = e
+        
+        return results
+    
+    def _generate_text_batch(self, prompt: str, platforms: List[str], tone: str,
+                             brand_guidelines: str, subscription_tier: str = None) -> Dict[str, Dict[str, Any]]:
+        """Single chat completion returning a JSON object with one variant per platform"""
+        system_prompt = self._build_batch_system_prompt(platforms, tone, brand_guidelines)
+        
+        user_prompt = f"""
+        Genereer social media content voor de volgende platforms over het volgende onderwerp:
+        {prompt}
+        
+        Platforms: {', '.join(platforms)}
+        Toon: {tone or 'neutraal'}
+        
+        Geef voor elk platform een aparte tekst die voldoet aan de richtlijnen van dat platform,
+        inclusief relevante hashtags aan het einde.
+        """
+        
+        schema = structured_output_service.object_schema({
+            platform: structured_output_service.object_schema({'text': {'type': 'string'}})
+            for platform in platforms
+        })
+        
+        # One response has to hold every variant, so the budget covers all platform limits.
+        # No re-ask: the caller falls back to per-platform calls instead
+        route = self.route('generation_batch', platforms=platforms, subscription_tier=subscription_tier)
+        variants = structured_output_service.complete(
+            self.get_client(subscription_tier),
+            call_site='generation_batch',
+            schema=schema,
+            cache=False,
+            max_reasks=0,
+            model=route['model'],
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            max_tokens=route['max_tokens'],
+            temperature=0.7
+        )
+        
+        model = self._model_used(subscription_tier, route['model'])
+        results = {}
+        for platform in platforms:
+            variant = variants.get(platform)
+            text = variant.get('text') if isinstance(variant, dict) else variant
+            if isinstance(text, str) and text.strip():
+                results[platform] = self._build_text_result(text, platform, tone, model, batched=True)
+        
+        return results
+    
+    def _build_text_result(self, generated_text: str, platform: str, tone: str, model: str,
+                           batched: bool = False) -> Dict[str, Any]:
+        """Split generated text into clean text and hashtags"""
+        # Extract hashtags
+        hashtags = self._extract_hashtags(generated_text)
+        
+        # Clean text (remove hashtags from main text)
+        clean_text = self._clean_text(generated_text)
+        
+        return {
+            'text': clean_text,
+            'hashtags': ' '.join(hashtags),
+            'character_count': len(clean_text),
+            'platform': platform,
+            'tone': tone,
+            'model_used': model,
+            'batched': batched,
+            'generated_at': datetime.utcnow().isoformat()
+        }
     
     def generate_image_prompt(self, content_prompt: str, platform: str, 
-                            style: str = None) -> str:
+                            style: str = None, subscription_tier: str = None) -> str:
         """Generate an optimized image prompt for DALL-E"""
         try:
             platform_styles = {
@@ -158,22 +329,26 @@ class AIContentService:
             - Professioneel overkomen
             """
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            route = self.route('image_prompt', platform=platform, subscription_tier=subscription_tier)
+            content = llm_cache_service.cached_completion(
+                self.get_client(subscription_tier),
+                call_site='image_prompt',
+                model=route['model'],
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                max_tokens=200,
+                max_tokens=route['max_tokens'],
                 temperature=0.8
             )
             
-            return response.choices[0].message.content.strip()
+            return content.strip()
             
         except Exception as e:
             raise Exception(f"Failed to generate image prompt: {str(e)}")
     
-    def analyze_content_quality(self, content: str, platform: str) -> Dict[str, Any]:
+    def analyze_content_quality(self, content: str, platform: str,
+                                subscription_tier: str = None) -> Dict[str, Any]:
         """Analyze content quality and provide suggestions"""
         try:
             platform_config = self.platform_configs.get(platform, {})
@@ -198,79 +373,93 @@ class AIContentService:
             Geef je antwoord in JSON format.
             """
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            score = {'type': 'number'}
+            route = self.route('analysis', platform=platform, subscription_tier=subscription_tier)
+            analysis = structured_output_service.complete(
+                self.get_client(subscription_tier),
+                call_site='content_quality',
+                schema=structured_output_service.object_schema({
+                    'engagement_score': score,
+                    'platform_score': score,
+                    'tone_score': score,
+                    'overall_score': score,
+                    'length_feedback': {'type': 'string'},
+                    'suggestions': {'type': 'array', 'items': {'type': 'string'}}
+                }),
+                ttl=86400,
+                cache_creative=True,
+                model=route['model'],
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                max_tokens=300,
+                max_tokens=route['max_tokens'],
                 temperature=0.3
             )
             
-            # Parse JSON response
-            try:
-                analysis = json.loads(response.choices[0].message.content)
-            except json.JSONDecodeError:
-                # Fallback if JSON parsing fails
-                analysis = {
-                    'engagement_score': 7,
-                    'platform_score': 8,
-                    'tone_score': 7,
-                    'overall_score': 7.3,
-                    'suggestions': ['Content geanalyseerd maar JSON parsing gefaald']
-                }
-            
             return analysis
             
         except Exception as e:
-            return {
-                'engagement_score': 5,
-                'platform_score': 5,
-                'tone_score': 5,
-                'overall_score': 5.0,
-                'suggestions': [f'Analyse gefaald: {str(e)}']
-            }
+            raise Exception(f"Failed to analyze content quality: {str(e)}")
     
-    def generate_hashtags(self, content: str, platform: str, count: int = None) -> List[str]:
-        """Generate relevant hashtags for content"""
+    def generate_hashtags(self, content: str, platform: str, count: int = None,
+                          subscription_tier: str = None, refine: bool = None) -> List[str]:
+        """Generate relevant hashtags for content.
+        
+        Hashtags are ranked locally by the hashtag engine. With refine (or
+        HASHTAG_LLM_REFINEMENT=true) an LLM picks the final set from the
+        local candidates; if that fails the local ranking is returned.
+        """
+        platform_config = self.platform_configs.get(platform, {})
+        default_count = platform_config.get('hashtag_count', 5)
+        hashtag_count = count or default_count
+        
+        hashtags = hashtag_engine_service.suggest(content, platform, hashtag_count * 2)
+        
+        if refine is None:
+            refine = self.hashtag_llm_refinement
+        if not refine or not hashtags:
+            return hashtags[:hashtag_count]
+        
         try:
-            platform_config = self.platform_configs.get(platform, {})
-            default_count = platform_config.get('hashtag_count', 5)
-            hashtag_count = count or default_count
-            
             system_prompt = f"""
-            Genereer relevante hashtags voor {platform} content.
+            Kies relevante hashtags voor {platform} content.
             Gebruik populaire en niche hashtags die engagement verhogen.
             """
             
             user_prompt = f"""
-            Genereer {hashtag_count} hashtags voor deze content:
+            Kies de {hashtag_count} beste hashtags voor deze content:
             "{content}"
             
             Platform: {platform}
+            Kandidaten: {' '.join(hashtags)}
             
+            Gebruik bij voorkeur kandidaten; je mag er maximaal 2 eigen hashtags aan toevoegen.
             Geef alleen de hashtags terug, gescheiden door spaties, beginnend met #
             """
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            route = model_router_service.route('hashtags', subscription_tier=subscription_tier,
+                                               hashtag_count=hashtag_count)
+            hashtags_text = llm_cache_service.cached_completion(
+                self.get_client(subscription_tier),
+                call_site='hashtags',
+                ttl=21600,
+                cache_creative=True,
+                model=route['model'],
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                max_tokens=100,
+                max_tokens=route['max_tokens'],
                 temperature=0.6
-            )
+            ).strip()
+            refined = [tag.strip() for tag in hashtags_text.split() if tag.startswith('#')]
             
-            hashtags_text = response.choices[0].message.content.strip()
-            hashtags = [tag.strip() for tag in hashtags_text.split() if tag.startswith('#')]
-            
-            return hashtags[:hashtag_count]
+            return (refined or hashtags)[:hashtag_count]
             
         except Exception as e:
-            # Fallback hashtags
-            return [f'#{platform}', '#ai', '#content', '#socialmedia']
+            logging.warning(f"Hashtag refinement failed, using local ranking: {str(e)}")
+            return hashtags[:hashtag_count]
     
     def _build_system_prompt(self, platform: str, tone: str, brand_guidelines: str) -> str:
         """Build system prompt for content generation"""
@@ -303,6 +492,40 @@ class AIContentService:
         
         return system_prompt
     
+    def _build_batch_system_prompt(self, platforms: List[str], tone: str, brand_guidelines: str) -> str:
+        """Build one system prompt covering the guidelines of several platforms"""
+        system_prompt = """
+        Je bent een expert social media content creator voor meerdere platforms.
+        
+        Platform specifieke richtlijnen:
+        """
+        
+        for platform in platforms:
+            platform_config = self.platform_configs.get(platform, {})
+            tone_prompt = platform_config.get('tone_prompts', {}).get(tone, '')
+            system_prompt += f"""
+        {platform}:
+        - Maximale lengte: {platform_config.get('max_length', 1000)} karakters
+        - Gebruik maximaal {platform_config.get('hashtag_count', 5)} hashtags
+        - Toon en stijl: {tone_prompt or 'passend bij het platform'}
+        """
+        
+        if brand_guidelines:
+            system_prompt += f"\n\nMerk richtlijnen:\n{brand_guidelines}"
+        
+        system_prompt += """
+        
+        Algemene richtlijnen:
+        - Schrijf in het Nederlands
+        - Maak content engaging en actionable
+        - Gebruik een natuurlijke, menselijke toon
+        - Voeg relevante hashtags toe aan het einde
+        - Zorg dat de content platform-specifiek is
+        - Antwoord uitsluitend met een JSON object met per platform een "text" veld
+        """
+        
+        return system_prompt
+    
     def _extract_hashtags(self, text: str) -> List[str]:
         """Extract hashtags from generated text"""
         import re
@@ -332,11 +555,10 @@ class AIContentService:
 class MediaGenerationService:
     """Service for AI-powered media generation"""
     
-    def __init__(self):
-        self.openai_client = openai.OpenAI(
-            api_key=os.environ.get('OPENAI_API_KEY'),
-            base_url=os.environ.get('OPENAI_API_BASE', 'https://api.openai.com/v1')
-        )
+    @property
+    def openai_client(self):
+        """Shared OpenAI client for this process"""
+        return openai_client_service.get_client()
     
     def generate_image(self, prompt: str, size: str = "1024x1024", 
                       quality: str = "standard") -> Dict[str, Any]:
@@ -366,18 +588,35 @@ class MediaGenerationService:
         except Exception as e:
             raise Exception(f"Failed to generate image: {str(e)}")
     
+    def save_generated_image(self, image_url: str, user_id: str, metadata: Dict[str, Any] = None) -> MediaFile:
+        """Download a generated image into media storage as a MediaFile (caller commits)"""
+        os.makedirs(storage_service.staging_path, exist_ok=True)
+        filename = f"{uuid.uuid4()}.png"
+        staging_path = os.path.join(storage_service.staging_path, filename)
+        download = download_service.download(image_url, staging_path)
+        
+        media_file = MediaFile(
+            user_id=user_id,
+            filename=filename,
+            original_filename=f"content_{(metadata or {}).get('platform', 'image')}.png",
+            file_type='image',
+            file_size=download['file_size'],
+            storage_path=staging_path,
+            mime_type='image/png',
+            file_metadata=dict(metadata or {}, generated_by='dall-e-3', sha256=download['sha256']),
+            content_hash=download['sha256']
+        )
+        storage_service.attach(media_file)
+        db.session.add(media_file)
+        db.session.flush()
+        return media_file
+    
     def download_and_save_image(self, image_url: str, filename: str, 
                                storage_path: str = "/tmp") -> str:
         """Download and save generated image"""
         try:
-            response = requests.get(image_url)
-            response.raise_for_status()
-            
             file_path = os.path.join(storage_path, filename)
-            
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
-            
+            download_service.download(image_url, file_path)
             return file_path
             
         except Exception as e:
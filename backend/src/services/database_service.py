@@ -4,7 +4,8 @@ import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
-from sqlalchemy import create_engine, text
+from sqlalchemy import UniqueConstraint, create_engine, inspect, text
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.pool import QueuePool
 from celery import Celery
 from src.models.user import db
@@ -22,14 +23,20 @@ class DatabaseService:
         """Setup Redis connection for caching and session management"""
         try:
             redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
-            self.redis_client = redis.from_url(
-                redis_url,
-                decode_responses=True,
-                socket_connect_timeout=5,
-                socket_timeout=5,
-                retry_on_timeout=True,
-                health_check_interval=30
-            )
+            
+            if redis_url.startswith('fakeredis://'):
+                # In-process Redis stand-in for local tests
+                import fakeredis
+                self.redis_client = fakeredis.FakeRedis(decode_responses=True)
+            else:
+                self.redis_client = redis.from_url(
+                    redis_url,
+                    decode_responses=True,
+                    socket_connect_timeout=5,
+                    socket_timeout=5,
+                    retry_on_timeout=True,
+                    health_check_interval=30
+                )
             
             # Test connection
             self.redis_client.ping()
@@ -64,6 +71,26 @@ class DatabaseService:
                 task_soft_time_limit=25 * 60,  # 25 minutes
                 worker_prefetch_multiplier=1,
                 worker_max_tasks_per_child=1000,
+                # Generation jobs run on their own queue so the worker pool
+                # can be scaled separately from the web tier
+                task_routes={
+                    'src.tasks.run_generation_job': {'queue': 'generation'},
+                    'src.tasks.ingest_trends': {'queue': 'trends'},
+                },
+                # Trend ingestion, so request handlers only read the trend store
+                beat_schedule={
+                    'ingest-trends': {
+                        'task': 'src.tasks.ingest_trends',
+                        'schedule': float(os.getenv('TREND_INGEST_INTERVAL', '900')),
+                        'options': {'expires': float(os.getenv('TREND_INGEST_INTERVAL', '900'))},
+                    },
+                },
+                # Only ack after the task finished, so jobs survive worker restarts
+                task_acks_late=True,
+                task_reject_on_worker_lost=True,
+                broker_transport_options={'visibility_timeout': 60 * 60},
+                # Run tasks in-process (tests with memory:// broker)
+                task_always_eager=os.getenv('CELERY_TASK_ALWAYS_EAGER', 'false').lower() == 'true',
             )
             
             logging.info("Celery configured successfully")
@@ -90,6 +117,52 @@ class DatabaseService:
             }
         }
     
+    def upgrade_schema(self) -> List[str]:
+        """Create missing tables and add the columns new models added to existing ones.
+
+        db.create_all() never alters an existing table, so columns added to a
+        model later (e.g. media_files.parent_id, variant_*, content_hash,
+        prompt_fingerprint) are added here with ALTER TABLE, together with the
+        indexes and unique constraints that use them. Only nullable columns
+        can be added this way. Returns the statements that were run.
+        """
+        db.create_all()
+        engine = db.engine
+        inspector = inspect(engine)
+        
+        statements = []
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            added = [column for column in table.columns if column.name not in existing]
+            if not added:
+                continue
+            
+            for column in added:
+                if not column.nullable:
+                    raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name}; migrate it by hand")
+                statement = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                for foreign_key in column.foreign_keys:
+                    statement += f" REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name})"
+                statements.append(statement)
+            
+            added_names = {column.name for column in added}
+            for index in table.indexes:
+                if added_names & {column.name for column in index.columns}:
+                    statements.append(str(CreateIndex(index).compile(dialect=engine.dialect)))
+            for constraint in table.constraints:
+                columns = [column.name for column in constraint.columns]
+                if isinstance(constraint, UniqueConstraint) and added_names & set(columns):
+                    # A unique index works on every backend, unlike ADD CONSTRAINT on SQLite
+                    statements.append(
+                        f"CREATE UNIQUE INDEX {constraint.name} ON {table.name} ({', '.join(columns)})"
+                    )
+        
+        with engine.begin() as connection:
+            for statement in statements:
+                logging.info(f"Schema upgrade: {statement}")
+                connection.execute(text(statement))
+        return statements
+    
     def test_database_connection(self) -> Dict[str, Any]:
         """Test database connection and return status"""
         try:
@@ -0,0 +1,116 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any
+
+
+class DownloadError(Exception):
+    """Raised when a download can't be completed"""
+
+
+class DownloadService:
+    """Streaming downloads of generated media to local storage.
+
+    Responses are written in chunks to "<path>.part" while the SHA-256 and
+    size are computed, then renamed into place, so memory stays flat however
+    large the file and readers never see a half-written file. Interrupted
+    transfers are retried and resumed with a Range request when the server
+    supports it. One pooled requests.Session is shared per process.
+    """
+
+    def __init__(self):
+        self.chunk_size = int(os.getenv('DOWNLOAD_CHUNK_SIZE', str(256 * 1024)))  # bytes
+        self.max_bytes = int(os.getenv('DOWNLOAD_MAX_BYTES', str(1024 * 1024 * 1024)))  # bytes
+        self.max_retries = int(os.getenv('DOWNLOAD_MAX_RETRIES', '3'))
+        self.connect_timeout = float(os.getenv('DOWNLOAD_CONNECT_TIMEOUT', '10'))  # seconds
+        self.read_timeout = float(os.getenv('DOWNLOAD_READ_TIMEOUT', '60'))  # seconds, between chunks
+        self.pool_size = int(os.getenv('DOWNLOAD_POOL_SIZE', '20'))
+
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get_session(self) -> requests.Session:
+        """Get the shared session, recreating it after a fork"""
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+                self._pid = os.getpid()
+            return self._session
+
+    def download(self, url: str, file_path: str, headers: Dict[str, str] = None) -> Dict[str, Any]:
+        """Download url to file_path.
+
+        Returns file_path, file_size, sha256, content_type and the number of
+        resumed attempts. Raises DownloadError when all retries fail.
+        """
+        partial_path = f"{file_path}.part"
+        state = {'size': 0, 'sha256': hashlib.sha256(), 'content_type': None}
+        resumes = 0
+
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self._transfer(url, partial_path, headers or {}, state)
+                    break
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                    if attempt == self.max_retries:
+                        raise DownloadError(f"Download of {url} failed after {attempt + 1} attempts: {str(e)}")
+                    logging.warning(f"Download interrupted at {state['size']} bytes, retrying: {str(e)}")
+                    resumes += 1
+                    time.sleep(min(2 ** attempt, 10))
+
+            with open(partial_path, 'rb+') as f:
+                os.fsync(f.fileno())
+            os.replace(partial_path, file_path)
+        except requests.HTTPError as e:
+            raise DownloadError(f"Download of {url} failed: {str(e)}")
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+        return {
+            'file_path': file_path,
+            'file_size': state['size'],
+            'sha256': state['sha256'].hexdigest(),
+            'content_type': state['content_type'],
+            'resumed': resumes
+        }
+
+    def _transfer(self, url: str, partial_path: str, headers: Dict[str, str], state: Dict[str, Any]):
+        """One attempt; continues from the bytes already written when possible"""
+        request_headers = dict(headers)
+        if state['size']:
+            request_headers['Range'] = f"bytes={state['size']}-"
+
+        with self.get_session().get(url, headers=request_headers, stream=True,
+                                    timeout=(self.connect_timeout, self.read_timeout)) as response:
+            response.raise_for_status()
+
+            if state['size'] and response.status_code != 206:
+                # Server ignored the Range header; start over
+                state.update(size=0, sha256=hashlib.sha256())
+            mode = 'ab' if state['size'] else 'wb'
+            state['content_type'] = state['content_type'] or response.headers.get('Content-Type')
+
+            with open(partial_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if not chunk:
+                        continue
+                    state['size'] += len(chunk)
+                    if state['size'] > self.max_bytes:
+                        raise DownloadError(f"Download of {url} exceeds {self.max_bytes} bytes")
+                    state['sha256'].update(chunk)
+                    f.write(chunk)
+
+
+# Service instance
+download_service = DownloadService()
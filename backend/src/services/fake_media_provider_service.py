@@ -0,0 +1,88 @@
+import io
+import os
+import json
+import uuid
+import random
+import hashlib
+import logging
+import time
+import threading
+import requests
+from typing import Dict, Any
+from PIL import Image, ImageDraw
+
+
+class FakeMediaProviderService:
+    """Local stand-in for an async image provider that reports back by webhook.
+
+    submit() returns a task ID at once; after a delay a signed "processing"
+    and a signed "succeeded" (or "failed") callback are posted to the
+    webhook URL, optionally several times to exercise de-duplication. The
+    output image is served from /api/webhooks/fake/outputs/<task_id>.png.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('MEDIA_FAKE_PROVIDER', 'false').lower() == 'true'
+        self.delay = float(os.getenv('FAKE_PROVIDER_DELAY', '2'))  # seconds
+        self.failure_rate = float(os.getenv('FAKE_PROVIDER_FAILURE_RATE', '0'))
+        self.deliveries = int(os.getenv('FAKE_PROVIDER_DELIVERIES', '1'))  # >1 redelivers each event
+        self.delivery_attempts = 3
+
+    def submit(self, prompt: str, webhook_url: str, secret: str) -> str:
+        """Accept a generation and schedule its callbacks"""
+        task_id = f"fake-{uuid.uuid4()}"
+        failed = random.random() < self.failure_rate
+        timer = threading.Timer(self.delay, self._deliver, args=(task_id, webhook_url, secret, failed))
+        timer.daemon = True
+        timer.start()
+        return task_id
+
+    def render(self, task_id: str, size: int = 512) -> bytes:
+        """Deterministic PNG output for a task"""
+        seed = int(hashlib.sha256(task_id.encode('utf-8')).hexdigest()[:8], 16)
+        rng = random.Random(seed)
+        image = Image.new('RGB', (size, size), tuple(rng.randint(0, 255) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(8):
+            x0, y0 = rng.randint(0, size), rng.randint(0, size)
+            x1, y1 = x0 + rng.randint(20, size // 2), y0 + rng.randint(20, size // 2)
+            draw.ellipse([x0, y0, x1, y1], fill=tuple(rng.randint(0, 255) for _ in range(3)))
+
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def build_event(self, task_id: str, status: str, webhook_url: str) -> Dict[str, Any]:
+        """Callback payload in the generic webhook format"""
+        event = {'task_id': task_id, 'status': status}
+        if status == 'succeeded':
+            base_url = webhook_url.rsplit('/api/webhooks/', 1)[0]
+            event['output_url'] = f"{base_url}/api/webhooks/fake/outputs/{task_id}.png"
+        elif status == 'failed':
+            event['error'] = 'Fake provider failure'
+        return event
+
+    def _deliver(self, task_id: str, webhook_url: str, secret: str, failed: bool):
+        from src.services.webhook_service import webhook_service
+
+        for status in ('processing', 'failed' if failed else 'succeeded'):
+            body = json.dumps(self.build_event(task_id, status, webhook_url)).encode('utf-8')
+            event_id = f"{task_id}:{status}"
+            for _ in range(self.deliveries):
+                self._post(webhook_url, body, webhook_service.signed_headers(secret, body, event_id))
+
+    def _post(self, webhook_url: str, body: bytes, headers: Dict[str, str]):
+        # Retry like a real provider: non-2xx responses are delivered again
+        for attempt in range(self.delivery_attempts):
+            try:
+                response = requests.post(webhook_url, data=body, headers=headers, timeout=10)
+                if response.status_code < 300:
+                    return
+                logging.warning(f"Fake provider webhook got {response.status_code}")
+            except Exception as e:
+                logging.warning(f"Fake provider webhook failed: {str(e)}")
+            time.sleep(attempt + 1)
+
+
+# Service instance
+fake_media_provider_service = FakeMediaProviderService()
@@ -0,0 +1,69 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, List
+
+
+class GenerationExecutorService:
+    """Bounded thread pool shared by all content generation projects"""
+
+    def __init__(self):
+        # Global cap: total generation calls in flight in this process
+        self.max_workers = int(os.getenv('GENERATION_MAX_WORKERS', '16'))
+        # Per-project cap: calls in flight for a single project
+        self.project_concurrency = int(os.getenv('GENERATION_PROJECT_CONCURRENCY', '4'))
+
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        """Get the shared executor, recreating it after a fork"""
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='content-generation'
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def run_all(self, jobs: List[Callable[[], Any]], max_concurrency: int = None) -> List[Any]:
+        """Run jobs on the shared pool and wait for all of them.
+
+        At most ``max_concurrency`` jobs of this batch are submitted at once, so a
+        single large project cannot take over the whole pool. Results are returned
+        in job order; a job that raised has its exception returned in its place.
+        """
+        if not jobs:
+            return []
+
+        limit = max(1, min(max_concurrency or self.project_concurrency, self.max_workers))
+        executor = self.get_executor()
+
+        results: List[Any] = [None] * len(jobs)
+        pending = {}
+        next_index = 0
+
+        while next_index < len(jobs) or pending:
+            # Keep the window full
+            while next_index < len(jobs) and len(pending) < limit:
+                future = executor.submit(jobs[next_index])
+                pending[future] = next_index
+                next_index += 1
+
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    logging.error(f"Generation job {index} failed: {str(e)}")
+                    results[index] = e
+
+        return results
+
+
+# Service instance
+generation_executor_service = GenerationExecutorService()
@@ -0,0 +1,199 @@
+import os
+import random
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from src.models.user import GenerationJob, db
+from src.services.database_service import database_service
+
+
+class GenerationIncomplete(Exception):
+    """Raised when some platform/content type combinations failed"""
+
+
+class GenerationJobService:
+    """Service for durable content generation jobs backed by Celery"""
+
+    TASK_NAME = 'src.tasks.run_generation_job'
+
+    def __init__(self):
+        self.max_attempts = int(os.getenv('GENERATION_JOB_MAX_ATTEMPTS', '5'))
+        self.retry_backoff_base = int(os.getenv('GENERATION_JOB_RETRY_BACKOFF', '10'))  # seconds
+        self.retry_backoff_max = int(os.getenv('GENERATION_JOB_RETRY_BACKOFF_MAX', '600'))  # seconds
+
+    def submit(self, app, project_id: str, user_id: str, job_type: str, parameters: Dict[str, Any],
+               idempotency_key: str = None) -> Tuple[GenerationJob, bool]:
+        """Create and enqueue a generation job.
+
+        Returns (job, created). When a job with the same idempotency key already
+        exists for the user, that job is returned and nothing is enqueued. The
+        job commits together with pending session changes (such as its new
+        project), which are rolled back when a concurrent request holds the key.
+        """
+        if idempotency_key:
+            existing = self.find_by_idempotency_key(user_id, idempotency_key)
+            if existing:
+                return existing, False
+
+        job = GenerationJob(
+            project_id=project_id,
+            user_id=user_id,
+            job_type=job_type,
+            idempotency_key=idempotency_key,
+            status='queued',
+            parameters=parameters
+        )
+        db.session.add(job)
+
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Lost a race against a concurrent request with the same key
+            db.session.rollback()
+            return self.find_by_idempotency_key(user_id, idempotency_key), False
+
+        self.enqueue(app, job)
+        return job, True
+
+    def enqueue(self, app, job: GenerationJob, countdown: int = None):
+        """Send the job to the Celery worker pool, falling back to a local thread"""
+        task_id = None
+        if database_service.celery_app:
+            try:
+                task = database_service.celery_app.signature(
+                    self.TASK_NAME, args=(job.id,)
+                ).apply_async(countdown=countdown)
+                task_id = task.id
+            except Exception as e:
+                logging.error(f"Failed to enqueue generation job {job.id}: {str(e)}")
+
+        if task_id:
+            job.celery_task_id = task_id
+            db.session.commit()
+            return
+
+        # No broker available: keep the previous in-process behaviour
+        logging.warning(f"Celery unavailable, running generation job {job.id} in-process")
+        thread = threading.Thread(target=self.run_inline, args=(app, job.id))
+        thread.daemon = True
+        thread.start()
+
+    def find_by_idempotency_key(self, user_id: str, idempotency_key: str) -> Optional[GenerationJob]:
+        """Get an existing job for an idempotency key"""
+        return GenerationJob.query.filter_by(user_id=user_id, idempotency_key=idempotency_key).first()
+
+    def get_job(self, job_id: str) -> Optional[GenerationJob]:
+        """Get job by ID"""
+        return GenerationJob.query.filter_by(id=job_id).first()
+
+    def execute(self, app, job_id: str) -> Optional[Dict[str, Any]]:
+        """Run one attempt of a job.
+
+        Raises GenerationIncomplete when some combinations failed, so the caller
+        can decide whether to retry.
+        """
+        from src.routes.content import run_project_generation, finish_project_generation
+
+        with app.app_context():
+            job = self.get_job(job_id)
+            if not job:
+                logging.warning(f"Generation job {job_id} not found")
+                return None
+
+            # Redelivered message for a job that already finished
+            if job.status in ('succeeded', 'failed'):
+                return job.to_dict()
+
+            job.status = 'running'
+            job.attempts += 1
+            job.started_at = job.started_at or datetime.utcnow()
+            job.next_retry_at = None
+            db.session.commit()
+
+            project_id = job.project_id
+            parameters = dict(job.parameters)
+
+        failed = run_project_generation(
+            app,
+            project_id,
+            parameters['prompt'],
+            parameters['platforms'],
+            parameters['content_types'],
+            parameters.get('tone'),
+            parameters.get('brand_guidelines')
+        )
+
+        if failed:
+            raise GenerationIncomplete(
+                'Generation failed for: ' + ', '.join(f"{platform}/{content_type}" for platform, content_type in failed)
+            )
+
+        finish_project_generation(app, project_id, failed)
+
+        with app.app_context():
+            job = self.get_job(job_id)
+            job.status = 'succeeded'
+            job.last_error = None
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            return job.to_dict()
+
+    def can_retry(self, app, job_id: str) -> bool:
+        """Check if the job has attempts left"""
+        with app.app_context():
+            job = self.get_job(job_id)
+            return bool(job) and job.attempts < self.max_attempts
+
+    def retry_countdown(self, attempts: int) -> int:
+        """Exponential backoff with full jitter"""
+        ceiling = min(self.retry_backoff_max, self.retry_backoff_base * (2 ** max(attempts - 1, 0)))
+        return random.randint(self.retry_backoff_base, max(ceiling, self.retry_backoff_base))
+
+    def mark_retrying(self, app, job_id: str, error: Exception) -> int:
+        """Record a failed attempt that will be retried; returns the countdown"""
+        with app.app_context():
+            job = self.get_job(job_id)
+            countdown = self.retry_countdown(job.attempts)
+            job.status = 'retrying'
+            job.last_error = str(error)
+            job.next_retry_at = datetime.utcnow() + timedelta(seconds=countdown)
+            db.session.commit()
+            return countdown
+
+    def mark_failed(self, app, job_id: str, error: Exception):
+        """Record the final failure of a job"""
+        from src.routes.content import finish_project_generation
+
+        with app.app_context():
+            db.session.rollback()
+            job = self.get_job(job_id)
+            if not job:
+                return
+            job.status = 'failed'
+            job.last_error = str(error)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            project_id = job.project_id
+
+        finish_project_generation(app, project_id, failed=True)
+
+    def run_inline(self, app, job_id: str):
+        """Run a job with retries in the current process (no Celery)"""
+        import time
+
+        while True:
+            try:
+                self.execute(app, job_id)
+                return
+            except Exception as e:
+                logging.error(f"Generation job {job_id} attempt failed: {str(e)}")
+                if not self.can_retry(app, job_id):
+                    self.mark_failed(app, job_id, e)
+                    return
+                time.sleep(self.mark_retrying(app, job_id, e))
+
+
+# Service instance
+generation_job_service = GenerationJobService()
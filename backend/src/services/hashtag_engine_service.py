@@ -0,0 +1,250 @@
+import os
+import re
+import math
+import time
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Any, Tuple
+from flask import has_app_context
+from sqlalchemy import or_
+from src.services.database_service import database_service
+
+
+class HashtagIndex:
+    """Hashtag vocabulary with per-platform frequency and co-occurrence counts"""
+
+    def __init__(self):
+        self.documents = 0
+        self.term_df = Counter()              # term -> documents containing it
+        self.tag_terms = defaultdict(Counter)  # tag -> terms of the posts using it
+        self.term_tags = defaultdict(set)      # term -> tags seen next to it
+        self.platform_df = defaultdict(Counter)  # platform -> tag -> posts using it
+        self.cooccurrence = defaultdict(Counter)  # tag -> tag -> posts using both
+        self.display = defaultdict(Counter)    # tag -> spelling as used
+        self.tag_norms = {}
+
+    def add(self, platform: str, terms: List[str], tags: List[str]):
+        """Add one post to the index"""
+        self.documents += 1
+        unique_terms = set(terms)
+        self.term_df.update(unique_terms)
+
+        keys = list(dict.fromkeys(tag.lower() for tag in tags))
+        for tag in tags:
+            self.display[tag.lower()][tag] += 1
+
+        for key in keys:
+            self.tag_terms[key].update(terms)
+            self.platform_df[platform][key] += 1
+            self.platform_df['all'][key] += 1
+            for term in unique_terms:
+                self.term_tags[term].add(key)
+            for other in keys:
+                if other != key:
+                    self.cooccurrence[key][other] += 1
+
+    def finalize(self):
+        """Precompute TF-IDF norms of the tag profiles"""
+        self.tag_norms = {
+            tag: math.sqrt(sum((count * self.idf(term)) ** 2 for term, count in terms.items())) or 1.0
+            for tag, terms in self.tag_terms.items()
+        }
+
+    def idf(self, term: str) -> float:
+        return math.log((self.documents + 1) / (self.term_df.get(term, 0) + 1)) + 1
+
+    def display_form(self, tag: str) -> str:
+        forms = self.display.get(tag)
+        return forms.most_common(1)[0][0] if forms else tag
+
+
+class HashtagEngineService:
+    """Local hashtag extraction and ranking.
+
+    Builds a vocabulary from previously generated content and scraped trend
+    topics and ranks candidates for new text with TF-IDF similarity,
+    keyword overlap, platform popularity and co-occurrence. No network calls.
+    """
+
+    TRENDS_CACHE_KEY = 'hashtag_engine:trends'
+
+    STOPWORDS = {
+        # Dutch
+        'de', 'het', 'een', 'en', 'van', 'voor', 'met', 'op', 'aan', 'in', 'is', 'dat', 'die', 'dit',
+        'deze', 'je', 'jij', 'jouw', 'wij', 'we', 'ons', 'onze', 'zijn', 'niet', 'ook', 'maar', 'als',
+        'bij', 'naar', 'uit', 'om', 'te', 'er', 'wat', 'hoe', 'wordt', 'worden', 'meer', 'nog', 'kan',
+        'door', 'over', 'tot', 'dan', 'of', 'hun', 'heeft', 'hebben', 'was', 'waar', 'wie', 'elke',
+        'al', 'alle', 'zo', 'nu', 'geen', 'jullie', 'ze', 'zij', 'hij', 'ik', 'mijn', 'mij',
+        # English
+        'the', 'and', 'for', 'with', 'you', 'your', 'are', 'this', 'that', 'from', 'our', 'have',
+        'has', 'was', 'but', 'not', 'all', 'can', 'more', 'will', 'about', 'into', 'what', 'how',
+        'its', 'out', 'they', 'their', 'who', 'why', 'when', 'new', 'get', 'just'
+    }
+
+    def __init__(self):
+        self.index_ttl = int(os.getenv('HASHTAG_INDEX_TTL', '900'))  # seconds
+        self.max_rows = int(os.getenv('HASHTAG_INDEX_MAX_ROWS', '5000'))
+        self.trends_ttl = int(os.getenv('HASHTAG_TRENDS_TTL', '21600'))  # seconds
+
+        self._index = None
+        self._trends = {}
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def suggest(self, text: str, platform: str, count: int = 5,
+                exclude: List[str] = None) -> List[str]:
+        """Rank hashtags for a text, best first"""
+        return [tag for tag, _ in self.rank(text, platform, count, exclude)]
+
+    def rank(self, text: str, platform: str, count: int = 5,
+             exclude: List[str] = None) -> List[Tuple[str, float]]:
+        """Rank hashtags for a text and return (hashtag, score) pairs"""
+        index, trends = self.get_index()
+        terms = self.tokenize(text)
+        if not terms:
+            return []
+
+        excluded = {tag.lstrip('#').lower() for tag in (exclude or [])}
+        tf = Counter(terms)
+        text_vector = {term: count * index.idf(term) for term, count in tf.items()}
+        text_norm = math.sqrt(sum(weight ** 2 for weight in text_vector.values())) or 1.0
+
+        # Terms also count as tags when written together, e.g. "social media" -> socialmedia
+        phrases = set(terms) | {a + b for a, b in zip(terms, terms[1:])}
+
+        candidates = set()
+        for term in tf:
+            candidates.update(index.term_tags.get(term, ()))
+        candidates.update(phrase for phrase in phrases if phrase in index.tag_terms or phrase in trends)
+
+        platform_tags = index.platform_df.get(platform) or index.platform_df.get('all') or Counter()
+        max_platform_df = max(platform_tags.values(), default=0)
+
+        scores = {}
+        for tag in candidates:
+            if tag in excluded:
+                continue
+            profile = index.tag_terms.get(tag, {})
+            similarity = sum(text_vector[term] * profile[term] * index.idf(term)
+                             for term in text_vector if term in profile)
+            score = similarity / (text_norm * index.tag_norms.get(tag, 1.0))
+            if tag in phrases:
+                score += 0.5
+            if max_platform_df:
+                score += 0.1 * math.log1p(platform_tags.get(tag, 0)) / math.log1p(max_platform_df)
+            score += 0.3 * trends.get(tag, 0.0)
+            scores[tag] = score
+
+        # New keywords from the text itself, so unseen topics still get tags
+        max_weight = max(text_vector.values())
+        for term, weight in text_vector.items():
+            if term not in scores and term not in excluded and len(term) >= 4 and not term.isdigit():
+                scores[term] = 0.3 * weight / max_weight
+
+        # Greedy pick, favouring tags that are used together with those already picked
+        selected = []
+        while scores and len(selected) < count:
+            def boosted(tag):
+                together = max((index.cooccurrence.get(picked, {}).get(tag, 0) for picked, _ in selected),
+                               default=0)
+                uses = index.platform_df.get('all', {}).get(tag, 0)
+                return scores[tag] + (0.2 * together / uses if uses else 0)
+
+            tag = max(scores, key=boosted)
+            selected.append((tag, round(boosted(tag), 4)))
+            del scores[tag]
+
+        return [('#' + index.display_form(tag).lstrip('#'), score) for tag, score in selected]
+
+    def record_trends(self, trends: List[Dict[str, Any]]) -> int:
+        """Store scraped trend topics as hashtag candidates"""
+        scores = {}
+        for trend in trends:
+            topic = trend.get('topic') or trend.get('hashtag') or ''
+            tag = re.sub(r'[^\w]', '', topic.lower())
+            if len(tag) < 3:
+                continue
+            score = (trend.get('metrics') or {}).get('score') or trend.get('count') or 1
+            scores[tag] = max(scores.get(tag, 0), float(score or 0))
+
+        if not scores:
+            return 0
+
+        # Normalise to 0..1 with log scaling so a single viral topic doesn't dominate
+        top = math.log1p(max(scores.values())) or 1.0
+        normalised = {tag: round(math.log1p(score) / top, 4) for tag, score in scores.items()}
+
+        cached = database_service.cache_get(self.TRENDS_CACHE_KEY) or {}
+        cached.update(normalised)
+        database_service.cache_set(self.TRENDS_CACHE_KEY, cached, self.trends_ttl)
+
+        with self._lock:
+            self._trends = cached
+        return len(normalised)
+
+    def get_index(self) -> Tuple[HashtagIndex, Dict[str, float]]:
+        """Get the index, rebuilding it from the database when stale"""
+        with self._lock:
+            stale = self._index is None or time.monotonic() - self._built_at > self.index_ttl
+            if stale and (has_app_context() or self._index is None):
+                self._index = self._build_index()
+                self._trends = database_service.cache_get(self.TRENDS_CACHE_KEY) or self._trends
+                self._built_at = time.monotonic()
+            return self._index, self._trends
+
+    def refresh(self):
+        """Force a rebuild on next use"""
+        with self._lock:
+            self._built_at = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get vocabulary size information"""
+        index, trends = self.get_index()
+        return {
+            'documents': index.documents,
+            'hashtags': len(index.tag_terms),
+            'terms': len(index.term_df),
+            'trend_tags': len(trends),
+            'platforms': {platform: len(tags) for platform, tags in index.platform_df.items()}
+        }
+
+    def tokenize(self, text: str) -> List[str]:
+        """Lowercase word terms without hashtags, URLs and stopwords"""
+        text = re.sub(r'https?://\S+|[#@]\w+', ' ', (text or '').lower())
+        return [word for word in re.findall(r'[^\W\d_]{3,}|\d{4}', text) if word not in self.STOPWORDS]
+
+    def _build_index(self) -> HashtagIndex:
+        index = HashtagIndex()
+        if not has_app_context():
+            index.finalize()
+            return index
+
+        from src.models.user import GeneratedContent
+
+        try:
+            rows = GeneratedContent.query.with_entities(
+                GeneratedContent.platform,
+                GeneratedContent.generated_text,
+                GeneratedContent.generated_hashtags
+            ).filter(
+                GeneratedContent.content_type == 'text',
+                GeneratedContent.generated_hashtags.isnot(None),
+                or_(GeneratedContent.ai_model_used.is_(None), GeneratedContent.ai_model_used != 'error')
+            ).order_by(GeneratedContent.created_at.desc()).limit(self.max_rows).all()
+        except Exception as e:
+            logging.error(f"Hashtag index build failed: {str(e)}")
+            rows = []
+
+        for platform, text, hashtags in rows:
+            tags = [tag.lstrip('#') for tag in re.findall(r'#\w+', hashtags or '')]
+            if tags:
+                index.add(platform, self.tokenize(text), tags)
+
+        index.finalize()
+        logging.info(f"Hashtag index built from {index.documents} posts, {len(index.tag_terms)} hashtags")
+        return index
+
+
+# Service instance
+hashtag_engine_service = HashtagEngineService()
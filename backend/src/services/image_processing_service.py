@@ -0,0 +1,272 @@
+import os
+import math
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from PIL import Image, features
+
+# Worker functions run in child processes: keep this module free of Flask
+# and database imports so spawned workers start quickly. Settings below are
+# read from the environment, which spawned workers inherit.
+
+ENCODERS = {
+    'jpeg': {'extension': 'jpg', 'mime_type': 'image/jpeg',
+             'params': {'quality': int(os.getenv('IMAGE_JPEG_QUALITY', '90')), 'optimize': True, 'progressive': True}},
+    'webp': {'extension': 'webp', 'mime_type': 'image/webp',
+             'params': {'quality': int(os.getenv('IMAGE_WEBP_QUALITY', '85')), 'method': int(os.getenv('IMAGE_WEBP_METHOD', '4'))}},
+    'avif': {'extension': 'avif', 'mime_type': 'image/avif',
+             'params': {'quality': int(os.getenv('IMAGE_AVIF_QUALITY', '60')), 'speed': int(os.getenv('IMAGE_AVIF_SPEED', '8'))}},
+}
+
+# Downscale in two steps (integer reduce, then LANCZOS) once the source is
+# this many times larger than the target; 0 always resamples at full size
+REDUCING_GAP = float(os.getenv('IMAGE_REDUCING_GAP', '3.0'))
+
+
+def supported_formats() -> List[str]:
+    """Output formats this Pillow build can encode"""
+    return [name for name in ENCODERS if name == 'jpeg' or features.check(name)]
+
+
+def crop_box(size: Tuple[int, int], width: int, height: int) -> Tuple[int, int, int, int]:
+    """Centered box of the source with the target aspect ratio"""
+    img_width, img_height = size
+    img_ratio = img_width / img_height
+    target_ratio = width / height
+
+    if img_ratio > target_ratio:
+        # Image is wider, crop width
+        new_width = int(img_height * target_ratio)
+        left = (img_width - new_width) // 2
+        return (left, 0, left + new_width, img_height)
+    if img_ratio < target_ratio:
+        # Image is taller, crop height
+        new_height = int(img_width / target_ratio)
+        top = (img_height - new_height) // 2
+        return (0, top, img_width, top + new_height)
+    return (0, 0, img_width, img_height)
+
+
+def open_for_size(source_path: str, width: int, height: int) -> Image.Image:
+    """Open and decode an image at the smallest scale that still covers width x height.
+
+    JPEGs are decoded by libjpeg at 1/2, 1/4 or 1/8 scale when possible, which
+    skips most of the decode work for large downscales.
+    """
+    img = Image.open(source_path)
+    if img.format == 'JPEG':
+        left, top, right, bottom = crop_box(img.size, width, height)
+        scale = max(width / (right - left), height / (bottom - top))
+        if scale < 1:
+            img.draft('RGB', (math.ceil(img.width * scale), math.ceil(img.height * scale)))
+    img.load()
+    return img
+
+
+def fit_to_size(img: Image.Image, width: int, height: int) -> Image.Image:
+    """Center-crop to the target aspect ratio and resize"""
+    if img.mode not in ('RGB', 'RGBA', 'L'):
+        img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA') else 'RGB')
+
+    resized = img.resize((width, height), Image.Resampling.LANCZOS,
+                         box=crop_box(img.size, width, height), reducing_gap=REDUCING_GAP or None)
+    return resized if resized.mode == 'RGB' else resized.convert('RGB')
+
+
+def encode(img: Image.Image, file_path: str, name: str, quality: int = None) -> int:
+    """Save img in the named format through a .part file; returns the file size"""
+    params = dict(ENCODERS[name]['params'])
+    if quality:
+        params['quality'] = quality
+    partial_path = f"{file_path}.part"
+    img.save(partial_path, name.upper(), **params)
+    os.replace(partial_path, file_path)
+    return os.path.getsize(file_path)
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+def render_size(source_path: str, output_dir: str, width: int, height: int,
+                formats: List[str], quality: Dict[str, int] = None) -> Dict[str, Any]:
+    """Render one target size of a source image in each format (runs in a worker process)"""
+    os.makedirs(output_dir, exist_ok=True)
+    timings = {}
+
+    started = time.perf_counter()
+    with open_for_size(source_path, width, height) as img:
+        timings['decode'] = _elapsed_ms(started)
+        started = time.perf_counter()
+        resized = fit_to_size(img, width, height)
+        timings['resize'] = _elapsed_ms(started)
+
+    outputs = []
+    for name in formats:
+        encoder = ENCODERS[name]
+        filename = f"{width}x{height}.{encoder['extension']}"
+        file_path = os.path.join(output_dir, filename)
+        started = time.perf_counter()
+        file_size = encode(resized, file_path, name, (quality or {}).get(name))
+        timings[f'encode_{name}'] = _elapsed_ms(started)
+        outputs.append({
+            'format': name,
+            'filename': filename,
+            'file_path': file_path,
+            'file_size': file_size,
+            'mime_type': encoder['mime_type'],
+            'width': width,
+            'height': height
+        })
+    return {'outputs': outputs, 'timings': timings}
+
+
+def optimize_image(source_path: str, output_path: str, width: int, height: int,
+                   fmt: str = 'jpeg', quality: int = None) -> Dict[str, Any]:
+    """Crop, resize and encode one image to output_path (runs in a worker process)"""
+    timings = {}
+
+    started = time.perf_counter()
+    with open_for_size(source_path, width, height) as img:
+        timings['decode'] = _elapsed_ms(started)
+        started = time.perf_counter()
+        resized = fit_to_size(img, width, height)
+        timings['resize'] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    file_size = encode(resized, output_path, fmt, quality)
+    timings[f'encode_{fmt}'] = _elapsed_ms(started)
+
+    return {
+        'file_path': output_path,
+        'file_size': file_size,
+        'mime_type': ENCODERS[fmt]['mime_type'],
+        'width': width,
+        'height': height,
+        'timings': timings
+    }
+
+
+def perceptual_hash(source_path: str) -> Dict[str, Any]:
+    """64-bit difference hash of an image as 16 hex digits (runs in a worker process)"""
+    started = time.perf_counter()
+    with Image.open(source_path) as img:
+        if img.format == 'JPEG':
+            img.draft('L', (64, 64))
+        pixels = list(img.convert('L').resize((9, 8), Image.Resampling.LANCZOS, reducing_gap=2.0).getdata())
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return {'dhash': f"{bits:016x}", 'timings': {'hash': _elapsed_ms(started)}}
+
+
+class ImageProcessingService:
+    """Process pool for CPU-heavy image work, off the request threads.
+
+    submit() runs any module-level function of this module on the pool and
+    records the per-step timings (decode, resize, encode_<format>) the
+    workers report, plus the total including queueing, per operation.
+    """
+
+    def __init__(self):
+        self.max_workers = int(os.getenv('IMAGE_POOL_WORKERS', '0')) or os.cpu_count() or 1
+        # spawn: never fork a web worker that already runs threads
+        self.start_method = os.getenv('IMAGE_POOL_START_METHOD', 'spawn')
+        self.task_timeout = float(os.getenv('IMAGE_TASK_TIMEOUT', '120'))  # seconds
+
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        """Get the shared pool, recreating it after a fork"""
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(self.start_method)
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) on the pool"""
+        submitted = time.perf_counter()
+        try:
+            future = self.get_executor().submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault in a codec); start a fresh pool
+            logging.warning("Image process pool was broken, restarting it")
+            with self._lock:
+                self._executor = None
+            future = self.get_executor().submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda f: self._record(fn.__name__, submitted, f))
+        return future
+
+    def run(self, fn: Callable, *args, timeout: float = None, **kwargs) -> Any:
+        """Run fn on the pool and wait for its result"""
+        return self.submit(fn, *args, **kwargs).result(timeout=timeout or self.task_timeout)
+
+    def render_sizes(self, source_path: str, output_dir: str, sizes: List[Tuple[int, int]],
+                     formats: List[str]) -> List[Dict[str, Any]]:
+        """Render several sizes in parallel and return all outputs"""
+        futures: List[Future] = [
+            self.submit(render_size, source_path, output_dir, width, height, formats)
+            for width, height in sizes
+        ]
+
+        outputs = []
+        for future in futures:
+            try:
+                outputs.extend(future.result(timeout=self.task_timeout)['outputs'])
+            except Exception as e:
+                logging.error(f"Rendering image variant of {source_path} failed: {str(e)}")
+        return outputs
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Count and average/max milliseconds per operation and step"""
+        with self._stats_lock:
+            return {
+                'workers': self.max_workers,
+                'operations': {
+                    name: {
+                        'count': int(entry['count']),
+                        'errors': int(entry['errors']),
+                        'avg_ms': round(entry['total_ms'] / entry['count'], 2) if entry['count'] else 0,
+                        'max_ms': round(entry['max_ms'], 2)
+                    }
+                    for name, entry in sorted(self._stats.items())
+                }
+            }
+
+    def _record(self, operation: str, submitted: float, future: Future):
+        if future.cancelled():
+            return
+        error = future.exception() is not None
+        samples = {'total': _elapsed_ms(submitted)}
+        if not error:
+            result = future.result()
+            if isinstance(result, dict):
+                samples.update(result.get('timings', {}))
+
+        with self._stats_lock:
+            for step, ms in samples.items():
+                entry = self._stats.setdefault(f"{operation}.{step}",
+                                               {'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+                entry['count'] += 1
+                entry['total_ms'] += ms
+                entry['max_ms'] = max(entry['max_ms'], ms)
+                if error and step == 'total':
+                    entry['errors'] += 1
+
+
+# Service instance
+image_processing_service = ImageProcessingService()
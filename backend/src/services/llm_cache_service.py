@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from src.services.database_service import database_service
+from src.services.model_router_service import model_router_service
+
+
+class LLMCacheService:
+    """Content-addressed cache for chat completion responses.
+
+    Two tiers: an in-process LRU in front of Redis (via DatabaseService).
+    Keys are a hash of (model, messages, temperature, max_tokens, ...).
+    """
+
+    KEY_PREFIX = 'llm_cache:'
+
+    def __init__(self):
+        self.enabled = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+        self.default_ttl = int(os.getenv('LLM_CACHE_TTL', '3600'))
+        self.lru_size = int(os.getenv('LLM_CACHE_LRU_SIZE', '1024'))
+
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def make_key(self, **params) -> str:
+        """Hash the request parameters that determine the response"""
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return self.KEY_PREFIX + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get cached content, checking the local LRU before Redis"""
+        content = self._lru_get(key)
+        if content is not None:
+            return content
+        return self._redis_get(key)
+
+    def set(self, key: str, content: str, ttl: int):
+        """Store content in both tiers"""
+        self._lru_set(key, content, ttl)
+        database_service.cache_set(key, {'content': content, 'ttl': ttl}, ttl)
+
+    def cached_completion(self, client, call_site: str, ttl: int = None, cache_creative: bool = False,
+                          validate=None, **params) -> str:
+        """Run a chat completion through the cache and return the message content.
+
+        Calls with temperature > 0 are not cached unless the caller passes
+        cache_creative=True. The TTL can be overridden per call site with
+        LLM_CACHE_TTL_<CALL_SITE>. When validate is given, only content for
+        which validate(content) is true is cached.
+        """
+        ttl = int(os.getenv(f'LLM_CACHE_TTL_{call_site.upper()}', ttl or self.default_ttl))
+        cacheable = self.enabled and ttl > 0 and (params.get('temperature', 1) == 0 or cache_creative)
+
+        if not cacheable:
+            self._count(call_site, 'bypassed')
+            response = client.chat.completions.create(**params)
+            model_router_service.record_usage(call_site, params.get('model'), params.get('max_tokens'), response)
+            return response.choices[0].message.content
+
+        # Keep responses from different backends (e.g. the local provider) apart
+        namespace = getattr(client, 'cache_namespace', None)
+        key = self.make_key(namespace=namespace, **params) if namespace else self.make_key(**params)
+
+        content = self._lru_get(key)
+        if content is not None:
+            self._count(call_site, 'memory_hits')
+            return content
+
+        content = self._redis_get(key)
+        if content is not None:
+            self._count(call_site, 'redis_hits')
+            return content
+
+        self._count(call_site, 'misses')
+        response = client.chat.completions.create(**params)
+        model_router_service.record_usage(call_site, params.get('model'), params.get('max_tokens'), response)
+        content = response.choices[0].message.content
+
+        if content and (validate is None or validate(content)):
+            self.set(key, content, ttl)
+
+        return content
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters per call site"""
+        with self._lock:
+            per_site = {site: dict(counts) for site, counts in self._stats.items()}
+            lru_entries = len(self._lru)
+
+        totals = {}
+        for counts in per_site.values():
+            for name, value in counts.items():
+                totals[name] = totals.get(name, 0) + value
+
+        lookups = totals.get('memory_hits', 0) + totals.get('redis_hits', 0) + totals.get('misses', 0)
+        hits = totals.get('memory_hits', 0) + totals.get('redis_hits', 0)
+
+        return {
+            'enabled': self.enabled,
+            'lru_entries': lru_entries,
+            'lru_size': self.lru_size,
+            'totals': totals,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'call_sites': per_site
+        }
+
+    def clear(self) -> int:
+        """Clear both cache tiers"""
+        with self._lock:
+            self._lru.clear()
+        return database_service.cache_flush_pattern(f"{self.KEY_PREFIX}*")
+
+    def _redis_get(self, key: str) -> Optional[str]:
+        cached = database_service.cache_get(key)
+        if isinstance(cached, dict) and 'content' in cached:
+            # Promote to the local tier
+            self._lru_set(key, cached['content'], cached.get('ttl', self.default_ttl))
+            return cached['content']
+        return None
+
+    def _lru_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+
+            expires_at, content = entry
+            if expires_at < time.monotonic():
+                del self._lru[key]
+                return None
+
+            self._lru.move_to_end(key)
+            return content
+
+    def _lru_set(self, key: str, content: str, ttl: int):
+        with self._lock:
+            self._lru[key] = (time.monotonic() + ttl, content)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def _count(self, call_site: str, name: str):
+        with self._lock:
+            counts = self._stats.setdefault(call_site, {})
+            counts[name] = counts.get(name, 0) + 1
+
+
+# Service instance
+llm_cache_service = LLMCacheService()
@@ -0,0 +1,215 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+from types import SimpleNamespace
+from typing import Dict, List, Any, Iterator, Optional
+from src.services.openai_client_service import openai_client_service
+
+
+class LocalLLMError(Exception):
+    """Injected failure from the local backend"""
+
+
+class LocalLLMClient:
+    """Offline, deterministic stand-in for the OpenAI chat completions API.
+
+    Text comes from a small word-level Markov chain seeded with the request,
+    so identical requests give identical output. Latency and failures can be
+    injected to load test the generate -> persist -> publish path without
+    network access.
+    """
+
+    MODEL_NAME = 'local-markov'
+    cache_namespace = 'local'
+
+    CORPUS = (
+        "Ontdek hoe je met slimme keuzes meer haalt uit elke dag. "
+        "Wij geloven dat goede ideeën klein beginnen en groot eindigen. "
+        "Deel jouw ervaring en laat ons weten wat jij ervan vindt. "
+        "Samen bouwen we aan een community die elkaar echt verder helpt. "
+        "Dit is het moment om te starten met iets nieuws en waardevols. "
+        "Onze klanten vertellen elke dag hoe het hun werk makkelijker maakt. "
+        "Blijf nieuwsgierig, probeer iets uit en leer van elke stap. "
+        "Met de juiste aanpak wordt elke uitdaging een kans om te groeien. "
+        "Benieuwd naar meer? Volg ons voor tips, inspiratie en updates. "
+        "Kwaliteit, eenvoud en aandacht voor detail maken het verschil."
+    )
+
+    def __init__(self):
+        self.latency_ms = float(os.getenv('LOCAL_LLM_LATENCY_MS', '0'))
+        self.latency_jitter_ms = float(os.getenv('LOCAL_LLM_LATENCY_JITTER_MS', '0'))
+        self.token_latency_ms = float(os.getenv('LOCAL_LLM_TOKEN_LATENCY_MS', '0'))
+        self.error_rate = float(os.getenv('LOCAL_LLM_ERROR_RATE', '0'))
+
+        self.chain = self._build_chain(self.CORPUS.split())
+        # Mirrors client.chat.completions.create(...)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model: str = None, messages: List[Dict[str, str]] = None, max_tokens: int = 256,
+               temperature: float = 1.0, stream: bool = False, response_format: Dict[str, Any] = None,
+               **kwargs):
+        """Generate a chat completion response or stream"""
+        messages = messages or []
+        rng = random.Random(self._seed(model, messages, max_tokens, temperature, response_format))
+
+        self._sleep(self.latency_ms + rng.uniform(-1, 1) * self.latency_jitter_ms)
+        if self.error_rate and random.random() < self.error_rate:
+            raise LocalLLMError('Injected local LLM failure')
+
+        prompt = messages[-1]['content'] if messages else ''
+        if response_format and response_format.get('type') == 'json_schema':
+            schema = response_format['json_schema']['schema']
+            content = json.dumps(self._fill_schema(schema, rng, prompt, max_tokens), ensure_ascii=False)
+        else:
+            content = self._generate_text(rng, prompt, max_tokens)
+
+        usage = SimpleNamespace(
+            prompt_tokens=sum(len(m.get('content', '').split()) for m in messages),
+            completion_tokens=len(content.split())
+        )
+        usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+
+        if stream:
+            return self._stream(content)
+
+        message = SimpleNamespace(role='assistant', content=content)
+        return SimpleNamespace(
+            model=self.MODEL_NAME,
+            choices=[SimpleNamespace(index=0, message=message, finish_reason='stop')],
+            usage=usage
+        )
+
+    def _stream(self, content: str) -> Iterator[SimpleNamespace]:
+        for index, word in enumerate(content.split(' ')):
+            self._sleep(self.token_latency_ms)
+            delta = SimpleNamespace(content=word if index == 0 else ' ' + word)
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+        yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=None),
+                                                       finish_reason='stop')])
+
+    def _generate_text(self, rng: random.Random, prompt: str, max_tokens: int) -> str:
+        """Markov text about the prompt keywords, followed by hashtags"""
+        keywords = self._keywords(prompt)
+
+        # Respect "Maximaal N karakters" from the platform prompt
+        match = re.search(r'Maximaal (\d+) karakters', prompt)
+        max_chars = min(int(match.group(1)) if match else 2000, max_tokens * 4)
+
+        hashtags = ' '.join('#' + word for word in keywords[:3])
+        budget = max(max_chars - len(hashtags) - 2, 20)
+
+        sentences = []
+        if keywords:
+            sentences.append(f"{keywords[0].capitalize()}: {' '.join(keywords[1:6])}.".replace(' .', '.'))
+        while sum(len(s) + 1 for s in sentences) < budget * 0.8 and len(sentences) < 8:
+            sentences.append(self._sentence(rng))
+
+        text = ' '.join(sentences)[:budget].rstrip()
+        return f"{text}\n\n{hashtags}" if hashtags else text
+
+    def _sentence(self, rng: random.Random) -> str:
+        starts = [word for word in self.chain if word[:1].isupper()]
+        word = rng.choice(starts)
+        words = [word]
+        while not word.endswith(('.', '?', '!')) and len(words) < 25:
+            word = rng.choice(self.chain.get(word) or starts)
+            words.append(word)
+        return ' '.join(words)
+
+    def _fill_schema(self, schema: Dict[str, Any], rng: random.Random, prompt: str, max_tokens: int) -> Any:
+        """Build a value matching a JSON schema"""
+        schema_type = schema.get('type')
+        if schema_type == 'object':
+            properties = schema.get('properties', {})
+            # Split the token budget over the text fields of a batched response
+            share = max(max_tokens // max(len(properties), 1), 32)
+            return {name: self._fill_schema(sub, rng, prompt, share) for name, sub in properties.items()}
+        if schema_type == 'array':
+            return [self._fill_schema(schema.get('items', {}), rng, prompt, max_tokens) for _ in range(3)]
+        if schema_type == 'integer':
+            return rng.randint(1, 10)
+        if schema_type == 'number':
+            return round(rng.uniform(1, 10), 1)
+        if schema_type == 'boolean':
+            return rng.random() < 0.5
+        if 'enum' in schema:
+            return rng.choice(schema['enum'])
+        return self._generate_text(rng, prompt, max_tokens)
+
+    def _keywords(self, prompt: str) -> List[str]:
+        words = re.findall(r'[a-zA-ZÀ-ÿ]{5,}', prompt.lower())
+        skip = {'genereer', 'social', 'media', 'content', 'volgende', 'onderwerp', 'maximaal',
+                'karakters', 'platform', 'platforms', 'vereisten', 'relevante', 'hashtags',
+                'engaging', 'specifiek', 'neutraal', 'instagram', 'linkedin', 'twitter', 'facebook',
+                'tiktok'}
+        return list(dict.fromkeys(word for word in words if word not in skip))
+
+    def _build_chain(self, words: List[str]) -> Dict[str, List[str]]:
+        chain = {}
+        for current, following in zip(words, words[1:]):
+            chain.setdefault(current, []).append(following)
+        return chain
+
+    def _seed(self, *parts) -> int:
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return int(hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16], 16)
+
+    def _sleep(self, milliseconds: float):
+        if milliseconds > 0:
+            time.sleep(milliseconds / 1000.0)
+
+
+class LLMProviderService:
+    """Selects the chat completion backend per user subscription tier or env"""
+
+    PROVIDERS = ('openai', 'local')
+
+    def __init__(self):
+        self.default_provider = os.getenv('LLM_PROVIDER', 'openai').lower()
+
+        # e.g. "free:local,pro:openai"
+        self.tier_providers = {}
+        for entry in os.getenv('LLM_PROVIDER_TIERS', '').split(','):
+            if ':' in entry:
+                tier, provider = entry.split(':', 1)
+                self.tier_providers[tier.strip().lower()] = provider.strip().lower()
+
+        self._local_client = None
+
+    def get_client(self, provider: str = None):
+        """Get the client for a provider (default provider when None)"""
+        provider = provider or self.default_provider
+        if provider == 'local':
+            if self._local_client is None:
+                self._local_client = LocalLLMClient()
+            return self._local_client
+        if provider != 'openai':
+            logging.warning(f"Unknown LLM provider '{provider}', using openai")
+        return openai_client_service.get_client()
+
+    def provider_for_tier(self, subscription_tier: str = None) -> str:
+        """Resolve the provider for a subscription tier"""
+        if subscription_tier:
+            return self.tier_providers.get(subscription_tier.lower(), self.default_provider)
+        return self.default_provider
+
+    def tier_for_user(self, user_id: str) -> Optional[str]:
+        """Get a user's subscription tier (needs an app context)"""
+        from src.models.user import User
+
+        user = User.query.get(user_id) if user_id else None
+        return user.subscription_tier if user else None
+
+    def model_name(self, provider: Optional[str], model: str) -> str:
+        """Model name to record for generated content"""
+        if (provider or self.default_provider) == 'local':
+            return LocalLLMClient.MODEL_NAME
+        return model
+
+
+# Service instance
+llm_provider_service = LLMProviderService()
@@ -0,0 +1,117 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+from src.models.user import MediaFile
+from src.services.image_processing_service import image_processing_service, perceptual_hash
+from src.services.storage_service import storage_service, file_sha256
+from src.services.media_delivery_service import media_delivery_service
+
+
+class MediaDedupService:
+    """Reuse of earlier generations and a similarity index of generated images.
+
+    Generated media is indexed by a fingerprint of the normalised prompt,
+    style, aspect ratio and provider (MediaFile.prompt_fingerprint); callers
+    that opt in get the user's latest matching image instead of a new
+    provider call. Stored files also get their SHA-256 (content_hash), which
+    storage_service uses to keep one blob per distinct file, and images a
+    difference hash in file_metadata['dhash'].
+    """
+
+    def __init__(self):
+        self.reuse_max_age = int(os.getenv('MEDIA_REUSE_MAX_AGE_DAYS', '30'))
+        self.similar_max_distance = int(os.getenv('MEDIA_SIMILAR_MAX_DISTANCE', '8'))  # of 64 bits
+
+    def normalize_prompt(self, prompt: str) -> str:
+        """Case, Unicode form, whitespace and trailing punctuation don't change a prompt"""
+        text = unicodedata.normalize('NFKC', prompt or '').casefold()
+        return re.sub(r'\s+', ' ', text).strip().rstrip('.!,; ')
+
+    def prompt_fingerprint(self, prompt: str, style: str = None, aspect_ratio: str = None,
+                           provider: str = None) -> str:
+        """Index key of a generation request"""
+        key = json.dumps([self.normalize_prompt(prompt), (style or '').lower(), aspect_ratio or '', provider or ''])
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def find_reusable(self, user_id: str, fingerprint: str) -> Optional[MediaFile]:
+        """The user's most recent generation for this fingerprint that is still stored"""
+        if not user_id:
+            return None
+        candidates = MediaFile.query.filter(
+            MediaFile.user_id == user_id,
+            MediaFile.prompt_fingerprint == fingerprint,
+            MediaFile.parent_id.is_(None),
+            MediaFile.created_at >= datetime.utcnow() - timedelta(days=self.reuse_max_age)
+        ).order_by(MediaFile.created_at.desc()).limit(5).all()
+
+        for media_file in candidates:
+            if storage_service.exists(media_file):
+                return media_file
+        return None
+
+    def reuse_result(self, media_file: MediaFile) -> Dict[str, Any]:
+        """Generation response for a reused file"""
+        metadata = media_file.file_metadata or {}
+        return {
+            'success': True,
+            'reused': True,
+            'file_id': media_file.id,
+            'filename': media_file.filename,
+            'file_path': storage_service.local_path(media_file),
+            'url': f"/api/media/{media_file.id}",
+            'signed_url': media_delivery_service.signed_url(media_file),
+            'dimensions': media_file.dimensions,
+            'file_size': media_file.file_size,
+            'prompt_used': metadata.get('prompt'),
+            'created_at': media_file.created_at.isoformat() if media_file.created_at else None
+        }
+
+    def index(self, media_file: MediaFile, sha256: str = None):
+        """Hash a new record's file before it goes to storage_service.attach()"""
+        try:
+            media_file.content_hash = sha256 or file_sha256(media_file.storage_path)
+
+            if media_file.file_type == 'image':
+                hashes = image_processing_service.run(perceptual_hash, media_file.storage_path)
+                media_file.file_metadata = dict(media_file.file_metadata or {}, dhash=hashes['dhash'])
+        except Exception as e:
+            # The file is stored either way; only the similarity index misses it
+            logging.error(f"Indexing {media_file.storage_path} failed: {str(e)}")
+
+    def hamming_distance(self, first: str, second: str) -> int:
+        """Differing bits between two hex hashes"""
+        return bin(int(first, 16) ^ int(second, 16)).count('1')
+
+    def find_similar(self, media_file: MediaFile, max_distance: int = None,
+                     limit: int = 20) -> List[Tuple[MediaFile, int]]:
+        """The owner's other images whose difference hash is within max_distance bits"""
+        dhash = (media_file.file_metadata or {}).get('dhash')
+        if not dhash:
+            return []
+        max_distance = self.similar_max_distance if max_distance is None else max_distance
+
+        candidates = MediaFile.query.filter(
+            MediaFile.user_id == media_file.user_id,
+            MediaFile.file_type == 'image',
+            MediaFile.parent_id.is_(None),
+            MediaFile.id != media_file.id
+        ).all()
+
+        matches = []
+        for candidate in candidates:
+            other = (candidate.file_metadata or {}).get('dhash')
+            if other:
+                distance = self.hamming_distance(dhash, other)
+                if distance <= max_distance:
+                    matches.append((candidate, distance))
+        matches.sort(key=lambda match: match[1])
+        return matches[:limit]
+
+
+# Service instance
+media_dedup_service = MediaDedupService()
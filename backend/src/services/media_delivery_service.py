@@ -0,0 +1,196 @@
+import os
+import re
+import hmac
+import time
+import base64
+import hashlib
+import logging
+import mimetypes
+import unicodedata
+from datetime import datetime
+from urllib.parse import quote
+from typing import List, Optional
+from flask import Response, request, send_file
+from werkzeug.http import is_resource_modified
+from src.models.user import GeneratedContent, MediaFile, db
+from src.services.storage_service import storage_service, StorageError
+from src.services.download_service import DownloadError
+
+BLOB_KEY_PATTERN = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z0-9]{1,5})?$')
+
+
+class MediaDeliveryService:
+    """HTTP responses for stored media files.
+
+    A MediaFile's bytes never change, so responses carry a strong ETag (the
+    content hash), Last-Modified and a long-lived Cache-Control, answer
+    If-None-Match/If-Modified-Since with 304 before touching storage, and
+    support byte ranges for video scrubbing. With MEDIA_ACCEL_REDIRECT_PREFIX
+    set, nginx streams the file from an internal location instead of a
+    Python worker:
+
+        location /_media/ { internal; alias /home/ubuntu/media_storage/; }
+
+    Blobs can also be handed out as signed URLs,
+    /api/media/s/<backend>/<key>?e=<expiry>&s=<signature>, that are checked
+    with the HMAC secret alone: no session, user or MediaFile lookup.
+    Expiries are rounded to MEDIA_URL_TTL windows so a file keeps the same
+    URL (and browser cache entry) for at least one window.
+    """
+
+    def __init__(self):
+        self.max_age = int(os.getenv('MEDIA_CACHE_MAX_AGE', str(365 * 24 * 3600)))  # seconds
+        self.accel_prefix = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '')  # e.g. /_media/
+
+        self.url_ttl = int(os.getenv('MEDIA_URL_TTL', '3600'))  # seconds
+        secret = os.getenv('MEDIA_URL_SECRET') or os.getenv('SECRET_KEY', '')
+        # The previous secret keeps already issued URLs valid during a rotation
+        self.url_secrets = [s.encode('utf-8') for s in (secret, os.getenv('MEDIA_URL_SECRET_PREVIOUS', '')) if s]
+
+    def etag(self, media_file: MediaFile) -> Optional[str]:
+        """Strong validator: the content hash; None for pre-blob records"""
+        return media_file.content_hash
+
+    def not_modified(self, media_file: MediaFile, cache_control: str = 'private') -> Optional[Response]:
+        """304 response when the client's cached copy is current"""
+        return self._not_modified(self.etag(media_file), media_file.created_at, cache_control, self.max_age)
+
+    def send(self, media_file: MediaFile, cache_control: str = 'private') -> Response:
+        """Serve a stored file with validators, ranges and caching headers"""
+        response = self.not_modified(media_file, cache_control)
+        if response is not None:
+            return response
+
+        return self._respond(
+            storage_service.local_path(media_file),
+            mime_type=media_file.mime_type,
+            etag=self.etag(media_file),
+            last_modified=media_file.created_at,
+            download_name=media_file.original_filename or media_file.filename,
+            cache_control=cache_control,
+            max_age=self.max_age
+        )
+
+    def signed_url(self, media_file: MediaFile) -> Optional[str]:
+        """Expiring URL for a blob-backed file; None for pre-blob files or without a secret"""
+        if not self.url_secrets or storage_service.is_legacy(media_file):
+            return None
+        expires = (int(time.time()) // self.url_ttl + 2) * self.url_ttl
+        signature = self._signature(self.url_secrets[0], media_file.storage_provider, media_file.storage_path, expires)
+        return f"/api/media/s/{media_file.storage_provider}/{media_file.storage_path}?e={expires}&s={signature}"
+
+    def media_urls(self, content: GeneratedContent) -> List[str]:
+        """A generated content's media URLs, re-signed so stored URLs don't go stale"""
+        media_file_id = (content.generation_parameters or {}).get('media_file_id')
+        media_file = db.session.get(MediaFile, media_file_id) if media_file_id else None
+        url = self.signed_url(media_file) if media_file else None
+        return [url] if url else (content.media_urls or [])
+
+    def verify(self, backend: str, key: str, expires: str, signature: str) -> bool:
+        """Check a signed URL without touching the database"""
+        if not self.url_secrets or backend not in storage_service.backends or not BLOB_KEY_PATTERN.match(key):
+            return False
+        try:
+            expires = int(expires)
+        except (TypeError, ValueError):
+            return False
+        if expires < time.time():
+            return False
+        return any(
+            hmac.compare_digest(self._signature(secret, backend, key, expires), signature or '')
+            for secret in self.url_secrets
+        )
+
+    def send_signed(self, backend: str, key: str, expires: str) -> Optional[Response]:
+        """Serve a verified signed URL, cached no longer than it is valid; None if the blob is gone"""
+        content_hash = BLOB_KEY_PATTERN.match(key).group(1)
+        max_age = max(0, min(self.max_age, int(expires) - int(time.time())))
+
+        response = self._not_modified(content_hash, None, 'private', max_age)
+        if response is not None:
+            return response
+
+        try:
+            path = storage_service.get_backend(backend).local_path(key)
+        except (StorageError, DownloadError) as e:
+            logging.warning(f"Signed media {backend}/{key} unavailable: {str(e)}")
+            return None
+        if not os.path.exists(path):
+            return None
+
+        return self._respond(
+            path,
+            mime_type=mimetypes.guess_type(key)[0],
+            etag=content_hash,
+            last_modified=None,
+            download_name=os.path.basename(key),
+            cache_control='private',
+            max_age=max_age
+        )
+
+    def _signature(self, secret: bytes, backend: str, key: str, expires: int) -> str:
+        digest = hmac.new(secret, f"{backend}/{key}:{expires}".encode('utf-8'), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+    def _not_modified(self, etag: Optional[str], last_modified: Optional[datetime],
+                      cache_control: str, max_age: int) -> Optional[Response]:
+        if not etag:
+            return None
+        if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            return None
+        response = Response(status=304)
+        self._cache_headers(response, etag, last_modified, cache_control, max_age)
+        return response
+
+    def _respond(self, path: str, mime_type: Optional[str], etag: Optional[str], last_modified: Optional[datetime],
+                 download_name: str, cache_control: str, max_age: int) -> Response:
+        accel_path = self._accel_path(path)
+        if accel_path:
+            response = Response(mimetype=mime_type or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = accel_path
+            response.headers.set('Content-Disposition', 'inline', **self._filename_options(download_name))
+        else:
+            response = send_file(
+                path,
+                mimetype=mime_type,
+                as_attachment=False,
+                download_name=download_name,
+                etag=etag or True,
+                last_modified=last_modified,
+                conditional=True
+            )
+        self._cache_headers(response, etag, last_modified, cache_control, max_age)
+        return response
+
+    def _filename_options(self, download_name: str) -> dict:
+        """Content-Disposition parameters as send_file builds them, with an RFC 5987 UTF-8 form"""
+        name = ''.join(c for c in download_name if unicodedata.category(c) != 'Cc')
+        try:
+            name.encode('ascii')
+        except UnicodeEncodeError:
+            simple = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+            return {'filename': simple, 'filename*': f"UTF-8''{quote(name, safe='!#$&+^`|~')}"}
+        return {'filename': name}
+
+    def _cache_headers(self, response: Response, etag: Optional[str], last_modified: Optional[datetime],
+                       cache_control: str, max_age: int):
+        if etag:
+            response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = f"{cache_control}, max-age={max_age}, immutable"
+
+    def _accel_path(self, path: str) -> Optional[str]:
+        """Internal nginx location of a file under MEDIA_STORAGE_PATH"""
+        if not self.accel_prefix:
+            return None
+        root = os.path.abspath(storage_service.storage_base_path)
+        path = os.path.abspath(path)
+        if os.path.commonpath([root, path]) != root:
+            logging.warning(f"{path} is outside {root}; serving it from Python")
+            return None
+        return self.accel_prefix.rstrip('/') + '/' + quote(os.path.relpath(path, root))
+
+
+# Service instance
+media_delivery_service = MediaDeliveryService()
@@ -8,22 +8,33 @@ from typing import Dict, List, Optional, Tuple
 from PIL import Image
 import io
 import base64
-from openai import OpenAI
+from src.services.openai_client_service import openai_client_service
+from src.services.model_router_service import model_router_service
+from src.services.structured_output_service import structured_output_service
+from src.services.download_service import download_service
+from src.services.image_processing_service import image_processing_service, optimize_image
+from src.services.media_variant_service import media_variant_service
+from src.services.media_dedup_service import media_dedup_service
+from src.services.storage_service import storage_service
+from src.services.media_delivery_service import media_delivery_service
 from src.models.user import MediaFile, db
 
 class MediaGenerationService:
     """Service for generating images and videos using AI"""
     
+    @property
+    def openai_client(self):
+        """Shared OpenAI client for this process"""
+        return openai_client_service.get_client()
+
     def __init__(self):
-        self.openai_client = OpenAI(
-            api_key=os.getenv('OPENAI_API_KEY'),
-            base_url=os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
-        )
-        
         # Media storage configuration
         self.storage_base_path = os.getenv('MEDIA_STORAGE_PATH', '/home/ubuntu/media_storage')
         self.ensure_storage_directory()
         
+        # JPEG quality of on-demand optimized images (variants use IMAGE_JPEG_QUALITY)
+        self.optimize_quality = int(os.getenv('IMAGE_OPTIMIZE_QUALITY', '95'))
+        
         # Platform-specific image specifications
         self.platform_specs = {
             'instagram': {
@@ -104,8 +115,13 @@ Technical specifications:
         
         return base_prompt.strip()
     
-    def generate_image_with_dalle(self, prompt: str, platform: str, content_type: str = 'post', user_id: str = None) -> Dict:
-        """Generate image using DALL-E 3"""
+    def generate_image_with_dalle(self, prompt: str, platform: str, content_type: str = 'post', user_id: str = None,
+                                  reuse_existing: bool = False) -> Dict:
+        """Generate image using DALL-E 3.
+        
+        With reuse_existing the user's earlier image for the same prompt and
+        size is returned instead of calling the API.
+        """
         try:
             # Get platform specifications for sizing
             platform_spec = self.platform_specs.get(platform, {}).get(content_type, {})
@@ -117,6 +133,14 @@ Technical specifications:
             else:
                 size = "1024x1024"  # Square format
             
+            fingerprint = media_dedup_service.prompt_fingerprint(prompt, 'vivid', size, 'dall-e-3')
+            if reuse_existing:
+                existing = media_dedup_service.find_reusable(user_id, fingerprint)
+                if existing:
+                    result = media_dedup_service.reuse_result(existing)
+                    result.update({'platform': platform, 'content_type': content_type})
+                    return result
+            
             # Generate image with DALL-E 3
             response = self.openai_client.images.generate(
                 model="dall-e-3",
@@ -127,21 +151,14 @@ Technical specifications:
                 n=1
             )
             
-            # Download and save the generated image
-            image_url = response.data[0].url
-            image_response = requests.get(image_url)
-            
-            if image_response.status_code != 200:
-                raise Exception("Failed to download generated image")
-            
             # Generate unique filename
             file_id = str(uuid.uuid4())
             filename = f"dalle3_{file_id}.png"
             file_path = os.path.join(self.storage_base_path, 'images', filename)
             
-            # Save image
-            with open(file_path, 'wb') as f:
-                f.write(image_response.content)
+            # Stream the generated image to disk
+            image_url = response.data[0].url
+            download = download_service.download(image_url, file_path)
             
             # Get image dimensions
             with Image.open(file_path) as img:
@@ -155,13 +172,14 @@ Technical specifications:
                     filename=filename,
                     original_filename=f"generated_{content_type}_{platform}.png",
                     file_type='image',
-                    file_size=len(image_response.content),
+                    file_size=download['file_size'],
                     storage_path=file_path,
                     storage_provider='local',
                     mime_type='image/png',
                     dimensions={'width': width, 'height': height},
                     file_metadata={
                         'generated_by': 'dall-e-3',
+                        'sha256': download['sha256'],
                         'prompt': prompt,
                         'platform': platform,
                         'content_type': content_type,
@@ -171,19 +189,24 @@ Technical specifications:
                             'quality': 'hd',
                             'style': 'vivid'
                         }
-                    }
+                    },
+                    prompt_fingerprint=fingerprint
                 )
+                media_dedup_service.index(media_file, download['sha256'])
+                storage_service.attach(media_file)
                 db.session.add(media_file)
                 db.session.commit()
+                media_variant_service.schedule(media_file.id)
             
             return {
                 'success': True,
                 'file_id': media_file.id if media_file else file_id,
                 'filename': filename,
-                'file_path': file_path,
+                'file_path': storage_service.local_path(media_file) if media_file else file_path,
                 'url': f"/api/media/{media_file.id if media_file else file_id}",
+                'signed_url': media_delivery_service.signed_url(media_file) if media_file else None,
                 'dimensions': {'width': width, 'height': height},
-                'file_size': len(image_response.content),
+                'file_size': download['file_size'],
                 'prompt_used': prompt,
                 'platform': platform,
                 'content_type': content_type
@@ -225,29 +248,31 @@ Please provide:
 
 Format the response as a structured JSON object."""
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            text = {'type': 'string'}
+            text_list = {'type': 'array', 'items': text}
+            route = model_router_service.route('video_concept')
+            concept_data = structured_output_service.complete(
+                self.openai_client,
+                call_site='video_concept',
+                schema=structured_output_service.object_schema({
+                    'concept': text,
+                    'scenes': text_list,
+                    'visual_style': text,
+                    'text_overlays': text_list,
+                    'call_to_action': text,
+                    'hashtags': text_list,
+                    'music': text
+                }),
+                cache=False,
+                model=route['model'],
                 messages=[
                     {"role": "system", "content": "You are a social media video production expert. Create detailed, actionable video concepts that are optimized for engagement on each platform."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.8,
-                max_tokens=1500
+                max_tokens=route['max_tokens']
             )
-            
-            # Parse the response
-            video_concept = response.choices[0].message.content
-            
-            # Try to parse as JSON, fallback to text if needed
-            try:
-                concept_data = json.loads(video_concept)
-            except json.JSONDecodeError:
-                concept_data = {
-                    'concept': video_concept,
-                    'platform': platform,
-                    'duration': duration,
-                    'tone': tone
-                }
+            concept_data.update({'platform': platform, 'duration': duration, 'tone': tone})
             
             return {
                 'success': True,
@@ -296,60 +321,41 @@ Requirements:
                 'message': 'Failed to create video thumbnail'
             }
     
-    def optimize_image_for_platform(self, image_path: str, platform: str, content_type: str = 'post') -> Dict:
-        """Optimize existing image for specific platform requirements"""
+    def optimize_image_for_platform(self, image_path: str, platform: str, content_type: str = 'post',
+                                    source_id: str = None) -> Dict:
+        """Optimize existing image for specific platform requirements.
+        
+        With source_id (a stored MediaFile) the pre-rendered variant is
+        returned, rendering it first if needed.
+        """
         try:
             # Get platform specifications
             platform_spec = self.platform_specs.get(platform, {}).get(content_type, {})
             target_width = platform_spec.get('width', 1080)
             target_height = platform_spec.get('height', 1080)
             
-            # Open and process image
-            with Image.open(image_path) as img:
-                # Convert to RGB if necessary
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Calculate optimal crop/resize
-                img_ratio = img.width / img.height
-                target_ratio = target_width / target_height
-                
-                if img_ratio > target_ratio:
-                    # Image is wider, crop width
-                    new_height = img.height
-                    new_width = int(new_height * target_ratio)
-                    left = (img.width - new_width) // 2
-                    img = img.crop((left, 0, left + new_width, new_height))
-                elif img_ratio < target_ratio:
-                    # Image is taller, crop height
-                    new_width = img.width
-                    new_height = int(new_width / target_ratio)
-                    top = (img.height - new_height) // 2
-                    img = img.crop((0, top, new_width, top + new_height))
-                
-                # Resize to target dimensions
-                img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-                
-                # Generate optimized filename
-                file_id = str(uuid.uuid4())
-                optimized_filename = f"optimized_{platform}_{content_type}_{file_id}.jpg"
-                optimized_path = os.path.join(self.storage_base_path, 'images', optimized_filename)
-                
-                # Save optimized image
-                img.save(optimized_path, 'JPEG', quality=95, optimize=True)
-                
-                # Get file size
-                file_size = os.path.getsize(optimized_path)
-                
-                return {
-                    'success': True,
-                    'optimized_path': optimized_path,
-                    'filename': optimized_filename,
-                    'dimensions': {'width': target_width, 'height': target_height},
-                    'file_size': file_size,
-                    'platform': platform,
-                    'content_type': content_type
-                }
+            if source_id and platform_spec:
+                return self._variant_result(source_id, platform, content_type)
+            
+            # Generate optimized filename
+            file_id = str(uuid.uuid4())
+            optimized_filename = f"optimized_{platform}_{content_type}_{file_id}.jpg"
+            optimized_path = os.path.join(self.storage_base_path, 'images', optimized_filename)
+            
+            # Crop, resize and encode on the image process pool
+            result = image_processing_service.run(optimize_image, image_path, optimized_path,
+                                                  target_width, target_height, 'jpeg', self.optimize_quality)
+            
+            return {
+                'success': True,
+                'optimized_path': optimized_path,
+                'filename': optimized_filename,
+                'dimensions': {'width': target_width, 'height': target_height},
+                'file_size': result['file_size'],
+                'platform': platform,
+                'content_type': content_type,
+                'timings': result['timings']
+            }
                 
         except Exception as e:
             return {
@@ -358,6 +364,32 @@ Requirements:
                 'message': 'Failed to optimize image for platform'
             }
     
+    def _variant_result(self, source_id: str, platform: str, content_type: str) -> Dict:
+        variant = media_variant_service.get_or_create_variant(source_id, platform, content_type)
+        if variant is None:
+            return {
+                'success': False,
+                'error': 'Variant could not be rendered',
+                'message': 'Failed to optimize image for platform'
+            }
+        
+        return {
+            'success': True,
+            'file_id': variant.id,
+            'url': f"/api/media/{variant.id}",
+            'signed_url': media_delivery_service.signed_url(variant),
+            'optimized_path': storage_service.local_path(variant),
+            'filename': variant.filename,
+            'dimensions': variant.dimensions,
+            'file_size': variant.file_size,
+            'platform': platform,
+            'content_type': content_type,
+            'formats': {
+                fmt: f"/api/media/{source_id}/variants/{platform}/{content_type}?format={fmt}"
+                for fmt in media_variant_service.formats
+            }
+        }
+    
     def get_media_file(self, file_id: str) -> Optional[MediaFile]:
         """Get media file by ID"""
         return MediaFile.query.filter_by(id=file_id).first()
@@ -373,14 +405,19 @@ Requirements:
                     'error': 'Media file not found'
                 }
             
-            # Delete physical file
-            if os.path.exists(media_file.storage_path):
-                os.remove(media_file.storage_path)
-            
-            # Delete database record
+            # Variants go with their source image
+            records = [media_file] + MediaFile.query.filter_by(parent_id=media_file.id).all()
+            released = []
+            for record in records:
+                released.extend(storage_service.release(record))
+            for record in records[1:]:
+                db.session.delete(record)
             db.session.delete(media_file)
             db.session.commit()
             
+            # Stored files go once no record references them
+            storage_service.purge(released)
+            
             return {
                 'success': True,
                 'message': 'Media file deleted successfully'
@@ -397,7 +434,8 @@ Requirements:
     def list_user_media(self, user_id: str, file_type: str = None, limit: int = 50, offset: int = 0) -> Dict:
         """List user's media files"""
         try:
-            query = MediaFile.query.filter_by(user_id=user_id)
+            # Variants are listed per image, not here
+            query = MediaFile.query.filter_by(user_id=user_id, parent_id=None)
             
             if file_type:
                 query = query.filter_by(file_type=file_type)
@@ -417,6 +455,7 @@ Requirements:
                     'dimensions': media_file.dimensions,
                     'duration': media_file.duration,
                     'url': f"/api/media/{media_file.id}",
+                    'signed_url': media_delivery_service.signed_url(media_file),
                     'created_at': media_file.created_at.isoformat(),
                     'metadata': media_file.file_metadata
                 })
@@ -0,0 +1,506 @@
+import os
+import json
+import random
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Any, Optional, Tuple
+import httpx
+from flask import current_app, has_app_context
+from src.models.user import MediaGenerationTask, db
+from src.services.database_service import database_service
+from src.services.download_service import download_service
+
+
+class MediaTaskService:
+    """Submitted media generations and the central poller that finishes them.
+
+    Provider jobs are stored as MediaGenerationTask rows. Polled providers
+    (Runway, Leonardo) are checked by one asyncio loop in a background thread
+    that claims due tasks from the database and polls the provider status
+    endpoints with exponential backoff and jitter. Webhook providers
+    (Midjourney) report through apply_event() instead. Either way the same
+    loop downloads finished outputs, stores the MediaFile and notifies
+    clients. Claims are leases on next_poll_at, so several pollers (one per
+    web worker, or a dedicated process) never poll the same task at once and
+    tasks of a dead process are picked up again once the lease runs out. A
+    poller extends its lease for a download and only stores the output if it
+    still holds the lease, so an output is stored once.
+    """
+
+    TERMINAL_STATUSES = ('succeeded', 'failed', 'timed_out', 'cancelled')
+    NOTIFY_CHANNEL = 'media_tasks:{user_id}'
+
+    def __init__(self):
+        # Backoff between status checks of one task
+        self.poll_base_delay = float(os.getenv('MEDIA_POLL_BASE_DELAY', '2'))  # seconds
+        self.poll_max_delay = float(os.getenv('MEDIA_POLL_MAX_DELAY', '30'))  # seconds
+        self.poll_jitter = float(os.getenv('MEDIA_POLL_JITTER', '0.3'))  # +/- fraction of the delay
+
+        # Poller
+        self.in_process = os.getenv('MEDIA_POLLER_IN_PROCESS', 'true').lower() == 'true'
+        self.max_in_flight = int(os.getenv('MEDIA_POLLER_MAX_IN_FLIGHT', '200'))
+        self.idle_interval = float(os.getenv('MEDIA_POLLER_IDLE_INTERVAL', '15'))  # seconds
+        self.claim_lease = int(os.getenv('MEDIA_POLLER_LEASE', '60'))  # seconds
+        # Held while an output downloads, so no other poller re-claims the task meanwhile
+        self.download_lease = int(os.getenv('MEDIA_POLLER_DOWNLOAD_LEASE', '1800'))  # seconds
+
+        # Give up on a generation after this long
+        self.task_timeouts = {
+            'runway': int(os.getenv('MEDIA_TASK_TIMEOUT_RUNWAY', '600')),
+            'leonardo': int(os.getenv('MEDIA_TASK_TIMEOUT_LEONARDO', '180')),
+            'midjourney': int(os.getenv('MEDIA_TASK_TIMEOUT_MIDJOURNEY', '900')),
+            'fake': int(os.getenv('MEDIA_TASK_TIMEOUT_FAKE', '120'))
+        }
+
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._loop = None
+        self._wake = None
+        self._events = {}
+        self._stats = {'polls': 0, 'poll_errors': 0, 'succeeded': 0, 'failed': 0, 'timed_out': 0, 'in_flight': 0}
+        self._lock = threading.Lock()
+
+    def create_task(self, provider: str, provider_task_id: str, media_type: str, user_id: str = None,
+                    parameters: Dict[str, Any] = None, delivery: str = 'poll') -> MediaGenerationTask:
+        """Store a submitted provider job and hand it to the poller.
+
+        Webhook tasks are never polled; they wait for apply_event().
+        """
+        now = datetime.utcnow()
+        task = MediaGenerationTask(
+            user_id=user_id,
+            provider=provider,
+            provider_task_id=provider_task_id,
+            media_type=media_type,
+            delivery=delivery,
+            status='pending',
+            parameters=parameters or {},
+            next_poll_at=now + timedelta(seconds=self.backoff_delay(0)) if delivery == 'poll' else None,
+            expires_at=now + timedelta(seconds=self.task_timeouts.get(provider, 600))
+        )
+        db.session.add(task)
+        db.session.commit()
+
+        if self.in_process:
+            self.start()
+        self.wake()
+        return task
+
+    def task_handle(self, task: MediaGenerationTask) -> Dict[str, Any]:
+        """Response for a submitted generation"""
+        return {
+            'success': True,
+            'status': task.status,
+            'task_id': task.id,
+            'status_url': f"/api/advanced-media/tasks/{task.id}",
+            'expires_at': task.expires_at.isoformat()
+        }
+
+    def get_task(self, task_id: str, user_id: str = None) -> Optional[MediaGenerationTask]:
+        """Get task by ID, optionally only if owned by the user"""
+        query = MediaGenerationTask.query.filter_by(id=task_id)
+        if user_id:
+            query = query.filter_by(user_id=user_id)
+        return query.first()
+
+    def list_tasks(self, user_id: str, status: str = None, limit: int = 50) -> List[MediaGenerationTask]:
+        """Get a user's most recent tasks"""
+        query = MediaGenerationTask.query.filter_by(user_id=user_id)
+        if status:
+            query = query.filter_by(status=status)
+        return query.order_by(MediaGenerationTask.created_at.desc()).limit(limit).all()
+
+    def cancel(self, task_id: str) -> Optional[MediaGenerationTask]:
+        """Stop polling a task; the provider job itself keeps running"""
+        task = self.get_task(task_id)
+        if task and task.status not in self.TERMINAL_STATUSES:
+            self._set_terminal(task, 'cancelled', error='Cancelled')
+            db.session.commit()
+            self._notify(task)
+        return task
+
+    def apply_event(self, provider: str, provider_task_id: str, state: str,
+                    output_url: str = None, error: str = None) -> Dict[str, Any]:
+        """Apply a provider status event to its task.
+
+        State machine: pending -> processing -> succeeded/failed. Events are
+        applied with conditional updates, so redelivered or out-of-order
+        events (and a webhook racing the poller) change a task at most once.
+        A success with an output URL queues the download on the poller.
+        Returns {'task_id', 'outcome'} with outcome applied, duplicate or unknown_task.
+        """
+        task = MediaGenerationTask.query.filter_by(provider=provider, provider_task_id=provider_task_id).first()
+        if task is None:
+            return {'task_id': None, 'outcome': 'unknown_task'}
+
+        now = datetime.utcnow()
+        open_task = MediaGenerationTask.query.filter(
+            MediaGenerationTask.id == task.id,
+            MediaGenerationTask.status.in_(['pending', 'processing']),
+            MediaGenerationTask.output_url.is_(None)
+        )
+
+        if state == 'succeeded' and output_url:
+            changed = open_task.update({
+                'status': 'processing',
+                'output_url': output_url,
+                'next_poll_at': now,
+                'updated_at': now
+            }, synchronize_session=False)
+        elif state == 'failed':
+            changed = open_task.update({
+                'status': 'failed',
+                'last_error': error or 'Generation failed',
+                'next_poll_at': None,
+                'finished_at': now,
+                'updated_at': now
+            }, synchronize_session=False)
+        elif state == 'processing':
+            changed = open_task.filter(MediaGenerationTask.status == 'pending').update(
+                {'status': 'processing', 'updated_at': now}, synchronize_session=False
+            )
+        else:
+            changed = 0
+        db.session.commit()
+
+        if changed and state == 'succeeded':
+            if self.in_process:
+                self.start()
+            self.wake()
+        elif changed and state == 'failed':
+            db.session.refresh(task)
+            self._count('failed')
+            self._notify(task)
+
+        return {'task_id': task.id, 'outcome': 'applied' if changed else 'duplicate'}
+
+    def wait(self, task_id: str, should_stop: Callable[[], bool] = None,
+             timeout: float = None) -> Dict[str, Any]:
+        """Block until a task finishes and return its result (needs an app context).
+
+        Used where a caller really needs the output, e.g. multi-provider
+        comparisons; the task is cancelled when should_stop fires first.
+        """
+        event = self._events.setdefault(task_id, threading.Event())
+        deadline = datetime.utcnow() + timedelta(seconds=timeout) if timeout else None
+        try:
+            while True:
+                db.session.expire_all()
+                task = self.get_task(task_id)
+                if task is None:
+                    return {'success': False, 'error': 'Task not found', 'task_id': task_id}
+                if task.status in self.TERMINAL_STATUSES:
+                    return self._task_result(task)
+
+                if (should_stop and should_stop()) or (deadline and datetime.utcnow() > deadline):
+                    self.cancel(task_id)
+                    return {'success': False, 'error': 'Generation cancelled', 'cancelled': True,
+                            'task_id': task_id}
+
+                # Woken by the poller in this process; re-check the database otherwise
+                event.wait(1.0)
+        finally:
+            self._events.pop(task_id, None)
+
+    def backoff_delay(self, attempts: int) -> float:
+        """Exponential backoff with jitter for the next status check"""
+        delay = min(self.poll_max_delay, self.poll_base_delay * (2 ** attempts))
+        return max(0.5, delay * random.uniform(1 - self.poll_jitter, 1 + self.poll_jitter))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get poller counters for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['running'] = self._thread is not None and self._thread.is_alive()
+        return stats
+
+    def start(self, app=None):
+        """Start the poller thread for this process if it isn't running"""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if app is None and has_app_context():
+                app = current_app._get_current_object()
+            self._app = app or self._app
+            if self._app is None:
+                logging.warning("Media task poller not started: no Flask app")
+                return
+
+            # Threads don't survive a fork; start a fresh loop in this process
+            self._pid = os.getpid()
+            self._loop = None
+            self._thread = threading.Thread(target=self._run, name='media-task-poller', daemon=True)
+            self._thread.start()
+
+    def run_forever(self, app):
+        """Run the poller in the current thread (dedicated poller process)"""
+        self._app = app
+        self._pid = os.getpid()
+        self._run()
+
+    def wake(self):
+        """Make the poller look for due tasks now"""
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and self._pid == os.getpid():
+            loop.call_soon_threadsafe(wake.set)
+
+    def _run(self):
+        try:
+            asyncio.run(self._poll_loop(self._app))
+        except Exception as e:
+            logging.error(f"Media task poller stopped: {str(e)}")
+
+    async def _poll_loop(self, app):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        in_flight = set()
+        logging.info(f"Media task poller started in process {os.getpid()}")
+
+        limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        async with httpx.AsyncClient(timeout=httpx.Timeout(30, connect=10), limits=limits,
+                                     follow_redirects=True) as client:
+            while True:
+                sleep_for = self.idle_interval
+                free = self.max_in_flight - len(in_flight)
+                if free > 0:
+                    try:
+                        claimed, next_due = await self._loop.run_in_executor(None, self._claim_due, app, free)
+                    except Exception as e:
+                        logging.error(f"Media task claim failed: {str(e)}")
+                        claimed, next_due = [], None
+
+                    for snapshot in claimed:
+                        future = asyncio.ensure_future(self._poll_task(client, app, snapshot))
+                        in_flight.add(future)
+                        future.add_done_callback(in_flight.discard)
+                    if next_due is not None:
+                        sleep_for = min(sleep_for, max(next_due, 0.1))
+
+                with self._lock:
+                    self._stats['in_flight'] = len(in_flight)
+
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=sleep_for)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _claim_due(self, app, limit: int) -> Tuple[List[Dict[str, Any]], Optional[float]]:
+        """Lease due tasks to this poller; returns them and seconds until the next one"""
+        with app.app_context():
+            now = datetime.utcnow()
+            open_tasks = MediaGenerationTask.query.filter(
+                MediaGenerationTask.status.in_(['pending', 'processing'])
+            )
+            # Webhook tasks whose callback never came
+            expired = open_tasks.filter(
+                MediaGenerationTask.delivery == 'webhook',
+                MediaGenerationTask.output_url.is_(None),
+                MediaGenerationTask.expires_at <= now
+            ).all()
+            for task in expired:
+                self._set_terminal(task, 'timed_out', error='No callback received')
+            if expired:
+                db.session.commit()
+                for task in expired:
+                    self._count('timed_out')
+                    self._notify(task)
+
+            due = open_tasks.filter(MediaGenerationTask.next_poll_at <= now).order_by(
+                MediaGenerationTask.next_poll_at
+            ).limit(limit).all()
+
+            claimed = []
+            lease_until = now + timedelta(seconds=self.claim_lease)
+            for task in due:
+                # Compare-and-set, so only one poller wins each task
+                won = MediaGenerationTask.query.filter_by(
+                    id=task.id, next_poll_at=task.next_poll_at
+                ).update({'next_poll_at': lease_until}, synchronize_session=False)
+                if won:
+                    claimed.append({
+                        'id': task.id,
+                        'provider': task.provider,
+                        'provider_task_id': task.provider_task_id,
+                        'output_url': task.output_url,
+                        'expires_at': task.expires_at,
+                        'lease': lease_until
+                    })
+            db.session.commit()
+
+            upcoming = open_tasks.with_entities(db.func.min(MediaGenerationTask.next_poll_at)).scalar()
+            next_due = (upcoming - datetime.utcnow()).total_seconds() if upcoming else None
+            return claimed, next_due
+
+    async def _poll_task(self, client: httpx.AsyncClient, app, snapshot: Dict[str, Any]):
+        """Check one task and finish, fail or reschedule it"""
+        from src.services.advanced_media_service import advanced_media_service
+
+        loop = asyncio.get_running_loop()
+        task_id = snapshot['id']
+        provider = snapshot['provider']
+        try:
+            if datetime.utcnow() >= snapshot['expires_at']:
+                if snapshot['output_url']:
+                    await loop.run_in_executor(None, self._finish, app, task_id, 'failed',
+                                               'Output could not be downloaded')
+                else:
+                    await loop.run_in_executor(None, self._finish, app, task_id, 'timed_out', 'Generation timeout')
+                return
+
+            if snapshot['output_url']:
+                # Reported finished by a webhook; only the download is left
+                await self._download_and_complete(loop, app, snapshot, snapshot['output_url'])
+                return
+
+            url, headers = advanced_media_service.get_task_status_request(provider, snapshot['provider_task_id'])
+            response = await client.get(url, headers=headers)
+            self._count('polls')
+
+            if response.status_code != 200:
+                raise RuntimeError(f'{provider} status check returned {response.status_code}')
+
+            status = advanced_media_service.parse_task_status(provider, response.json())
+            if status['state'] == 'succeeded':
+                await self._download_and_complete(loop, app, snapshot, status['output_url'])
+            elif status['state'] == 'failed':
+                await loop.run_in_executor(None, self._finish, app, task_id, 'failed', status.get('error'))
+            else:
+                await loop.run_in_executor(None, self._reschedule, app, task_id, None)
+
+        except Exception as e:
+            self._count('poll_errors')
+            logging.warning(f"Polling media task {task_id} failed: {str(e)}")
+            try:
+                await loop.run_in_executor(None, self._reschedule, app, task_id, str(e))
+            except Exception as reschedule_error:
+                # The lease runs out and another round picks the task up
+                logging.error(f"Rescheduling media task {task_id} failed: {str(reschedule_error)}")
+
+    async def _download_and_complete(self, loop: asyncio.AbstractEventLoop, app, snapshot: Dict[str, Any],
+                                     output_url: str):
+        """Download a finished output under an extended lease and store it"""
+        from src.services.advanced_media_service import advanced_media_service
+
+        lease = await loop.run_in_executor(None, self._extend_lease, app, snapshot['id'], snapshot['lease'])
+        if lease is None:
+            return
+
+        output = advanced_media_service.get_task_output_path(snapshot['provider'])
+        download = await loop.run_in_executor(None, download_service.download, output_url, output['file_path'])
+        await loop.run_in_executor(None, self._complete, app, snapshot['id'], lease, output, download)
+
+    def _extend_lease(self, app, task_id: str, lease: datetime) -> Optional[datetime]:
+        """Hold a claimed task for a download; None when another poller has it now"""
+        with app.app_context():
+            extended = datetime.utcnow() + timedelta(seconds=self.download_lease)
+            won = self._leased(task_id, lease).update({'next_poll_at': extended}, synchronize_session=False)
+            db.session.commit()
+            return extended if won else None
+
+    def _leased(self, task_id: str, lease: datetime):
+        """The task, if it is still open and leased to the caller"""
+        return MediaGenerationTask.query.filter(
+            MediaGenerationTask.id == task_id,
+            MediaGenerationTask.status.in_(['pending', 'processing']),
+            MediaGenerationTask.next_poll_at == lease
+        )
+
+    def _complete(self, app, task_id: str, lease: datetime, output: Dict[str, Any], download: Dict[str, Any]):
+        from src.services.advanced_media_service import advanced_media_service
+
+        with app.app_context():
+            # Compare-and-set in the storing transaction: a poller that lost
+            # its lease (or a cancel) leaves the task alone
+            won = self._leased(task_id, lease).update(
+                {'next_poll_at': None, 'updated_at': datetime.utcnow()}, synchronize_session=False
+            )
+            if not won:
+                db.session.rollback()
+                os.remove(output['file_path'])
+                return
+
+            task = self.get_task(task_id)
+            try:
+                result = advanced_media_service.store_task_output(task, output, download)
+            except Exception:
+                db.session.rollback()
+                os.remove(output['file_path'])
+                raise
+
+            task.result = result
+            task.media_file_id = result.get('media_file_id')
+            self._set_terminal(task, 'succeeded')
+            db.session.commit()
+            self._count('succeeded')
+            self._notify(task)
+
+            if task.media_type == 'image' and task.media_file_id:
+                from src.services.media_variant_service import media_variant_service
+                media_variant_service.schedule(task.media_file_id, app)
+
+    def _finish(self, app, task_id: str, status: str, error: str = None):
+        with app.app_context():
+            task = self.get_task(task_id)
+            if task is None or task.status in self.TERMINAL_STATUSES:
+                return
+            self._set_terminal(task, status, error=error or 'Generation failed')
+            db.session.commit()
+            self._count(status)
+            self._notify(task)
+
+    def _reschedule(self, app, task_id: str, error: str = None):
+        with app.app_context():
+            task = self.get_task(task_id)
+            if task is None or task.status in self.TERMINAL_STATUSES:
+                return
+            task.poll_attempts += 1
+            task.status = 'processing'
+            task.next_poll_at = datetime.utcnow() + timedelta(seconds=self.backoff_delay(task.poll_attempts))
+            if error:
+                task.last_error = error
+            db.session.commit()
+
+    def _set_terminal(self, task: MediaGenerationTask, status: str, error: str = None):
+        task.status = status
+        task.next_poll_at = None
+        task.finished_at = datetime.utcnow()
+        if error:
+            task.last_error = error
+
+    def _task_result(self, task: MediaGenerationTask) -> Dict[str, Any]:
+        if task.status == 'succeeded':
+            return dict(task.result or {}, success=True, task_id=task.id)
+        return {
+            'success': False,
+            'error': task.last_error or 'Generation failed',
+            'task_id': task.id,
+            'timed_out': task.status == 'timed_out',
+            'cancelled': task.status == 'cancelled'
+        }
+
+    def _notify(self, task: MediaGenerationTask):
+        """Wake local waiters and publish the final state for connected clients"""
+        event = self._events.get(task.id)
+        if event is not None:
+            event.set()
+
+        if database_service.redis_client and task.user_id:
+            try:
+                database_service.redis_client.publish(
+                    self.NOTIFY_CHANNEL.format(user_id=task.user_id),
+                    json.dumps({'event': 'media_task', 'task': task.to_dict()})
+                )
+            except Exception as e:
+                logging.error(f"Media task notification failed: {str(e)}")
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] = self._stats.get(name, 0) + 1
+
+
+# Service instance
+media_task_service = MediaTaskService()
@@ -0,0 +1,180 @@
+import os
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+from flask import current_app, has_app_context
+from sqlalchemy.exc import IntegrityError
+from src.models.user import MediaFile, db
+from src.services.image_processing_service import image_processing_service, supported_formats
+from src.services.storage_service import storage_service
+
+
+class MediaVariantService:
+    """Pre-rendered platform variants of generated images.
+
+    When an image is stored, every platform_specs size is rendered once on
+    the image process pool in JPEG plus WebP/AVIF where Pillow supports them.
+    Variants are MediaFile children keyed by (parent, platform, content_type,
+    format); sizes shared by several platform/content type pairs are rendered
+    once and their rows share one stored blob.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('MEDIA_VARIANTS_ENABLED', 'true').lower() == 'true'
+        requested = [f.strip().lower() for f in os.getenv('MEDIA_VARIANT_FORMATS', 'jpeg,webp,avif').split(',')]
+        self.formats = [f for f in requested if f in supported_formats()] or ['jpeg']
+
+        # Coordinates rendering and the database writes; the pixels go to the process pool
+        self._dispatcher = None
+        self._dispatcher_pid = None
+        self._lock = threading.Lock()
+
+    def platform_specs(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        from src.services.media_generation_service import media_generation_service
+        return media_generation_service.platform_specs
+
+    def schedule(self, media_file_id: str, app=None):
+        """Render all variants of a new image in the background"""
+        if not self.enabled:
+            return
+        if app is None and has_app_context():
+            app = current_app._get_current_object()
+        if app is None:
+            logging.warning(f"Variants for {media_file_id} not scheduled: no Flask app")
+            return
+        self.get_dispatcher().submit(self._create_variants_logged, app, media_file_id)
+
+    def create_variants(self, app, media_file_id: str,
+                        specs: List[Tuple[str, str]] = None) -> List[MediaFile]:
+        """Render missing variants (all platform specs by default) and store them"""
+        with app.app_context():
+            source = MediaFile.query.get(media_file_id)
+            if not source or source.file_type != 'image' or source.parent_id:
+                return []
+
+            all_specs = self.platform_specs()
+            wanted = specs or [(platform, content_type)
+                               for platform, types in all_specs.items() for content_type in types]
+            existing = {
+                (v.variant_platform, v.variant_content_type, v.variant_format)
+                for v in MediaFile.query.filter_by(parent_id=source.id).all()
+            }
+            missing = [
+                (platform, content_type, fmt)
+                for platform, content_type in wanted if content_type in all_specs.get(platform, {})
+                for fmt in self.formats if (platform, content_type, fmt) not in existing
+            ]
+            if not missing:
+                return []
+
+            source_path = storage_service.local_path(source)
+            source_id = source.id
+            user_id = source.user_id
+
+        # Each distinct size is rendered once, in parallel
+        sizes = {}
+        for platform, content_type in dict.fromkeys((platform, content_type) for platform, content_type, _ in missing):
+            spec = all_specs[platform][content_type]
+            sizes.setdefault((spec['width'], spec['height']), []).append((platform, content_type))
+
+        output_dir = os.path.join(storage_service.staging_path, 'variants', source_id)
+        formats = sorted({fmt for _, _, fmt in missing}, key=self.formats.index)
+        outputs = image_processing_service.render_sizes(source_path, output_dir, list(sizes), formats)
+
+        missing_keys = set(missing)
+        created = []
+        with app.app_context():
+            for output in outputs:
+                pairs = [(platform, content_type) for platform, content_type in sizes[(output['width'], output['height'])]
+                         if (platform, content_type, output['format']) in missing_keys]
+                if not pairs:
+                    continue
+                # One blob per rendered file, one reference per variant row
+                blob = storage_service.store(output['file_path'], mime_type=output['mime_type'], references=len(pairs))
+                for platform, content_type in pairs:
+                    variant = MediaFile(
+                        user_id=user_id,
+                        filename=output['filename'],
+                        original_filename=f"{platform}_{content_type}.{output['filename'].rsplit('.', 1)[1]}",
+                        file_type='image',
+                        file_size=blob.size,
+                        storage_path=blob.storage_key,
+                        storage_provider=blob.backend,
+                        content_hash=blob.content_hash,
+                        mime_type=output['mime_type'],
+                        dimensions={'width': output['width'], 'height': output['height']},
+                        file_metadata={'variant_of': source_id},
+                        parent_id=source_id,
+                        variant_platform=platform,
+                        variant_content_type=content_type,
+                        variant_format=output['format']
+                    )
+                    db.session.add(variant)
+                    created.append(variant)
+            try:
+                db.session.commit()
+            except IntegrityError as e:
+                # Rendered concurrently by another request; theirs are identical
+                logging.warning(f"Variants of {source_id} already stored: {str(e.orig)}")
+                db.session.rollback()
+                created = []
+            for variant in created:
+                db.session.refresh(variant)
+                db.session.expunge(variant)
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+        logging.info(f"Rendered {len(created)} variants of {source_id}")
+        return created
+
+    def get_variant(self, media_file_id: str, platform: str, content_type: str,
+                    fmt: str = 'jpeg') -> Optional[MediaFile]:
+        """Look up a stored variant"""
+        return MediaFile.query.filter_by(
+            parent_id=media_file_id,
+            variant_platform=platform,
+            variant_content_type=content_type,
+            variant_format=fmt
+        ).first()
+
+    def get_or_create_variant(self, media_file_id: str, platform: str, content_type: str,
+                              fmt: str = 'jpeg') -> Optional[MediaFile]:
+        """Serve a variant from the index, rendering just that spec if it's missing"""
+        variant = self.get_variant(media_file_id, platform, content_type, fmt)
+        if variant is None:
+            self.create_variants(current_app._get_current_object(), media_file_id, [(platform, content_type)])
+            variant = self.get_variant(media_file_id, platform, content_type, fmt)
+        return variant
+
+    def list_variants(self, media_file_id: str) -> List[MediaFile]:
+        """All variants of an image"""
+        return MediaFile.query.filter_by(parent_id=media_file_id).order_by(
+            MediaFile.variant_platform, MediaFile.variant_content_type, MediaFile.variant_format
+        ).all()
+
+    def preferred_format(self, accept_header: str) -> str:
+        """Best stored format the client accepts"""
+        accept = (accept_header or '').lower()
+        for fmt in ('avif', 'webp'):
+            if fmt in self.formats and f'image/{fmt}' in accept:
+                return fmt
+        return 'jpeg'
+
+    def get_dispatcher(self) -> ThreadPoolExecutor:
+        """Get the coordinating thread pool, recreating it after a fork"""
+        with self._lock:
+            if self._dispatcher is None or self._dispatcher_pid != os.getpid():
+                self._dispatcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='media-variants')
+                self._dispatcher_pid = os.getpid()
+            return self._dispatcher
+
+    def _create_variants_logged(self, app, media_file_id: str):
+        try:
+            self.create_variants(app, media_file_id)
+        except Exception as e:
+            logging.error(f"Creating variants of {media_file_id} failed: {str(e)}")
+
+
+# Service instance
+media_variant_service = MediaVariantService()
@@ -0,0 +1,126 @@
+import os
+import math
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+
+class ModelRouterService:
+    """Picks the model and max_tokens per LLM call and tracks tokens used against that budget"""
+
+    # Default model and token budget per task type
+    TASKS = {
+        'generation': {'model': 'gpt-4.1-mini', 'max_tokens': 1000, 'premium': True},
+        'generation_batch': {'model': 'gpt-4.1-mini', 'max_tokens': 4000, 'premium': True},
+        'improvement': {'model': 'gpt-4.1-mini', 'max_tokens': 800, 'premium': True},
+        'image_prompt': {'model': 'gpt-4.1-mini', 'max_tokens': 150, 'premium': False},
+        'analysis': {'model': 'gpt-4.1-mini', 'max_tokens': 300, 'premium': True},
+        'tone_check': {'model': 'gpt-4.1-mini', 'max_tokens': 250, 'premium': False},
+        'hashtags': {'model': 'gpt-4.1-nano', 'max_tokens': 100, 'premium': False},
+        'sentiment': {'model': 'gpt-4.1-mini', 'max_tokens': 1500, 'premium': False},
+        'content_ideas': {'model': 'gpt-4.1-mini', 'max_tokens': 800, 'premium': False},
+        'video_concept': {'model': 'gpt-4.1-mini', 'max_tokens': 1000, 'premium': True},
+    }
+
+    # Completion token samples kept per call site/model for percentile stats
+    SAMPLE_SIZE = 500
+
+    def __init__(self):
+        self.chars_per_token = float(os.getenv('LLM_CHARS_PER_TOKEN', '3.0'))
+        self.premium_model = os.getenv('LLM_PREMIUM_MODEL', 'gpt-4.1')
+        self.premium_tiers = {
+            tier.strip().lower()
+            for tier in os.getenv('LLM_PREMIUM_TIERS', 'pro,business,enterprise').split(',')
+            if tier.strip()
+        }
+
+        self._usage = {}
+        self._lock = threading.Lock()
+
+    def route(self, task: str, subscription_tier: str = None, max_length: int = None,
+              hashtag_count: int = 0, items: int = 1) -> Dict[str, Any]:
+        """Pick model and max_tokens for a call.
+
+        max_length is the platform's character limit (generation tasks),
+        hashtag_count the number of hashtags requested and items the number of
+        outputs in one response (platforms in a batch, posts in a sentiment batch).
+        """
+        config = self.TASKS[task]
+        model = os.getenv(f'LLM_MODEL_{task.upper()}', config['model'])
+        if config['premium'] and subscription_tier and subscription_tier.lower() in self.premium_tiers:
+            model = self.premium_model
+
+        cap = int(os.getenv(f'LLM_MAX_TOKENS_{task.upper()}', config['max_tokens']))
+        items = max(items, 1)
+
+        if task in ('generation', 'improvement') and max_length:
+            max_tokens = self._tokens_for_chars(max_length) + hashtag_count * 6 + 16
+        elif task == 'generation_batch' and max_length:
+            # max_length is the sum of the limits of all platforms in the batch
+            max_tokens = self._tokens_for_chars(max_length) + hashtag_count * 6 + 24 * items
+        elif task == 'hashtags':
+            max_tokens = max(hashtag_count, 5) * 8 + 8
+        elif task == 'sentiment':
+            # One label per post plus the summary fields
+            max_tokens = 200 + 6 * items
+        else:
+            max_tokens = cap
+
+        return {'model': model, 'max_tokens': max(64, min(max_tokens, cap))}
+
+    def record_usage(self, call_site: str, model: str, max_tokens: Optional[int], response) -> None:
+        """Record tokens used by a completion against its max_tokens budget"""
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return
+
+        choices = getattr(response, 'choices', None) or []
+        truncated = bool(choices) and getattr(choices[0], 'finish_reason', None) == 'length'
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+
+        with self._lock:
+            entry = self._usage.setdefault((call_site, model), {
+                'calls': 0,
+                'prompt_tokens': 0,
+                'completion_tokens': 0,
+                'budget_tokens': 0,
+                'truncated': 0,
+                'samples': deque(maxlen=self.SAMPLE_SIZE)
+            })
+            entry['calls'] += 1
+            entry['prompt_tokens'] += getattr(usage, 'prompt_tokens', 0) or 0
+            entry['completion_tokens'] += completion_tokens
+            entry['budget_tokens'] += max_tokens or 0
+            entry['truncated'] += int(truncated)
+            entry['samples'].append(completion_tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get token usage vs budget per call site and model"""
+        with self._lock:
+            entries = {key: dict(entry, samples=sorted(entry['samples'])) for key, entry in self._usage.items()}
+
+        stats = {}
+        for (call_site, model), entry in entries.items():
+            samples = entry.pop('samples')
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))] if samples else 0
+            entry.update({
+                'model': model,
+                'avg_completion_tokens': round(entry['completion_tokens'] / entry['calls'], 1),
+                'p95_completion_tokens': p95,
+                'max_completion_tokens': samples[-1] if samples else 0,
+                'budget_utilization': round(entry['completion_tokens'] / entry['budget_tokens'], 4)
+                if entry['budget_tokens'] else None,
+                # Headroom over observed p95, unless calls are already being cut off
+                'suggested_max_tokens': None if entry['truncated'] else int(math.ceil(p95 * 1.2))
+            })
+            stats.setdefault(call_site, []).append(entry)
+
+        return stats
+
+    def _tokens_for_chars(self, chars: int) -> int:
+        # 15% headroom so the model isn't cut off right at the platform limit
+        return int(math.ceil(chars / self.chars_per_token * 1.15))
+
+
+# Service instance
+model_router_service = ModelRouterService()
@@ -0,0 +1,99 @@
+import os
+import asyncio
+import logging
+import threading
+import weakref
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+
+class OpenAIClientService:
+    """Process-wide registry of OpenAI clients sharing one tuned connection pool.
+
+    Clients are created lazily and re-created after a fork (gunicorn post_fork,
+    Celery worker_process_init), so forked workers never share sockets with
+    their parent. An httpx.AsyncClient is bound to the event loop it first runs
+    on, so there is one async client per loop.
+    """
+
+    def __init__(self):
+        self.api_key = os.getenv('OPENAI_API_KEY')
+        self.base_url = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
+
+        # Shared timeouts and retry policy
+        self.timeout = float(os.getenv('OPENAI_TIMEOUT', '60'))
+        self.connect_timeout = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '10'))
+        self.max_retries = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+
+        # Connection pool limits
+        self.max_connections = int(os.getenv('OPENAI_MAX_CONNECTIONS', '100'))
+        self.max_keepalive_connections = int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '20'))
+        self.keepalive_expiry = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '60'))
+
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncOpenAI
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get_client(self) -> OpenAI:
+        """Get the shared synchronous client"""
+        with self._lock:
+            self._check_fork()
+            if self._client is None:
+                self._client = OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    max_retries=self.max_retries,
+                    timeout=self._timeout(),
+                    http_client=httpx.Client(limits=self._limits(), timeout=self._timeout())
+                )
+            return self._client
+
+    def get_async_client(self) -> AsyncOpenAI:
+        """Get the shared asynchronous client of the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._check_fork()
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    max_retries=self.max_retries,
+                    timeout=self._timeout(),
+                    http_client=httpx.AsyncClient(limits=self._limits(), timeout=self._timeout())
+                )
+                self._async_clients[loop] = client
+            return client
+
+    def reset(self):
+        """Drop clients inherited from a parent process.
+
+        The inherited connections belong to the parent, so they are not closed
+        here; new clients are built on next use.
+        """
+        with self._lock:
+            self._client = None
+            self._async_clients = weakref.WeakKeyDictionary()
+            self._pid = os.getpid()
+        logging.info(f"OpenAI clients reset for process {os.getpid()}")
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._client = None
+            self._async_clients = weakref.WeakKeyDictionary()
+            self._pid = os.getpid()
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def _timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+
+# Service instance
+openai_client_service = OpenAIClientService()
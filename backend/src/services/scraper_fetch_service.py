@@ -0,0 +1,173 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Union
+from urllib.parse import urlsplit
+import httpx
+
+
+class TokenBucket:
+    """Requests per second with bursts; used from the fetch loop only"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self) -> float:
+        """Take a token, waiting for one if needed; returns seconds waited"""
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return waited
+            delay = (1 - self.tokens) / self.rate
+            waited += delay
+            await asyncio.sleep(delay)
+
+    def drain(self, seconds: float):
+        """Hold back new requests for a while (after a 429)"""
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class ScraperFetchService:
+    """Shared HTTP fetch layer for the sentiment and trend scrapers.
+
+    Requests run concurrently on one asyncio loop in a background thread
+    with a pooled httpx client, paced per host by token buckets
+    (SCRAPER_RATE_LIMITS, e.g. "www.reddit.com=1:5" for 1 request/s with
+    bursts of 5) instead of fixed sleeps. 429s and 5xx are retried after
+    Retry-After or a backoff. Callers stay synchronous: get_many() blocks
+    until all of its requests are done, and run_all() fans out whole
+    scrape-and-analyse jobs on a thread pool.
+    """
+
+    def __init__(self):
+        self.default_rate = float(os.getenv('SCRAPER_DEFAULT_RATE', '5'))  # requests/s per host
+        self.rate_limits = {}
+        for entry in os.getenv('SCRAPER_RATE_LIMITS', 'www.reddit.com=1:5,api.twitter.com=3:10').split(','):
+            if '=' in entry:
+                host, limit = entry.strip().split('=', 1)
+                rate, _, burst = limit.partition(':')
+                self.rate_limits[host] = (float(rate), float(burst or rate))
+        self.timeout = float(os.getenv('SCRAPER_TIMEOUT', '30'))  # seconds
+        self.max_retries = int(os.getenv('SCRAPER_MAX_RETRIES', '2'))
+        self.max_connections = int(os.getenv('SCRAPER_MAX_CONNECTIONS', '50'))
+        self.max_workers = int(os.getenv('SCRAPER_MAX_WORKERS', '16'))
+
+        self._loop = None
+        self._client = None
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """Get the fetch loop, starting it (again after a fork) if needed"""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._client = None
+                self._buckets = {}
+                self._executor = None
+                self._pid = os.getpid()
+                threading.Thread(target=self._loop.run_forever, name='scraper-fetch', daemon=True).start()
+            return self._loop
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        """Get the pool for run_all(), recreating it after a fork"""
+        self.get_loop()
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scraper')
+            return self._executor
+
+    def get(self, url: str, params: Dict[str, Any] = None, headers: Dict[str, str] = None) -> httpx.Response:
+        """GET one URL; raises on connection errors"""
+        result = self.get_many([{'url': url, 'params': params, 'headers': headers}])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def get_many(self, requests: List[Dict[str, Any]]) -> List[Union[httpx.Response, Exception]]:
+        """GET all requests ({'url', 'params', 'headers'}) concurrently.
+
+        Results are in request order; a request that failed has its exception
+        in its place. Responses are read completely.
+        """
+        if not requests:
+            return []
+        future = asyncio.run_coroutine_threadsafe(self._get_many(requests), self.get_loop())
+        return future.result()
+
+    def run_all(self, jobs: List[Callable[[], Any]]) -> List[Any]:
+        """Run blocking jobs concurrently; results in job order, exceptions in place of failures"""
+        futures = [self.get_executor().submit(job) for job in jobs]
+        results = []
+        for index, future in enumerate(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logging.error(f"Scraper job {index} failed: {str(e)}")
+                results.append(e)
+        return results
+
+    async def _get_many(self, requests: List[Dict[str, Any]]) -> List[Union[httpx.Response, Exception]]:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=10),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=20),
+                follow_redirects=True
+            )
+        return await asyncio.gather(
+            *(self._fetch(request['url'], request.get('params'), request.get('headers')) for request in requests),
+            return_exceptions=True
+        )
+
+    async def _fetch(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> httpx.Response:
+        bucket = self._bucket(urlsplit(url).hostname or '')
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            try:
+                response = await self._client.get(url, params=params, headers=headers)
+            except (httpx.ConnectError, httpx.TimeoutException) as e:
+                if attempt == self.max_retries:
+                    raise
+                logging.warning(f"Fetching {url} failed, retrying: {str(e)}")
+                await asyncio.sleep(min(2 ** attempt, 10))
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == self.max_retries:
+                    return response
+                delay = self._retry_after(response, attempt)
+                if response.status_code == 429:
+                    bucket.drain(delay)
+                logging.warning(f"{url} returned {response.status_code}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            return response
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate, burst = self.rate_limits.get(host, (self.default_rate, self.default_rate))
+            bucket = self._buckets[host] = TokenBucket(rate, burst)
+        return bucket
+
+    def _retry_after(self, response: httpx.Response, attempt: int) -> float:
+        try:
+            return min(float(response.headers.get('Retry-After', '')), 30.0)
+        except ValueError:
+            return min(2 ** attempt, 10)
+
+
+# Service instance
+scraper_fetch_service = ScraperFetchService()
@@ -344,6 +344,7 @@ class SecurityService:
                 'sessions': 0,
                 'cache_entries': 0
             }
+            released_media = []
             
             # If no categories specified, delete everything
             if not categories:
@@ -360,11 +361,11 @@ class SecurityService:
                 
                 # Delete media files
                 from src.models.user import MediaFile
+                from src.services.storage_service import storage_service
                 media_files = MediaFile.query.filter_by(user_id=user_id).all()
                 for media_file in media_files:
-                    # Delete physical file
-                    if os.path.exists(media_file.storage_path):
-                        os.remove(media_file.storage_path)
+                    # Stored files shared with other users stay until their last reference goes
+                    released_media.extend(storage_service.release(media_file))
                     db.session.delete(media_file)
                     deleted_items['media_files'] += 1
             
@@ -403,6 +404,8 @@ class SecurityService:
                 user.preferences = {}
             
             db.session.commit()
+            if released_media:
+                storage_service.purge(released_media)
             
             # Log the deletion
             self.log_security_event('gdpr_data_deletion', user_id, {
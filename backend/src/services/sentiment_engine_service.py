@@ -0,0 +1,280 @@
+import os
+import re
+import logging
+from collections import Counter
+from typing import Dict, List, Any
+import numpy as np
+from src.services.hashtag_engine_service import hashtag_engine_service
+
+EN, NL = 0, 1
+LANGUAGES = ('en', 'nl')
+
+# Valence from -4 (most negative) to +4, on VADER's scale. Emoji and
+# emoticons count in both languages.
+SHARED_LEXICON = {
+    ':)': 2.0, ':-)': 2.0, ':d': 2.3, ':-d': 2.3, ';)': 1.5, ';-)': 1.5, '<3': 2.5, ':p': 1.2,
+    'ok': 1.2, 'oke': 1.2, 'oké': 1.2,
+    ':(': -2.2, ':-(': -2.2, ":'(": -2.4, ':/': -1.2, ':-/': -1.2, '</3': -2.5,
+    '😍': 3.0, '🥰': 3.0, '😀': 2.3, '😃': 2.3, '😄': 2.4, '😁': 2.2, '😊': 2.4, '🙂': 1.6,
+    '😂': 1.7, '🤣': 1.8, '😉': 1.4, '👍': 1.8, '👏': 2.0, '🙌': 2.1, '🔥': 1.5, '💯': 1.9,
+    '❤': 2.7, '💙': 2.5, '💚': 2.5, '💪': 1.8, '🎉': 2.3, '🥳': 2.5, '🙏': 1.4, '✨': 1.3,
+    '😢': -2.2, '😭': -1.9, '😞': -2.1, '😔': -1.8, '😟': -1.9, '😡': -2.9, '😠': -2.5, '🤬': -3.0,
+    '👎': -2.0, '🤮': -2.8, '💩': -1.8, '🙄': -1.3, '😤': -1.8, '😒': -1.6, '💔': -2.5, '😱': -1.6,
+}
+
+ENGLISH_LEXICON = {
+    'love': 3.2, 'loved': 2.9, 'loves': 2.7, 'lovely': 2.8, 'adore': 2.9, 'like': 1.5, 'liked': 1.8,
+    'good': 1.9, 'great': 3.1, 'awesome': 3.1, 'amazing': 2.8, 'excellent': 2.7, 'fantastic': 2.6,
+    'wonderful': 2.7, 'brilliant': 2.8, 'perfect': 2.7, 'best': 3.2, 'better': 1.9, 'nice': 1.8,
+    'cool': 1.3, 'happy': 2.7, 'glad': 2.0, 'excited': 2.2, 'exciting': 2.2, 'fun': 2.3,
+    'enjoy': 2.2, 'enjoyed': 2.3, 'beautiful': 2.9, 'impressive': 2.3, 'impressed': 2.1,
+    'recommend': 1.5, 'recommended': 1.7, 'helpful': 1.8, 'useful': 1.9, 'easy': 1.9, 'fast': 1.0,
+    'reliable': 1.9, 'safe': 1.9, 'secure': 1.4, 'smart': 1.7, 'innovative': 1.7, 'success': 2.7,
+    'successful': 2.8, 'win': 2.8, 'wins': 2.7, 'winning': 2.4, 'thanks': 1.9, 'thank': 1.5,
+    'grateful': 2.0, 'proud': 2.1, 'incredible': 2.6, 'outstanding': 3.0, 'superb': 3.1,
+    'favorite': 2.0, 'favourite': 2.0, 'yay': 2.4, 'wow': 2.8, 'congrats': 2.4, 'congratulations': 2.9,
+    'pleased': 1.9, 'satisfied': 1.8, 'friendly': 2.2, 'growth': 1.6, 'improved': 2.1, 'improvement': 2.0,
+    'bad': -2.5, 'worse': -2.1, 'worst': -3.1, 'terrible': -2.1, 'horrible': -2.5, 'awful': -2.0,
+    'hate': -2.7, 'hated': -3.2, 'hates': -1.9, 'dislike': -1.6, 'poor': -2.1, 'sad': -2.1,
+    'angry': -2.3, 'annoying': -1.7, 'annoyed': -1.6, 'disappointed': -1.9, 'disappointing': -2.2,
+    'disappointment': -2.3, 'frustrated': -2.1, 'frustrating': -1.9, 'boring': -1.3, 'broken': -2.1,
+    'useless': -1.8, 'slow': -1.2, 'expensive': -0.9, 'scam': -2.6, 'fake': -2.1, 'spam': -1.5,
+    'problem': -1.7, 'problems': -1.7, 'issue': -0.8, 'issues': -0.9, 'bug': -1.2, 'bugs': -1.4,
+    'fail': -2.5, 'failed': -2.3, 'failure': -2.3, 'fails': -2.0, 'crash': -1.7, 'crashed': -1.9,
+    'ugly': -2.3, 'stupid': -2.4, 'waste': -1.8, 'wasted': -2.2, 'wrong': -2.1, 'sucks': -1.5,
+    'suck': -1.9, 'lame': -1.8, 'pathetic': -2.2, 'disgusting': -2.4, 'ridiculous': -1.5,
+    'worry': -1.9, 'worried': -1.2, 'fear': -2.2, 'scared': -1.9, 'risk': -1.1, 'risky': -0.8,
+    'crisis': -3.1, 'lost': -1.3, 'loss': -1.3, 'layoffs': -2.0, 'unreliable': -1.6, 'unsafe': -2.2,
+    'complaint': -1.5, 'complaints': -1.7, 'delay': -1.3, 'delayed': -0.9, 'outage': -1.8,
+}
+
+DUTCH_LEXICON = {
+    'goed': 1.9, 'goede': 1.9, 'prima': 1.8, 'geweldig': 3.1, 'geweldige': 3.1, 'fantastisch': 3.0,
+    'fantastische': 3.0, 'prachtig': 3.0, 'prachtige': 3.0, 'uitstekende': 3.0, 'mooi': 2.0, 'mooie': 2.0,
+    'leuk': 2.0, 'leuke': 2.0, 'fijn': 1.9, 'fijne': 1.9, 'top': 2.2, 'toppie': 2.3, 'gaaf': 2.2,
+    'tof': 2.0, 'vet': 1.6, 'briljant': 2.9, 'uitstekend': 3.0, 'perfect': 2.9, 'perfecte': 2.9,
+    'beste': 3.0, 'beter': 1.9, 'blij': 2.4, 'gelukkig': 2.6, 'trots': 2.1, 'tevreden': 2.0,
+    'aanrader': 2.4, 'aanbevolen': 1.6, 'dankbaar': 2.3, 'bedankt': 1.8, 'dank': 1.6, 'dankjewel': 2.0,
+    'liefde': 3.0, 'genieten': 2.2, 'genoten': 2.3, 'heerlijk': 2.8, 'heerlijke': 2.8, 'lekker': 2.0,
+    'handig': 1.6, 'handige': 1.6, 'makkelijk': 1.5, 'eenvoudig': 1.1, 'snel': 1.0, 'vriendelijk': 1.9,
+    'behulpzaam': 1.9, 'succes': 2.1, 'succesvol': 2.3, 'innovatief': 1.7, 'slim': 1.5, 'sterk': 1.4,
+    'betrouwbaar': 1.8, 'veilig': 1.6, 'knap': 1.7, 'bravo': 2.3, 'hoera': 2.5, 'episch': 2.3,
+    'gefeliciteerd': 2.8, 'enthousiast': 2.2, 'inspirerend': 2.3, 'indrukwekkend': 2.3, 'winst': 1.6,
+    'groei': 1.5, 'verbeterd': 2.0, 'verbetering': 1.9, 'favoriet': 2.0, 'klantvriendelijk': 1.9,
+    'slecht': -2.5, 'slechte': -2.5, 'slechter': -2.1, 'slechtste': -3.1, 'vreselijk': -3.0, 'vreselijke': -3.0,
+    'verschrikkelijk': -3.2, 'verschrikkelijke': -3.2, 'waardeloos': -3.0, 'waardeloze': -3.0, 'teleurgesteld': -2.4,
+    'teleurstellend': -2.4, 'teleurstelling': -2.3, 'boos': -2.3, 'kwaad': -2.3, 'woedend': -3.0,
+    'haat': -3.2, 'haten': -3.0, 'hekel': -2.2, 'triest': -2.1, 'verdrietig': -2.3, 'jammer': -1.3,
+    'helaas': -1.2, 'balen': -1.8, 'probleem': -1.5, 'problemen': -1.6, 'fout': -1.6, 'fouten': -1.7,
+    'traag': -1.5, 'duur': -0.8, 'oplichting': -3.0, 'oplichters': -3.0, 'nep': -1.8, 'irritant': -2.0,
+    'saai': -1.6, 'lelijk': -2.1, 'stom': -2.0, 'stomme': -2.0, 'kapot': -2.0, 'klacht': -1.8,
+    'klachten': -1.8, 'bang': -1.8, 'angst': -2.1, 'pijn': -2.0, 'mislukt': -2.4, 'ellende': -2.6,
+    'ramp': -2.8, 'rampzalig': -3.1, 'walgelijk': -3.1, 'belachelijk': -2.2, 'schandalig': -2.8,
+    'schande': -2.6, 'frustrerend': -2.2, 'gefrustreerd': -2.2, 'stress': -1.9, 'verspilling': -2.1,
+    'risico': -1.1, 'crisis': -2.2, 'faillissement': -2.4, 'ontslag': -2.0, 'verlies': -1.9,
+    'zwak': -1.5, 'onbetrouwbaar': -2.3, 'onveilig': -1.9, 'gevaarlijk': -2.1, 'storing': -1.8,
+    'vertraging': -1.5, 'kut': -2.6, 'shit': -2.2, 'spam': -1.5, 'gedoe': -1.4, 'zorgelijk': -1.8,
+}
+
+# Intensity modifiers: boosters add to the magnitude of the next sentiment
+# word, dampeners (negative) take away from it
+BOOSTERS = {
+    EN: {'very': 0.293, 'really': 0.293, 'so': 0.293, 'extremely': 0.293, 'super': 0.293,
+         'totally': 0.293, 'absolutely': 0.293, 'incredibly': 0.293, 'highly': 0.293,
+         'completely': 0.293, 'especially': 0.293, 'truly': 0.293, 'most': 0.293,
+         'somewhat': -0.293, 'slightly': -0.293, 'barely': -0.293, 'hardly': -0.293,
+         'marginally': -0.293, 'partly': -0.293, 'kinda': -0.293, 'fairly': -0.293},
+    NL: {'heel': 0.293, 'erg': 0.293, 'zeer': 0.293, 'super': 0.293, 'echt': 0.293, 'enorm': 0.293,
+         'ontzettend': 0.293, 'hartstikke': 0.293, 'mega': 0.293, 'extreem': 0.293, 'totaal': 0.293,
+         'zo': 0.293, 'best': -0.293, 'beetje': -0.293, 'redelijk': -0.293, 'vrij': -0.293,
+         'enigszins': -0.293, 'nauwelijks': -0.293, 'amper': -0.293, 'tamelijk': -0.293},
+}
+
+NEGATIONS = {
+    EN: {'not', 'no', 'never', 'nothing', 'nobody', 'none', 'neither', 'nor', 'cannot', 'without',
+         'dont', 'doesnt', 'didnt', 'isnt', 'arent', 'wasnt', 'werent', 'cant', 'couldnt', 'wont',
+         'wouldnt', 'shouldnt', 'aint', 'hasnt', 'havent'},
+    NL: {'niet', 'geen', 'nooit', 'niks', 'niets', 'nergens', 'niemand'},
+}
+
+# Sentiment after these words outweighs sentiment before them
+CONTRASTS = {'but', 'however', 'maar', 'echter'}
+
+# Function words that tell the two languages apart
+MARKERS = {
+    EN: {'the', 'and', 'of', 'to', 'you', 'it', 'this', 'that', 'with', 'for', 'are', 'was', 'not',
+         'but', 'have', 'very', 'really', 'just', 'my', 'we', 'they', 'so', 'what', 'be'},
+    NL: {'de', 'het', 'een', 'en', 'van', 'ik', 'je', 'jij', 'niet', 'maar', 'ook', 'dat', 'die',
+         'wat', 'zijn', 'voor', 'met', 'op', 'naar', 'heel', 'erg', 'geen', 'nog', 'wel', 'mijn', 'we'},
+}
+
+TOKEN_PATTERN = re.compile(
+    r"[:;=][\-']?[)(dDpP/]|</?3|[\U0001F300-\U0001FAFF☀-➿]|[^\W\d_]+(?:'[^\W\d_]+)?|[.,;!?]"
+)
+
+# Boosters and negations don't reach across these
+CLAUSE_BREAKS = {'.', ',', ';', '!', '?'}
+
+NEGATION_SCALAR = -0.74
+CAPS_INCREMENT = 0.733
+EXCLAMATION_INCREMENT = 0.292
+COMPOUND_ALPHA = 15.0
+
+
+class SentimentEngineService:
+    """Local lexicon sentiment scoring in English and Dutch.
+
+    VADER-style rules: word valences, boosters and dampeners up to three
+    words back, negation within three words, ALL-CAPS emphasis, 'but'/'maar'
+    weighting and exclamation marks, normalised to a compound score in
+    [-1, 1]. Texts are tokenized once; every rule then runs as a NumPy
+    operation over all tokens of the batch. Each text is scored with the
+    lexicon of its detected language, falling back to the other lexicon
+    for words it doesn't know, so code-switched posts still score.
+    """
+
+    def __init__(self):
+        self.threshold = float(os.getenv('SENTIMENT_NEUTRAL_THRESHOLD', '0.05'))
+        self.default_language = NL if os.getenv('SENTIMENT_DEFAULT_LANGUAGE', 'nl') == 'nl' else EN
+
+        words = set(SHARED_LEXICON) | set(ENGLISH_LEXICON) | set(DUTCH_LEXICON) | CONTRASTS | CLAUSE_BREAKS
+        for language in (EN, NL):
+            words |= set(BOOSTERS[language]) | NEGATIONS[language] | MARKERS[language]
+        # Index 0 stands for every unknown token
+        self.vocabulary = {word: index for index, word in enumerate(sorted(words), start=1)}
+
+        size = len(self.vocabulary) + 1
+        self.valence = np.zeros((2, size), dtype=np.float32)
+        self.boost = np.zeros((2, size), dtype=np.float32)
+        self.negation = np.zeros((2, size), dtype=bool)
+        self.marker = np.zeros((2, size), dtype=np.float32)
+        self.contrast = np.zeros(size, dtype=bool)
+        self.clause_break = np.zeros(size, dtype=bool)
+
+        for language, lexicon in ((EN, ENGLISH_LEXICON), (NL, DUTCH_LEXICON)):
+            for word, value in dict(SHARED_LEXICON, **lexicon).items():
+                self.valence[language, self.vocabulary[word]] = value
+            for word, value in BOOSTERS[language].items():
+                self.boost[language, self.vocabulary[word]] = value
+            for word in NEGATIONS[language]:
+                self.negation[language, self.vocabulary[word]] = True
+            for word in MARKERS[language]:
+                self.marker[language, self.vocabulary[word]] = 1.0
+        for word in CONTRASTS:
+            self.contrast[self.vocabulary[word]] = True
+        for mark in CLAUSE_BREAKS:
+            self.clause_break[self.vocabulary[mark]] = True
+
+    def tokenize(self, text: str) -> List[str]:
+        """Words, emoticons, emoji and clause punctuation in their original case"""
+        return TOKEN_PATTERN.findall(text or '')
+
+    def score(self, texts: List[str]) -> Dict[str, Any]:
+        """Score a batch: per-text compound, label and language plus the label counts"""
+        count = len(texts)
+        if not count:
+            return {'compound': [], 'labels': [], 'languages': [],
+                    'summary': {'positive': 0, 'neutral': 0, 'negative': 0}}
+
+        ids, caps, lengths, amplifiers = [], [], [], np.zeros(count, dtype=np.float32)
+        for position, text in enumerate(texts):
+            text = text or ''
+            tokens = self.tokenize(text)
+            lengths.append(len(tokens))
+            ids.extend(self._token_id(token) for token in tokens)
+            caps.extend(token.isupper() and len(token) > 1 for token in tokens)
+            questions = text.count('?')
+            amplifiers[position] = min(text.count('!'), 4) * EXCLAMATION_INCREMENT + (
+                0.0 if questions < 2 else (questions * 0.18 if questions <= 3 else 0.96))
+
+        compound = np.zeros(count, dtype=np.float32)
+        languages = np.full(count, self.default_language, dtype=np.int8)
+        if ids:
+            ids = np.asarray(ids, dtype=np.int32)
+            owners = np.repeat(np.arange(count, dtype=np.int32), lengths)
+            caps = np.asarray(caps, dtype=bool)
+            languages = self._detect_languages(ids, owners, count)
+            sums = self._sum_valences(ids, owners, caps, languages, np.asarray(lengths), count)
+            sums += np.sign(sums) * amplifiers
+            compound = np.clip(sums / np.sqrt(sums * sums + COMPOUND_ALPHA), -1.0, 1.0)
+
+        labels = np.where(compound >= self.threshold, 'positive',
+                          np.where(compound <= -self.threshold, 'negative', 'neutral'))
+        counts = Counter(labels.tolist())
+        return {
+            'compound': [round(float(value), 4) for value in compound],
+            'labels': labels.tolist(),
+            'languages': [LANGUAGES[language] for language in languages],
+            'summary': {label: counts.get(label, 0) for label in ('positive', 'neutral', 'negative')}
+        }
+
+    def polarity(self, text: str) -> Dict[str, Any]:
+        """Score a single text"""
+        result = self.score([text])
+        return {'compound': result['compound'][0], 'label': result['labels'][0],
+                'language': result['languages'][0]}
+
+    def key_terms(self, texts: List[str], count: int = 10) -> List[str]:
+        """Most frequent content words that aren't sentiment words, as crude themes"""
+        try:
+            terms = Counter()
+            for text in texts:
+                terms.update(set(hashtag_engine_service.tokenize(text)))
+            return [term for term, _ in terms.most_common(count * 3)
+                    if term not in self.vocabulary][:count]
+        except Exception as e:
+            logging.error(f"Key term extraction failed: {str(e)}")
+            return []
+
+    def _token_id(self, token: str) -> int:
+        # don't -> dont, so contractions match with or without the apostrophe
+        token = token.lower()
+        return self.vocabulary.get(token) or self.vocabulary.get(token.replace("'", ''), 0)
+
+    def _detect_languages(self, ids: np.ndarray, owners: np.ndarray, count: int) -> np.ndarray:
+        english = np.bincount(owners, weights=self.marker[EN, ids], minlength=count)
+        dutch = np.bincount(owners, weights=self.marker[NL, ids], minlength=count)
+        languages = np.full(count, self.default_language, dtype=np.int8)
+        languages[dutch > english] = NL
+        languages[english > dutch] = EN
+        return languages
+
+    def _sum_valences(self, ids: np.ndarray, owners: np.ndarray, caps: np.ndarray,
+                      languages: np.ndarray, lengths: np.ndarray, count: int) -> np.ndarray:
+        language = languages[owners]
+        valence = self.valence[language, ids]
+        boost = self.boost[language, ids]
+        negation = self.negation[language, ids]
+        # Words the text's own language has no use for
+        unknown = (valence == 0) & (boost == 0) & ~negation
+        valence = np.where(unknown, self.valence[1 - language, ids], valence)
+        sign = np.sign(valence)
+
+        # ALL-CAPS sentiment words stand out only when the rest of the text isn't shouting
+        clause_break = self.clause_break[ids]
+        words = np.bincount(owners, weights=~clause_break, minlength=count)
+        shouting = np.bincount(owners, weights=caps, minlength=count) == words
+        valence = valence + sign * CAPS_INCREMENT * (caps & ~shouting[owners])
+
+        clauses = np.cumsum(clause_break)
+        negated = np.zeros(len(ids), dtype=bool)
+        for distance, factor in ((1, 1.0), (2, 0.95), (3, 0.9)):
+            same_clause = (owners[distance:] == owners[:-distance]) & (clauses[distance:] == clauses[:-distance])
+            valence[distance:] += sign[distance:] * boost[:-distance] * factor * same_clause
+            negated[distance:] |= negation[:-distance] & same_clause
+        valence = np.where(negated, valence * NEGATION_SCALAR, valence)
+
+        # Tokens after a contrast word count 1.5x, tokens before it 0.5x
+        contrast = self.contrast[ids]
+        running = np.cumsum(contrast)
+        before = np.concatenate(([0], running))[np.cumsum(lengths) - lengths]
+        seen = running - np.repeat(before, lengths)
+        has_contrast = (np.bincount(owners, weights=contrast, minlength=count) > 0)[owners]
+        weights = np.where(seen > 0, 1.5, np.where(has_contrast, 0.5, 1.0))
+        weights[contrast] = 1.0
+
+        return np.bincount(owners, weights=valence * weights, minlength=count).astype(np.float32)
+
+
+# Service instance
+sentiment_engine_service = SentimentEngineService()
@@ -1,24 +1,29 @@
 import os
-import requests
 import json
 import re
 import logging
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 from urllib.parse import quote_plus
-import time
-from openai import OpenAI
+from src.services.openai_client_service import openai_client_service
 from src.services.database_service import database_service
+from src.services.model_router_service import model_router_service
+from src.services.structured_output_service import structured_output_service
+from src.services.sentiment_engine_service import sentiment_engine_service
+from src.services.hashtag_engine_service import hashtag_engine_service
+from src.services.generation_executor_service import generation_executor_service
+from src.services.scraper_fetch_service import scraper_fetch_service
 
 class SentimentScraperService:
     """Service for scraping social media sentiment and trending topics"""
     
+    @property
+    def openai_client(self):
+        """Shared OpenAI client for this process"""
+        return openai_client_service.get_client()
+
     def __init__(self):
-        self.openai_client = OpenAI(
-            api_key=os.getenv('OPENAI_API_KEY'),
-            base_url=os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
-        )
-        
         # API configurations
         self.apis = {
             'twitter': {
@@ -43,8 +48,14 @@ class SentimentScraperService:
         # Sentiment analysis models
         self.sentiment_models = {
             'openai': 'gpt-4',
-            'local': 'vader'  # Could integrate VADER or other local models
+            'local': 'lexicon-en-nl'  # sentiment_engine_service
         }
+        # Per-text labels always come from the local engine; the LLM only names themes
+        self.llm_themes = os.getenv('SENTIMENT_LLM_THEMES', 'false').lower() == 'true'
+        self.chunk_tokens = int(os.getenv('SENTIMENT_CHUNK_TOKENS', '3000'))  # prompt tokens per theme call
+        self.chunk_concurrency = int(os.getenv('SENTIMENT_CHUNK_CONCURRENCY', '4'))
+        # Trends at least this similar are merged into one topic
+        self.cluster_threshold = float(os.getenv('TREND_CLUSTER_THRESHOLD', '0.6'))
         
         # Platform-specific hashtag patterns
         self.hashtag_patterns = {
@@ -93,18 +104,32 @@ class SentimentScraperService:
             }
             
             url = f"{self.apis['twitter']['base_url']}/tweets/search/recent"
-            response = requests.get(url, headers=headers, params=params, timeout=30)
-            
-            if response.status_code != 200:
-                return {
-                    'success': False,
-                    'error': f'Twitter API error: {response.status_code}',
-                    'details': response.text
-                }
+            tweets, users = [], {}
             
-            data = response.json()
-            tweets = data.get('data', [])
-            users = {user['id']: user for user in data.get('includes', {}).get('users', [])}
+            # Pages hold at most 100 tweets; follow next_token up to max_results
+            while len(tweets) < max_results:
+                params['max_results'] = max(10, min(max_results - len(tweets), 100))
+                response = scraper_fetch_service.get(url, params=params, headers=headers)
+                
+                if response.status_code != 200:
+                    if tweets:
+                        logging.warning(f"Twitter search stopped after {len(tweets)} tweets: {response.status_code}")
+                        break
+                    return {
+                        'success': False,
+                        'error': f'Twitter API error: {response.status_code}',
+                        'details': response.text
+                    }
+                
+                data = response.json()
+                tweets.extend(data.get('data', []))
+                users.update({user['id']: user for user in data.get('includes', {}).get('users', [])})
+                
+                next_token = data.get('meta', {}).get('next_token')
+                if not next_token:
+                    break
+                params['next_token'] = next_token
+            tweets = tweets[:max_results]
             
             # Process tweets for sentiment analysis
             processed_tweets = []
@@ -169,22 +194,28 @@ class SentimentScraperService:
             
             all_posts = []
             
-            for subreddit in subreddits:
-                try:
-                    # Search Reddit posts
-                    url = f"{self.apis['reddit']['base_url']}/r/{subreddit}/search.json"
-                    params = {
+            # Search all subreddits at once; the fetch layer paces requests to Reddit
+            headers = {
+                'User-Agent': self.apis['reddit']['user_agent']
+            }
+            responses = scraper_fetch_service.get_many([
+                {
+                    'url': f"{self.apis['reddit']['base_url']}/r/{subreddit}/search.json",
+                    'params': {
                         'q': query,
                         'sort': 'relevance',
-                        'limit': max_posts // len(subreddits),
+                        'limit': max(max_posts // len(subreddits), 1),
                         't': 'week' if days_back <= 7 else 'month'
-                    }
-                    
-                    headers = {
-                        'User-Agent': self.apis['reddit']['user_agent']
-                    }
-                    
-                    response = requests.get(url, headers=headers, params=params, timeout=30)
+                    },
+                    'headers': headers
+                }
+                for subreddit in subreddits
+            ])
+            
+            for subreddit, response in zip(subreddits, responses):
+                try:
+                    if isinstance(response, Exception):
+                        raise response
                     
                     if response.status_code == 200:
                         data = response.json()
@@ -203,8 +234,6 @@ class SentimentScraperService:
                                 'url': post_data.get('url')
                             })
                     
-                    time.sleep(1)  # Rate limiting
-                    
                 except Exception as e:
                     logging.warning(f"Failed to search subreddit {subreddit}: {str(e)}")
                     continue
@@ -240,111 +269,82 @@ class SentimentScraperService:
             logging.error(f"Reddit sentiment search failed: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def get_trending_topics(self, platform: str = 'all', category: str = None,
-                          location: str = 'worldwide') -> Dict[str, Any]:
-        """Get trending topics across platforms"""
-        try:
-            trending_data = {}
-            
-            # Get Twitter trends
-            if platform in ['all', 'twitter'] and self.apis['twitter']['bearer_token']:
-                twitter_trends = self.get_twitter_trends(location)
-                if twitter_trends['success']:
-                    trending_data['twitter'] = twitter_trends['trends']
-            
-            # Get Google Trends
-            if platform in ['all', 'google']:
-                google_trends = self.get_google_trends(category, location)
-                if google_trends['success']:
-                    trending_data['google'] = google_trends['trends']
-            
-            # Get Reddit trending
-            if platform in ['all', 'reddit']:
-                reddit_trends = self.get_reddit_trending(category)
-                if reddit_trends['success']:
-                    trending_data['reddit'] = reddit_trends['trends']
-            
-            # Combine and analyze trends
-            combined_trends = self.combine_trending_topics(trending_data)
-            
-            return {
-                'success': True,
-                'platform': platform,
-                'category': category,
-                'location': location,
-                'trending_topics': combined_trends,
-                'content_opportunities': self.identify_content_opportunities(combined_trends),
-                'updated_at': datetime.utcnow().isoformat()
-            }
-            
-        except Exception as e:
-            logging.error(f"Trending topics fetch failed: {str(e)}")
-            return {'success': False, 'error': str(e)}
+    def fetch_trending_data(self, platform: str = 'all', category: str = None,
+                            location: str = 'worldwide') -> Dict[str, List]:
+        """Fetch current trends from each source, keyed by source.
+
+        Called by the trend ingestion task; request handlers read the
+        stored observations through trend_store_service instead.
+        """
+        sources = {}
+        
+        # Get Twitter trends
+        if platform in ['all', 'twitter'] and self.apis['twitter']['bearer_token']:
+            sources['twitter'] = lambda: self.get_twitter_trends(location)
+        
+        # Get Google Trends
+        if platform in ['all', 'google']:
+            sources['google'] = lambda: self.get_google_trends(category, location)
+        
+        # Get Reddit trending
+        if platform in ['all', 'reddit']:
+            sources['reddit'] = lambda: self.get_reddit_trending(category)
+        
+        trending_data = {}
+        for source, result in zip(sources, scraper_fetch_service.run_all(list(sources.values()))):
+            if not isinstance(result, Exception) and result['success']:
+                trending_data[source] = result['trends']
+        return trending_data
     
-    def analyze_sentiment_batch(self, texts: List[str]) -> Dict[str, Any]:
-        """Analyze sentiment for a batch of texts using AI"""
+    def analyze_sentiment_batch(self, texts: List[str], extract_themes: bool = None) -> Dict[str, Any]:
+        """Label every text with the local sentiment engine; the LLM only names themes.
+
+        Near-identical posts (retweets, copy-paste spam) are scored once and
+        counted once in the summary; 'details' still has one entry per input
+        text. With LLM themes on, the unique posts are split into
+        token-budgeted chunks that are analysed concurrently and merged.
+        """
         try:
             if not texts:
                 return {'summary': {'positive': 0, 'neutral': 0, 'negative': 0}, 'details': []}
             
-            # Prepare batch for analysis
-            batch_text = "\n---\n".join(texts[:50])  # Limit to 50 texts to avoid token limits
-            
-            prompt = f"""Analyze the sentiment of the following social media posts/comments. 
-            For each post (separated by ---), classify as positive, negative, or neutral.
-            Also provide an overall sentiment summary and key themes.
-            
-            Posts:
-            {batch_text}
-            
-            Please respond in JSON format:
-            {{
-                "individual_sentiments": ["positive/negative/neutral", ...],
-                "overall_sentiment": "positive/negative/neutral",
-                "sentiment_distribution": {{"positive": 0.0, "negative": 0.0, "neutral": 0.0}},
-                "key_themes": ["theme1", "theme2", ...],
-                "emotional_tone": "description",
-                "confidence_score": 0.0
-            }}"""
-            
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an expert social media sentiment analyst. Provide accurate, unbiased sentiment analysis."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1500
-            )
-            
-            # Parse response
-            try:
-                analysis = json.loads(response.choices[0].message.content)
-            except json.JSONDecodeError:
-                # Fallback to simple analysis
-                analysis = {
-                    "overall_sentiment": "neutral",
-                    "sentiment_distribution": {"positive": 0.33, "negative": 0.33, "neutral": 0.34},
-                    "key_themes": ["general discussion"],
-                    "emotional_tone": "mixed",
-                    "confidence_score": 0.5
-                }
+            unique_texts, positions = self.dedupe_texts(texts)
+            scores = sentiment_engine_service.score(unique_texts)
+            summary = scores['summary']
+            compound = scores['compound']
+            mean = sum(compound) / len(compound)
             
-            # Calculate summary statistics
-            distribution = analysis.get('sentiment_distribution', {})
-            summary = {
-                'positive': int(distribution.get('positive', 0) * len(texts)),
-                'negative': int(distribution.get('negative', 0) * len(texts)),
-                'neutral': int(distribution.get('neutral', 0) * len(texts))
+            analysis = {
+                'key_themes': sentiment_engine_service.key_terms(unique_texts),
+                'emotional_tone': self.describe_tone(summary, len(unique_texts))
+            }
+            coverage = {
+                'texts': len(texts),
+                'unique_texts': len(unique_texts),
+                'duplicates': len(texts) - len(unique_texts),
+                'scored': len(unique_texts)
             }
+            if self.llm_themes if extract_themes is None else extract_themes:
+                themes = self.extract_themes(unique_texts)
+                coverage.update(themes.pop('coverage'))
+                analysis.update(themes)
             
             return {
                 'summary': summary,
-                'overall_sentiment': analysis.get('overall_sentiment', 'neutral'),
-                'key_themes': analysis.get('key_themes', []),
-                'emotional_tone': analysis.get('emotional_tone', 'mixed'),
-                'confidence_score': analysis.get('confidence_score', 0.5),
-                'total_analyzed': len(texts)
+                'overall_sentiment': 'positive' if mean >= sentiment_engine_service.threshold
+                                     else 'negative' if mean <= -sentiment_engine_service.threshold else 'neutral',
+                'average_compound': round(mean, 4),
+                'details': [
+                    {'label': scores['labels'][index], 'compound': compound[index],
+                     'language': scores['languages'][index]}
+                    for index in positions
+                ],
+                'key_themes': analysis['key_themes'],
+                'emotional_tone': analysis['emotional_tone'],
+                'confidence_score': round(sum(abs(score) for score in compound) / len(compound), 3),
+                'model': self.sentiment_models['local'],
+                'coverage': coverage,
+                'total_analyzed': len(unique_texts)
             }
             
         except Exception as e:
@@ -355,6 +355,122 @@ class SentimentScraperService:
                 'error': str(e)
             }
     
+    def dedupe_texts(self, texts: List[str]) -> Tuple[List[str], List[int]]:
+        """Unique texts, and for every input text the index of its unique text.
+
+        Texts are the same post when they match after dropping retweet
+        prefixes, URLs, mentions, case, punctuation and spacing.
+        """
+        unique_texts, positions, seen = [], [], {}
+        for text in texts:
+            key = re.sub(r'^rt @\w+:|https?://\S+|@\w+', ' ', (text or '').casefold())
+            key = ' '.join(re.findall(r'\w+', key))
+            if key not in seen:
+                seen[key] = len(unique_texts)
+                unique_texts.append(text)
+            positions.append(seen[key])
+        return unique_texts, positions
+    
+    def chunk_texts(self, texts: List[str]) -> List[List[str]]:
+        """Split texts into chunks of at most SENTIMENT_CHUNK_TOKENS estimated prompt tokens"""
+        max_chars = int(self.chunk_tokens * model_router_service.chars_per_token)
+        chunks, chunk, size = [], [], 0
+        for text in texts:
+            text = (text or '')[:max_chars]
+            if chunk and size + len(text) > max_chars:
+                chunks.append(chunk)
+                chunk, size = [], 0
+            chunk.append(text)
+            size += len(text) + 5  # separator
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+    
+    def extract_themes(self, texts: List[str]) -> Dict[str, Any]:
+        """Key themes and emotional tone of all texts, map-reduced over chunks.
+
+        Each chunk is one LLM call on the shared generation pool; the reducer
+        ranks themes by how many posts the chunks naming them cover, so the
+        result doesn't depend on which chunk finished first.
+        """
+        chunks = self.chunk_texts(texts)
+        results = generation_executor_service.run_all(
+            [lambda chunk=chunk: self._chunk_themes(chunk) for chunk in chunks],
+            max_concurrency=self.chunk_concurrency
+        )
+        
+        theme_weights, theme_rank, spellings, tones = Counter(), {}, defaultdict(Counter), Counter()
+        covered = failed = 0
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                failed += 1
+                continue
+            covered += len(chunk)
+            for rank, theme in enumerate(dict.fromkeys(t.strip() for t in result['key_themes'] if t.strip())):
+                key = theme.casefold()
+                theme_weights[key] += len(chunk)
+                theme_rank[key] = min(theme_rank.get(key, rank), rank)
+                spellings[key][theme] += 1
+            if result['emotional_tone'].strip():
+                tones[result['emotional_tone'].strip().casefold()] += len(chunk)
+        
+        ranked = sorted(theme_weights, key=lambda key: (-theme_weights[key], theme_rank[key], key))
+        analysis = {
+            'coverage': {
+                'chunks': len(chunks),
+                'chunks_failed': failed,
+                'theme_coverage': round(covered / len(texts), 3) if texts else 0.0
+            }
+        }
+        if ranked:
+            analysis['key_themes'] = [
+                min(spellings[key].items(), key=lambda item: (-item[1], item[0]))[0] for key in ranked[:10]
+            ]
+        if tones:
+            analysis['emotional_tone'] = min(tones.items(), key=lambda item: (-item[1], item[0]))[0]
+        return analysis
+    
+    def _chunk_themes(self, texts: List[str]) -> Dict[str, Any]:
+        batch_text = "\n---\n".join(texts)
+        
+        prompt = f"""Identify the key themes and the overall emotional tone of the following social media posts/comments (separated by ---).
+        
+        Posts:
+        {batch_text}"""
+        
+        route = model_router_service.route('sentiment')
+        return structured_output_service.complete(
+            self.openai_client,
+            call_site='sentiment_themes',
+            schema=structured_output_service.object_schema({
+                'key_themes': {'type': 'array', 'items': {'type': 'string'}},
+                'emotional_tone': {'type': 'string'}
+            }),
+            ttl=3600,
+            cache_creative=True,
+            model=route['model'],
+            messages=[
+                {"role": "system", "content": "You are an expert social media analyst. Name the themes people discuss, briefly and without bias."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=route['max_tokens']
+        )
+    
+    def describe_tone(self, summary: Dict[str, int], total: int) -> str:
+        """Plain description of a label distribution"""
+        positive = summary.get('positive', 0) / total
+        negative = summary.get('negative', 0) / total
+        if positive >= 0.3 and negative >= 0.3:
+            return 'polarised'
+        if positive >= 0.6:
+            return 'mostly positive'
+        if negative >= 0.6:
+            return 'mostly negative'
+        if positive + negative < 0.3:
+            return 'mostly neutral'
+        return 'mixed'
+    
     def extract_hashtags(self, texts: List[str], platform: str = 'twitter') -> List[Dict[str, Any]]:
         """Extract and count hashtags from texts"""
         try:
@@ -407,7 +523,7 @@ class SentimentScraperService:
             url = f"{self.apis['twitter']['base_url']}/trends/place.json"
             params = {'id': woeid}
             
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            response = scraper_fetch_service.get(url, params=params, headers=headers)
             
             if response.status_code != 200:
                 return {'success': False, 'error': f'Twitter trends API error: {response.status_code}'}
@@ -478,13 +594,18 @@ class SentimentScraperService:
             
             trends = []
             
-            for subreddit in trending_subreddits[:3]:  # Limit to avoid rate limits
+            subreddits = trending_subreddits[:3]  # Limit to avoid rate limits
+            headers = {'User-Agent': self.apis['reddit']['user_agent']}
+            responses = scraper_fetch_service.get_many([
+                {'url': f"{self.apis['reddit']['base_url']}/r/{subreddit}/hot.json", 'params': {'limit': 10},
+                 'headers': headers}
+                for subreddit in subreddits
+            ])
+            
+            for subreddit, response in zip(subreddits, responses):
                 try:
-                    url = f"{self.apis['reddit']['base_url']}/r/{subreddit}/hot.json"
-                    params = {'limit': 10}
-                    headers = {'User-Agent': self.apis['reddit']['user_agent']}
-                    
-                    response = requests.get(url, headers=headers, params=params, timeout=30)
+                    if isinstance(response, Exception):
+                        raise response
                     
                     if response.status_code == 200:
                         data = response.json()
@@ -500,8 +621,6 @@ class SentimentScraperService:
                                 'url': f"https://reddit.com{post_data.get('permalink', '')}"
                             })
                     
-                    time.sleep(1)  # Rate limiting
-                    
                 except Exception as e:
                     logging.warning(f"Failed to get trends from r/{subreddit}: {str(e)}")
                     continue
@@ -520,7 +639,13 @@ class SentimentScraperService:
             return {'success': False, 'error': str(e)}
     
     def combine_trending_topics(self, trending_data: Dict[str, List]) -> List[Dict[str, Any]]:
-        """Combine trending topics from multiple platforms"""
+        """Combine trending topics from multiple platforms.
+
+        Near-duplicate topics ("AI Technology", "#AITechnology", "ai tech")
+        are merged into one trend under its most common spelling, with the
+        members' scores and engagement summed and their labels kept as
+        aliases.
+        """
         try:
             combined = []
             
@@ -530,22 +655,43 @@ class SentimentScraperService:
                         'topic': trend.get('name', trend.get('title', '')),
                         'platform': platform,
                         'metrics': {
-                            'score': trend.get('score', trend.get('interest', trend.get('tweet_volume', 0))),
-                            'engagement': trend.get('num_comments', trend.get('engagement', 0))
+                            'score': trend.get('score', trend.get('interest', trend.get('tweet_volume', 0))) or 0,
+                            'engagement': trend.get('num_comments', trend.get('engagement', 0)) or 0
                         },
                         'url': trend.get('url', ''),
                         'category': trend.get('category', 'general')
                     })
+            combined = [trend for trend in combined if len(trend['topic'].lower().strip()) > 3]
             
-            # Remove duplicates and sort by relevance
-            seen_topics = set()
             unique_trends = []
-            
-            for trend in combined:
-                topic_key = trend['topic'].lower().strip()
-                if topic_key not in seen_topics and len(topic_key) > 3:
-                    seen_topics.add(topic_key)
-                    unique_trends.append(trend)
+            for members in self.cluster_topics([trend['topic'] for trend in combined]):
+                trends = [combined[index] for index in members]
+                # Scores aren't comparable across sources: prefer the spelling most members share
+                spellings = Counter(' '.join(self.topic_tokens(trend['topic'])) for trend in trends)
+                canonical = max(trends, key=lambda trend: (
+                    not trend['topic'].lstrip().startswith('#'),
+                    spellings[' '.join(self.topic_tokens(trend['topic']))],
+                    trend['metrics']['score'],
+                    -len(trend['topic'])
+                ))
+                aliases = []
+                for trend in trends:
+                    if trend['topic'] != canonical['topic'] and trend['topic'] not in aliases:
+                        aliases.append(trend['topic'])
+                
+                unique_trends.append(dict(
+                    canonical,
+                    metrics={
+                        'score': sum(trend['metrics']['score'] for trend in trends),
+                        'engagement': sum(trend['metrics']['engagement'] for trend in trends)
+                    },
+                    category=next(
+                        (trend['category'] for trend in [canonical] + trends if trend['category'] != 'general'),
+                        'general'
+                    ),
+                    sources=sorted({trend['platform'] for trend in trends}),
+                    aliases=aliases
+                ))
             
             # Sort by combined score
             unique_trends.sort(key=lambda x: x['metrics']['score'], reverse=True)
@@ -556,6 +702,82 @@ class SentimentScraperService:
             logging.error(f"Trend combination failed: {str(e)}")
             return []
     
+    def topic_tokens(self, topic: str) -> List[str]:
+        """Normalised words of a topic: hashtags and camelCase split, lowercased, stopwords dropped.
+
+        Brand-style words that start with one lowercase letter ("iPhone",
+        "eBay") stay whole.
+        """
+        words = []
+        for word in re.findall(r'[A-Za-z]+|\d+', topic or ''):
+            if word.isdigit() or re.match(r'^[a-z][A-Z]', word):
+                words.append(word)
+            else:
+                words.extend(re.findall(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+', word))
+        tokens = [word.lower() for word in words]
+        return [token for token in tokens if token not in hashtag_engine_service.STOPWORDS] or tokens
+    
+    def topic_similarity(self, first: List[str], second: List[str]) -> float:
+        """Similarity of two normalised topics in [0, 1].
+
+        1 for the same title up to spacing ("World Cup", "#worldcup").
+        Otherwise every word of the shorter topic needs a counterpart in the
+        longer one, exactly or as a prefix of at least four letters ("tech"
+        and "technology"); the result is the share of the longer topic's
+        words covered. A word without a counterpart ("iPhone" against "iPad")
+        makes them different topics.
+        """
+        if not first or not second:
+            return 0.0
+        if ''.join(first) == ''.join(second):
+            return 1.0
+        
+        shorter, longer = sorted((first, second), key=len)
+        remaining = list(longer)
+        for token in shorter:
+            for candidate in remaining:
+                if token == candidate or (
+                    min(len(token), len(candidate)) >= 4
+                    and (candidate.startswith(token) or token.startswith(candidate))
+                ):
+                    remaining.remove(candidate)
+                    break
+            else:
+                return 0.0
+        return len(shorter) / len(longer)
+    
+    def cluster_topics(self, topics: List[str]) -> List[List[int]]:
+        """Group near-duplicate topics; returns index lists in order of first appearance.
+
+        Each topic joins the first cluster whose representative (its first
+        topic) and other members it all matches at or above
+        TREND_CLUSTER_THRESHOLD, so topics never chain together through a
+        middle topic. Only clusters whose representative shares a character
+        trigram with the topic are compared.
+        """
+        tokens = [self.topic_tokens(topic) for topic in topics]
+        clusters = []
+        representatives_by_gram = defaultdict(list)
+        for index, topic_tokens in enumerate(tokens):
+            grams = self._char_ngrams(topic_tokens)
+            candidates = sorted({cluster for gram in grams for cluster in representatives_by_gram[gram]})
+            for cluster in candidates:
+                if all(self.topic_similarity(topic_tokens, tokens[member]) >= self.cluster_threshold
+                       for member in clusters[cluster]):
+                    clusters[cluster].append(index)
+                    break
+            else:
+                for gram in grams:
+                    representatives_by_gram[gram].append(len(clusters))
+                clusters.append([index])
+        return clusters
+    
+    def _char_ngrams(self, tokens: List[str], size: int = 3) -> set:
+        joined = ''.join(tokens)
+        if len(joined) <= size:
+            return {joined} if joined else set()
+        return {joined[offset:offset + size] for offset in range(len(joined) - size + 1)}
+    
     def identify_content_opportunities(self, trends: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Identify content creation opportunities from trends"""
         try:
@@ -574,20 +796,33 @@ class SentimentScraperService:
                 4. Suggested tone/style
                 5. Potential hashtags
                 
-                Format as JSON array."""
+                Format as JSON."""
                 
                 try:
-                    response = self.openai_client.chat.completions.create(
-                        model="gpt-4",
+                    text = {'type': 'string'}
+                    route = model_router_service.route('content_ideas')
+                    result = structured_output_service.complete(
+                        self.openai_client,
+                        call_site='content_ideas',
+                        schema=structured_output_service.object_schema({
+                            'ideas': {'type': 'array', 'items': structured_output_service.object_schema({
+                                'content_type': text,
+                                'platform': text,
+                                'description': text,
+                                'tone': text,
+                                'hashtags': {'type': 'array', 'items': text}
+                            })}
+                        }),
+                        cache=False,
+                        model=route['model'],
                         messages=[
                             {"role": "system", "content": "You are a creative social media strategist. Generate engaging, trend-aware content ideas."},
                             {"role": "user", "content": prompt}
                         ],
                         temperature=0.8,
-                        max_tokens=800
+                        max_tokens=route['max_tokens']
                     )
-                    
-                    content_ideas = json.loads(response.choices[0].message.content)
+                    content_ideas = result['ideas']
                     
                     opportunities.append({
                         'trending_topic': topic,
@@ -0,0 +1,442 @@
+import os
+import hmac
+import shutil
+import hashlib
+import logging
+import threading
+import mimetypes
+import requests
+from datetime import datetime
+from urllib.parse import quote, urlparse
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from src.models.user import MediaBlob, MediaFile, db
+from src.services.download_service import download_service
+
+EMPTY_SHA256 = hashlib.sha256(b'').hexdigest()
+
+
+class StorageError(Exception):
+    """Raised when a storage backend can't complete an operation"""
+
+
+def file_sha256(file_path: str) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_key(content_hash: str, extension: str = None) -> str:
+    """Sharded content-addressed key, e.g. 3f/a9/3fa9...e1.png"""
+    suffix = f".{extension.lstrip('.')}" if extension else ''
+    return f"{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{suffix}"
+
+
+def blob_hash(key: str) -> str:
+    """Content hash of a blob key"""
+    return os.path.splitext(os.path.basename(key))[0]
+
+
+class LocalStorageBackend:
+    """Blobs on the local filesystem under <MEDIA_STORAGE_PATH>/blobs"""
+
+    name = 'local'
+
+    def __init__(self, base_path: str):
+        self.root = os.path.join(base_path, 'blobs')
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.local_path(key))
+
+    def put(self, key: str, source_path: str, content_hash: str, mime_type: str = None):
+        """Move source_path into place; drops it when the blob is already stored"""
+        target = self.local_path(key)
+        if os.path.exists(target):
+            os.remove(source_path)
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(source_path, target)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3StorageBackend:
+    """S3-compatible object storage (AWS S3, MinIO) with SigV4-signed requests.
+
+    Path-style URLs, so any endpoint works without bucket DNS. Objects are
+    immutable, so local copies in the cache directory never go stale: new
+    uploads are moved there and reads fill it on a miss. The cache is kept
+    under S3_CACHE_MAX_BYTES by evicting the least recently used copies and
+    can be wiped at any time.
+    """
+
+    name = 's3'
+
+    def __init__(self, endpoint_url: str, bucket: str, access_key: str, secret_key: str,
+                 region: str, prefix: str, cache_path: str):
+        self.endpoint_url = endpoint_url.rstrip('/')
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.cache_path = cache_path
+        self.timeout = float(os.getenv('S3_TIMEOUT', '60'))  # seconds
+        self.cache_max_bytes = int(os.getenv('S3_CACHE_MAX_BYTES', str(5 * 1024 ** 3)))  # bytes
+
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # Bytes in the cache directory as of the last scan plus this process's additions
+        self._cache_bytes = None
+        self._cache_lock = threading.Lock()
+
+    def get_session(self) -> requests.Session:
+        """Get the shared session, recreating it after a fork"""
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                session = requests.Session()
+                session.mount(self.endpoint_url, HTTPAdapter(pool_connections=4, pool_maxsize=20))
+                self._session = session
+                self._pid = os.getpid()
+            return self._session
+
+    def local_path(self, key: str) -> str:
+        """Cached local copy, downloaded on a miss"""
+        path = os.path.join(self.cache_path, key)
+        try:
+            # Mark as recently used
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        url, headers = self._signed('GET', key, EMPTY_SHA256)
+        download_service.download(url, path, headers=headers)
+        self._cache_added(path)
+        return path
+
+    def exists(self, key: str) -> bool:
+        url, headers = self._signed('HEAD', key, EMPTY_SHA256)
+        response = self.get_session().head(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 404:
+            return False
+        if response.status_code != 200:
+            raise StorageError(f"S3 HEAD {key} failed: {response.status_code}")
+        return True
+
+    def put(self, key: str, source_path: str, content_hash: str, mime_type: str = None):
+        """Upload source_path unless already stored, then keep it as the cached copy"""
+        if not self.exists(key):
+            extra = {'Content-Type': mime_type} if mime_type else {}
+            # The blob's content hash is exactly the payload hash SigV4 asks for
+            url, headers = self._signed('PUT', key, content_hash, extra)
+            with open(source_path, 'rb') as body:
+                response = self.get_session().put(url, data=body, headers=headers, timeout=self.timeout)
+            if response.status_code not in (200, 201):
+                raise StorageError(f"S3 PUT {key} failed: {response.status_code} {response.text[:200]}")
+
+        cached = os.path.join(self.cache_path, key)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        shutil.move(source_path, cached)
+        self._cache_added(cached)
+
+    def delete(self, key: str):
+        url, headers = self._signed('DELETE', key, EMPTY_SHA256)
+        response = self.get_session().delete(url, headers=headers, timeout=self.timeout)
+        if response.status_code not in (200, 204, 404):
+            raise StorageError(f"S3 DELETE {key} failed: {response.status_code}")
+        try:
+            os.remove(os.path.join(self.cache_path, key))
+        except FileNotFoundError:
+            pass
+
+    def _cache_added(self, path: str):
+        """Count a new cached copy and evict older ones once over the limit"""
+        with self._cache_lock:
+            if self._cache_bytes is not None:
+                self._cache_bytes += os.path.getsize(path)
+                if self._cache_bytes <= self.cache_max_bytes:
+                    return
+            self._cache_bytes = self._evict(keep=path)
+
+    def _evict(self, keep: str) -> int:
+        """Delete least recently used copies down to 90% of the limit; returns the bytes left"""
+        entries = []
+        for directory, _, filenames in os.walk(self.cache_path):
+            for filename in filenames:
+                if filename.endswith('.part'):
+                    # Still downloading
+                    continue
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if total <= self.cache_max_bytes:
+            return total
+
+        target = self.cache_max_bytes * 0.9
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+    def _signed(self, method: str, key: str, payload_hash: str,
+                extra_headers: Dict[str, str] = None) -> Tuple[str, Dict[str, str]]:
+        """URL and signed headers for one request on a key"""
+        path = quote(f"/{self.bucket}/{self.prefix}{key}", safe='/-_.~')
+        headers = self.sign(method, path, dict(extra_headers or {}), payload_hash)
+        return f"{self.endpoint_url}{path}", headers
+
+    def sign(self, method: str, path: str, headers: Dict[str, str], payload_hash: str,
+             now: datetime = None) -> Dict[str, str]:
+        """Add AWS Signature Version 4 headers (no query string)"""
+        now = now or datetime.utcnow()
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        scope = f"{now.strftime('%Y%m%d')}/{self.region}/s3/aws4_request"
+
+        headers = dict(headers, **{'x-amz-date': amz_date, 'x-amz-content-sha256': payload_hash})
+        canonical = {name.lower(): str(value).strip() for name, value in headers.items()}
+        canonical['host'] = urlparse(self.endpoint_url).netloc
+        signed_headers = ';'.join(sorted(canonical))
+
+        canonical_request = '\n'.join([
+            method, path, '',
+            ''.join(f"{name}:{canonical[name]}\n" for name in sorted(canonical)),
+            signed_headers, payload_hash
+        ])
+        string_to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256', amz_date, scope,
+            hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+        ])
+
+        signing_key = ('AWS4' + self.secret_key).encode('utf-8')
+        for part in scope.split('/'):
+            signing_key = hmac.new(signing_key, part.encode('utf-8'), hashlib.sha256).digest()
+        signature = hmac.new(signing_key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+        headers['Authorization'] = (f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                                    f"SignedHeaders={signed_headers}, Signature={signature}")
+        return headers
+
+
+class StorageService:
+    """One storage API for every media service.
+
+    Finished files are stored once per distinct content as a MediaBlob under
+    a sharded key (ab/cd/<sha256>.<ext>) on the configured backend. Every
+    MediaFile pointing at a blob holds one reference; the stored object is
+    deleted when the last reference is released. MediaFile.storage_provider
+    names the backend and storage_path holds the blob key; records with an
+    absolute storage_path predate blobs and are read in place.
+    """
+
+    def __init__(self):
+        self.storage_base_path = os.getenv('MEDIA_STORAGE_PATH', '/home/ubuntu/media_storage')
+        self.staging_path = os.path.join(self.storage_base_path, 'temp')
+        self.default_backend = os.getenv('MEDIA_STORAGE_BACKEND', 'local')
+
+        self.backends = {'local': LocalStorageBackend(self.storage_base_path)}
+        if os.getenv('S3_BUCKET'):
+            self.backends['s3'] = S3StorageBackend(
+                endpoint_url=os.getenv('S3_ENDPOINT_URL', 'https://s3.amazonaws.com'),
+                bucket=os.getenv('S3_BUCKET'),
+                access_key=os.getenv('S3_ACCESS_KEY_ID', ''),
+                secret_key=os.getenv('S3_SECRET_ACCESS_KEY', ''),
+                region=os.getenv('S3_REGION', 'us-east-1'),
+                prefix=os.getenv('S3_PREFIX', 'media'),
+                cache_path=os.path.join(self.storage_base_path, 'cache')
+            )
+
+    def get_backend(self, name: str = None):
+        """Backend by name, the configured default if omitted"""
+        backend = self.backends.get(name or self.default_backend)
+        if backend is None:
+            raise StorageError(f"Storage backend '{name or self.default_backend}' is not configured")
+        return backend
+
+    def store(self, source_path: str, content_hash: str = None, mime_type: str = None,
+              references: int = 1) -> MediaBlob:
+        """Move a finished local file into blob storage and take references to it.
+
+        The blob row is written in the caller's transaction; commit it with
+        the records that use the blob.
+        """
+        content_hash = content_hash or file_sha256(source_path)
+
+        blob = self._add_references(content_hash, references)
+        if blob is None:
+            extension = os.path.splitext(source_path)[1] or mimetypes.guess_extension(mime_type or '') or ''
+            blob = MediaBlob(
+                content_hash=content_hash,
+                backend=self.get_backend().name,
+                storage_key=blob_key(content_hash, extension),
+                size=os.path.getsize(source_path),
+                mime_type=mime_type,
+                ref_count=references
+            )
+            try:
+                with db.session.begin_nested():
+                    db.session.add(blob)
+            except IntegrityError:
+                # Stored concurrently by another request
+                blob = self._add_references(content_hash, references)
+
+        # Puts again if the object went missing; otherwise just drops the copy
+        self.get_backend(blob.backend).put(blob.storage_key, source_path, content_hash, mime_type)
+        return blob
+
+    def assign(self, media_file: MediaFile, blob: MediaBlob):
+        """Point a record at a blob it holds a reference to"""
+        media_file.storage_provider = blob.backend
+        media_file.storage_path = blob.storage_key
+        media_file.content_hash = blob.content_hash
+        media_file.file_size = blob.size
+
+    def attach(self, media_file: MediaFile):
+        """Store the file a new record points at (its storage_path) and point it at the blob"""
+        blob = self.store(media_file.storage_path, media_file.content_hash, media_file.mime_type)
+        self.assign(media_file, blob)
+
+    def release(self, media_file: MediaFile) -> List[Tuple[Optional[str], str]]:
+        """Drop a record's reference; returns objects to purge() after the commit"""
+        if self.is_legacy(media_file):
+            return [(None, media_file.storage_path)]
+
+        # An unreferenced blob keeps its row until purge(), so a concurrent
+        # store() of the same content either takes it back or waits for it
+        MediaBlob.query.filter_by(content_hash=media_file.content_hash).update(
+            {MediaBlob.ref_count: MediaBlob.ref_count - 1}, synchronize_session=False
+        )
+        orphaned = MediaBlob.query.filter(
+            MediaBlob.content_hash == media_file.content_hash,
+            MediaBlob.ref_count <= 0
+        ).count()
+        return [(media_file.storage_provider, media_file.storage_path)] if orphaned else []
+
+    def purge(self, objects: List[Tuple[Optional[str], str]]):
+        """Delete released objects once their release is committed"""
+        for backend, key in objects:
+            try:
+                if backend is None:
+                    # Pre-blob files may still be shared by another record
+                    if os.path.exists(key) and not MediaFile.query.filter_by(storage_path=key).first():
+                        os.remove(key)
+                    continue
+
+                # Only while the row is still unreferenced; the delete holds its row
+                # lock until the object is gone, so store() re-puts it afterwards
+                claimed = MediaBlob.query.filter(
+                    MediaBlob.content_hash == blob_hash(key),
+                    MediaBlob.backend == backend,
+                    MediaBlob.storage_key == key,
+                    MediaBlob.ref_count <= 0
+                ).delete(synchronize_session=False)
+                if claimed:
+                    self.get_backend(backend).delete(key)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Purging {backend or 'file'} {key} failed: {str(e)}")
+
+    def local_path(self, media_file: MediaFile) -> str:
+        """Local file with the record's content (downloaded to the cache for remote backends)"""
+        if self.is_legacy(media_file):
+            return media_file.storage_path
+        return self.get_backend(media_file.storage_provider).local_path(media_file.storage_path)
+
+    def exists(self, media_file: MediaFile) -> bool:
+        """Whether the record's content is stored"""
+        if self.is_legacy(media_file):
+            return os.path.exists(media_file.storage_path)
+        try:
+            return self.get_backend(media_file.storage_provider).exists(media_file.storage_path)
+        except Exception as e:
+            logging.error(f"Checking {media_file.storage_path} failed: {str(e)}")
+            return False
+
+    def is_legacy(self, media_file: MediaFile) -> bool:
+        return os.path.isabs(media_file.storage_path or '')
+
+    def migrate_legacy_files(self, batch_size: int = 100) -> Dict[str, int]:
+        """Move one batch of pre-blob files into blob storage"""
+        stats = {'migrated': 0, 'missing': 0, 'failed': 0}
+        records = MediaFile.query.filter(MediaFile.storage_path.like('/%')).limit(batch_size).all()
+
+        # Records sharing a file move together so the file is stored once
+        by_path: Dict[str, List[MediaFile]] = {}
+        for record in records:
+            by_path.setdefault(record.storage_path, []).append(record)
+        shared = MediaFile.query.filter(MediaFile.storage_path.in_(list(by_path))).all()
+        for record in shared:
+            if record not in by_path[record.storage_path]:
+                by_path[record.storage_path].append(record)
+
+        for path, group in by_path.items():
+            if not os.path.exists(path):
+                stats['missing'] += len(group)
+                continue
+            try:
+                blob = self.store(path, mime_type=group[0].mime_type, references=len(group))
+                for record in group:
+                    self.assign(record, blob)
+                db.session.commit()
+                stats['migrated'] += len(group)
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Migrating {path} failed: {str(e)}")
+                stats['failed'] += len(group)
+        return stats
+
+    def get_stats(self) -> Dict[str, int]:
+        """Blob count, stored bytes and bytes saved by sharing"""
+        blobs = db.session.query(
+            db.func.count(MediaBlob.content_hash),
+            db.func.coalesce(db.func.sum(MediaBlob.size), 0),
+            db.func.coalesce(db.func.sum(MediaBlob.size * MediaBlob.ref_count), 0)
+        ).filter(MediaBlob.ref_count > 0).one()
+        return {
+            'backend': self.default_backend,
+            'blobs': blobs[0],
+            'stored_bytes': int(blobs[1]),
+            'referenced_bytes': int(blobs[2]),
+            'saved_bytes': int(blobs[2]) - int(blobs[1]),
+            'legacy_files': MediaFile.query.filter(MediaFile.storage_path.like('/%')).count()
+        }
+
+    def _add_references(self, content_hash: str, count: int) -> Optional[MediaBlob]:
+        updated = MediaBlob.query.filter_by(content_hash=content_hash).update(
+            {MediaBlob.ref_count: MediaBlob.ref_count + count}, synchronize_session=False
+        )
+        if not updated:
+            return None
+        blob = db.session.get(MediaBlob, content_hash)
+        db.session.refresh(blob)
+        return blob
+
+
+# Service instance
+storage_service = StorageService()
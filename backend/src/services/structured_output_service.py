@@ -0,0 +1,200 @@
+import os
+import re
+import json
+import math
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple
+from src.services.llm_cache_service import llm_cache_service
+from src.services.model_router_service import model_router_service
+
+
+class StructuredOutputError(Exception):
+    """Raised when a response can't be turned into JSON matching its schema"""
+
+
+class StructuredOutputService:
+    """JSON-schema constrained chat completions with local repair and re-ask.
+
+    Every JSON-returning prompt goes through complete(): the request carries a
+    strict json_schema response_format, the reply is parsed and validated, a
+    cheap local repair pass (code fences, surrounding prose, trailing commas,
+    smart quotes) runs before any re-ask, and parse failures are counted per
+    call site together with the completion tokens that were thrown away.
+    """
+
+    def __init__(self):
+        self.max_reasks = int(os.getenv('STRUCTURED_OUTPUT_MAX_REASKS', '1'))
+
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def object_schema(properties: Dict[str, Any]) -> Dict[str, Any]:
+        """Strict object schema: every property required, nothing extra"""
+        return {
+            'type': 'object',
+            'properties': properties,
+            'required': list(properties),
+            'additionalProperties': False
+        }
+
+    def complete(self, client, call_site: str, schema: Dict[str, Any], ttl: int = None,
+                 cache: bool = True, cache_creative: bool = False, max_reasks: int = None,
+                 **params) -> Any:
+        """Run a chat completion and return the parsed, schema-valid JSON value.
+
+        With cache=True the first attempt goes through the LLM cache; invalid
+        responses are never cached. Raises StructuredOutputError when the
+        response is still invalid after repair and max_reasks re-asks.
+        """
+        max_reasks = self.max_reasks if max_reasks is None else max_reasks
+        params['response_format'] = {
+            'type': 'json_schema',
+            'json_schema': {'name': call_site, 'strict': True, 'schema': schema}
+        }
+        self._count(call_site, 'calls')
+
+        if cache:
+            content = llm_cache_service.cached_completion(
+                client, call_site=call_site, ttl=ttl, cache_creative=cache_creative,
+                validate=lambda text: self.parse(text, schema)[0] is not None,
+                **params
+            )
+            completion_tokens = None
+        else:
+            content, completion_tokens = self._create(client, call_site, params)
+
+        messages = list(params['messages'])
+        for attempt in range(max_reasks + 1):
+            value, error, repaired = self.parse(content, schema)
+            if value is not None:
+                self._count(call_site, 'repaired' if repaired else 'parsed')
+                return value
+
+            self._count(call_site, 'parse_failures')
+            self._count(call_site, 'wasted_tokens', completion_tokens or self._estimate_tokens(content))
+            logging.warning(f"Structured output for {call_site} invalid (attempt {attempt + 1}): {error}")
+
+            if attempt == max_reasks:
+                break
+
+            # Re-ask with the invalid answer and the validation error
+            self._count(call_site, 'reasks')
+            messages += [
+                {"role": "assistant", "content": content or ''},
+                {"role": "user", "content": f"Your previous answer was not valid JSON for the required schema "
+                                            f"({error}). Reply with only the corrected JSON."}
+            ]
+            content, completion_tokens = self._create(client, call_site, dict(params, messages=messages))
+
+        self._count(call_site, 'failed')
+        raise StructuredOutputError(f"Invalid structured output for {call_site}: {error}")
+
+    def parse(self, content: Optional[str], schema: Dict[str, Any]) -> Tuple[Any, Optional[str], bool]:
+        """Parse and validate content, repairing it if needed.
+
+        Returns (value, error, repaired); value is None when parsing failed.
+        """
+        if not content:
+            return None, 'empty response', False
+
+        repaired = False
+        try:
+            value = json.loads(content)
+        except json.JSONDecodeError:
+            try:
+                value = json.loads(self.repair(content))
+                repaired = True
+            except json.JSONDecodeError as e:
+                return None, f'JSON decode error: {e.msg}', False
+
+        error = self.validate(value, schema)
+        if error:
+            return None, error, repaired
+        return value, None, repaired
+
+    def repair(self, content: str) -> str:
+        """Cheap fixes for common JSON mistakes in model output"""
+        text = content.strip()
+
+        # Markdown code fences
+        text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text, flags=re.IGNORECASE)
+
+        # Prose around the JSON value
+        starts = [index for index in (text.find('{'), text.find('[')) if index >= 0]
+        if starts:
+            start = min(starts)
+            end = text.rfind('}' if text[start] == '{' else ']')
+            if end > start:
+                text = text[start:end + 1]
+
+        text = text.replace('“', '"').replace('”', '"').replace('‘', "'").replace('’', "'")
+        text = re.sub(r',\s*([}\]])', r'\1', text)
+        text = re.sub(r'\bTrue\b', 'true', text)
+        text = re.sub(r'\bFalse\b', 'false', text)
+        text = re.sub(r'\bNone\b', 'null', text)
+        return text
+
+    def validate(self, value: Any, schema: Dict[str, Any], path: str = '$') -> Optional[str]:
+        """Check a value against the subset of JSON schema used by our prompts"""
+        expected = schema.get('type')
+        checks = {
+            'object': lambda v: isinstance(v, dict),
+            'array': lambda v: isinstance(v, list),
+            'string': lambda v: isinstance(v, str),
+            'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+            'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+            'boolean': lambda v: isinstance(v, bool)
+        }
+        if expected in checks and not checks[expected](value):
+            return f'{path} should be {expected}'
+
+        if 'enum' in schema and value not in schema['enum']:
+            return f'{path} should be one of {schema["enum"]}'
+
+        if expected == 'object':
+            for key in schema.get('required', []):
+                if key not in value:
+                    return f'{path}.{key} is missing'
+            for key, subschema in schema.get('properties', {}).items():
+                if key in value:
+                    error = self.validate(value[key], subschema, f'{path}.{key}')
+                    if error:
+                        return error
+
+        if expected == 'array' and 'items' in schema:
+            for index, item in enumerate(value):
+                error = self.validate(item, schema['items'], f'{path}[{index}]')
+                if error:
+                    return error
+
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get parse success/failure counters per call site"""
+        with self._lock:
+            per_site = {site: dict(counts) for site, counts in self._stats.items()}
+
+        for counts in per_site.values():
+            calls = counts.get('calls', 0)
+            counts['failure_rate'] = round(counts.get('failed', 0) / calls, 4) if calls else 0.0
+        return per_site
+
+    def _create(self, client, call_site: str, params: Dict[str, Any]) -> Tuple[str, Optional[int]]:
+        response = client.chat.completions.create(**params)
+        model_router_service.record_usage(call_site, params.get('model'), params.get('max_tokens'), response)
+        usage = getattr(response, 'usage', None)
+        return response.choices[0].message.content, getattr(usage, 'completion_tokens', None)
+
+    def _estimate_tokens(self, content: Optional[str]) -> int:
+        return int(math.ceil(len(content or '') / model_router_service.chars_per_token))
+
+    def _count(self, call_site: str, name: str, amount: int = 1):
+        with self._lock:
+            counts = self._stats.setdefault(call_site, {})
+            counts[name] = counts.get(name, 0) + amount
+
+
+# Service instance
+structured_output_service = StructuredOutputService()
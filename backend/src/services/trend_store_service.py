@@ -0,0 +1,285 @@
+import os
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+from sqlalchemy import func, and_
+from src.models.user import TrendObservation, db
+from src.services.database_service import database_service
+from src.services.hashtag_engine_service import hashtag_engine_service
+from src.services.sentiment_scraper_service import sentiment_scraper_service
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class TrendStoreService:
+    """Trending topics as a time series, filled in the background.
+
+    The ingest_trends Celery beat task pulls every source each
+    TREND_INGEST_INTERVAL, stores one TrendObservation per topic and source,
+    and precomputes content opportunities into the cache. Request handlers
+    only read: the latest run per source, plus velocity (score change per
+    hour) and acceleration (velocity change per hour) over completed
+    TREND_VELOCITY_WINDOW windows. Upstream API and LLM usage no longer
+    grows with traffic; without current data a read queues ingest_trends
+    (at most once per interval) and serves the last stored run.
+    """
+
+    OPPORTUNITIES_CACHE_KEY = 'trends:opportunities:{location}'
+    INGEST_QUEUED_KEY = 'trends:ingest_queued'
+
+    def __init__(self):
+        self.ingest_interval = int(os.getenv('TREND_INGEST_INTERVAL', '900'))  # seconds
+        self.locations = [
+            location.strip() for location in os.getenv('TREND_INGEST_LOCATIONS', 'worldwide').split(',')
+            if location.strip()
+        ] or ['worldwide']
+        self.retention_days = int(os.getenv('TREND_RETENTION_DAYS', '30'))
+        self.velocity_window = int(os.getenv('TREND_VELOCITY_WINDOW', '3600'))  # seconds
+        # Runs older than this are no longer current trends
+        self.max_age = int(os.getenv('TREND_MAX_AGE', str(self.ingest_interval * 4)))  # seconds
+
+    def topic_key(self, topic: str) -> str:
+        """Series key of a topic; spelling variants such as "#AITechnology" share one"""
+        return ' '.join(sentiment_scraper_service.topic_tokens(topic))[:200]
+
+    def ingest(self, location: str = 'worldwide') -> Dict[str, Any]:
+        """Fetch all sources once, store the observations and refresh opportunities"""
+        try:
+            trending_data = sentiment_scraper_service.fetch_trending_data('all', None, location)
+            observed_at = datetime.utcnow()
+
+            observations = [
+                observation
+                for source, trends in trending_data.items()
+                for observation in (self._observation(source, trend, location, observed_at) for trend in trends)
+                if observation is not None
+            ]
+            db.session.add_all(observations)
+            TrendObservation.query.filter(
+                TrendObservation.observed_at < observed_at - timedelta(days=self.retention_days)
+            ).delete(synchronize_session=False)
+            db.session.commit()
+
+            combined = sentiment_scraper_service.combine_trending_topics(trending_data)
+            hashtag_engine_service.record_trends(combined)
+            opportunities = sentiment_scraper_service.identify_content_opportunities(combined)
+            database_service.cache_set(
+                self.OPPORTUNITIES_CACHE_KEY.format(location=location),
+                {'opportunities': opportunities, 'updated_at': observed_at.isoformat()},
+                self.max_age
+            )
+
+            return {
+                'success': True,
+                'location': location,
+                'observations': len(observations),
+                'sources': {source: len(trends) for source, trends in trending_data.items()},
+                'opportunities': len(opportunities),
+                'observed_at': observed_at.isoformat()
+            }
+
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Trend ingestion for {location} failed: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def get_trending_topics(self, platform: str = 'all', category: str = None,
+                            location: str = 'worldwide', sort: str = 'score') -> Dict[str, Any]:
+        """Current trends from the store, with momentum"""
+        try:
+            location = location if location in self.locations else self.locations[0]
+
+            trending_data, observed_at = self.latest(location, platform, category)
+            stale = observed_at is None
+            if stale:
+                # No current data (beat not running); serve the last run while a worker ingests
+                self._queue_ingest()
+                trending_data, observed_at = self.latest(location, platform, category, self.retention_days * 86400)
+
+            combined = sentiment_scraper_service.combine_trending_topics(trending_data)
+            # A merged trend's series is the sum of its members' series
+            members = {
+                trend['topic']: {self.topic_key(topic) for topic in [trend['topic']] + trend.get('aliases', [])}
+                for trend in combined
+            }
+            scores = self.window_scores(set().union(*members.values()), location)
+            momentum = self.momentum({
+                topic: [sum(values) for values in zip(*(scores[key] for key in keys))]
+                for topic, keys in members.items()
+            })
+            for trend in combined:
+                trend.update(momentum[trend['topic']])
+            if sort == 'velocity':
+                combined.sort(key=lambda trend: (trend['velocity'], trend['acceleration']), reverse=True)
+
+            cached = database_service.cache_get(self.OPPORTUNITIES_CACHE_KEY.format(location=location)) or {}
+            topics = {trend['topic'] for trend in combined}
+            opportunities = [
+                opportunity for opportunity in cached.get('opportunities', [])
+                if opportunity.get('trending_topic') in topics
+            ]
+
+            return {
+                'success': True,
+                'platform': platform,
+                'category': category,
+                'location': location,
+                'trending_topics': combined,
+                'content_opportunities': opportunities,
+                'updated_at': observed_at.isoformat() if observed_at else None,
+                'stale': stale
+            }
+
+        except Exception as e:
+            logging.error(f"Trending topics read failed: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def latest(self, location: str, platform: str = 'all', category: str = None,
+               max_age: int = None) -> Tuple[Dict[str, List], Optional[datetime]]:
+        """Trends of the latest run per source within max_age, shaped like the scrapers' output"""
+        since = datetime.utcnow() - timedelta(seconds=max_age or self.max_age)
+        runs = db.session.query(
+            TrendObservation.source,
+            func.max(TrendObservation.observed_at).label('observed_at')
+        ).filter(
+            TrendObservation.location == location,
+            TrendObservation.observed_at >= since
+        ).group_by(TrendObservation.source).subquery()
+
+        observations = TrendObservation.query.join(runs, and_(
+            TrendObservation.source == runs.c.source,
+            TrendObservation.observed_at == runs.c.observed_at
+        )).filter(TrendObservation.location == location).order_by(TrendObservation.id).all()
+
+        trending_data = defaultdict(list)
+        for observation in observations:
+            if platform not in ('all', observation.source):
+                continue
+            if category and observation.category != category:
+                continue
+            trending_data[observation.source].append({
+                'name': observation.topic,
+                'score': observation.score,
+                'num_comments': observation.engagement,
+                'url': observation.url or '',
+                'category': observation.category
+            })
+
+        observed_at = max((observation.observed_at for observation in observations), default=None)
+        return dict(trending_data), observed_at
+
+    def window_scores(self, keys, location: str, window: int = None, windows: int = 3) -> Dict[str, List[float]]:
+        """Score per topic in each of the last `windows` completed windows, oldest first.
+
+        A window's score sums, over sources, the highest score each source
+        reported in it; a topic missing from a window scores 0 there. The
+        current window is left out: it has only seen part of its ingest runs.
+        """
+        window = window or self.velocity_window
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        last = self._last_completed(window)
+        since = EPOCH + timedelta(seconds=(last - windows + 1) * window)
+        until = EPOCH + timedelta(seconds=(last + 1) * window)
+        rows = db.session.query(
+            TrendObservation.topic_key, TrendObservation.source,
+            TrendObservation.score, TrendObservation.observed_at
+        ).filter(
+            TrendObservation.topic_key.in_(keys),
+            TrendObservation.location == location,
+            TrendObservation.observed_at >= since,
+            TrendObservation.observed_at < until
+        ).all()
+
+        peaks = defaultdict(dict)
+        for key, source, score, observed_at in rows:
+            index = int((observed_at - EPOCH).total_seconds() // window) - last + windows - 1
+            if 0 <= index < windows:
+                peaks[key][(index, source)] = max(peaks[key].get((index, source), 0.0), score or 0.0)
+
+        scores = {}
+        for key in keys:
+            series = [0.0] * windows
+            for (index, _), score in peaks.get(key, {}).items():
+                series[index] += score
+            scores[key] = series
+        return scores
+
+    def momentum(self, scores: Dict[str, List[float]], window: int = None) -> Dict[str, Dict[str, float]]:
+        """Velocity and acceleration per hour from the last three completed window scores"""
+        hours = (window or self.velocity_window) / 3600
+        momentum = {}
+        for key, series in scores.items():
+            series = ([0.0, 0.0] + list(series))[-3:]
+            velocity = (series[2] - series[1]) / hours
+            previous = (series[1] - series[0]) / hours
+            momentum[key] = {'velocity': round(velocity, 3), 'acceleration': round((velocity - previous) / hours, 3)}
+        return momentum
+
+    def get_series(self, topic: str, location: str = 'worldwide', window: int = None,
+                   windows: int = 24) -> Dict[str, Any]:
+        """A topic's score per window with its current momentum"""
+        window = window or self.velocity_window
+        location = location if location in self.locations else self.locations[0]
+        key = self.topic_key(topic)
+        series = self.window_scores([key], location, window, windows)[key]
+
+        last = self._last_completed(window)
+        return dict(
+            {
+                'topic': topic,
+                'location': location,
+                'window_seconds': window,
+                'series': [
+                    {'start': (EPOCH + timedelta(seconds=(last - windows + 1 + index) * window)).isoformat(),
+                     'score': score}
+                    for index, score in enumerate(series)
+                ]
+            },
+            **self.momentum({key: series}, window)[key]
+        )
+
+    def _last_completed(self, window: int) -> int:
+        """Index of the most recent window that has ended"""
+        return int((datetime.utcnow() - EPOCH).total_seconds() // window) - 1
+
+    def _queue_ingest(self):
+        """Queue ingest_trends, at most once per ingest interval across workers"""
+        if not database_service.redis_client:
+            logging.warning("Trend store has no current data and Redis is unavailable to queue an ingest")
+            return
+        try:
+            if database_service.redis_client.set(self.INGEST_QUEUED_KEY, '1', nx=True, ex=self.ingest_interval):
+                database_service.queue_task('src.tasks.ingest_trends')
+        except Exception as e:
+            logging.error(f"Queueing trend ingestion failed: {str(e)}")
+
+    def _observation(self, source: str, trend: Dict[str, Any], location: str,
+                     observed_at: datetime) -> Optional[TrendObservation]:
+        topic = (trend.get('name') or trend.get('title') or '').strip()
+        if not topic:
+            return None
+
+        category = trend.get('category')
+        if not category:
+            subreddit = (trend.get('subreddit') or '').lower()
+            category = subreddit if subreddit in sentiment_scraper_service.content_categories else 'general'
+
+        return TrendObservation(
+            topic_key=self.topic_key(topic),
+            topic=topic[:300],
+            source=source,
+            location=location,
+            category=category[:50],
+            score=float(trend.get('score', trend.get('interest', trend.get('tweet_volume'))) or 0),
+            engagement=float(trend.get('num_comments', trend.get('engagement')) or 0),
+            url=trend.get('url') or None,
+            observed_at=observed_at
+        )
+
+
+# Service instance
+trend_store_service = TrendStoreService()
@@ -0,0 +1,129 @@
+import os
+import hmac
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Any, Optional, Tuple
+from src.services.database_service import database_service
+from src.services.media_task_service import media_task_service
+
+
+class WebhookService:
+    """Signed callback ingestion for async media providers.
+
+    Callbacks carry an HMAC-SHA256 signature over "<timestamp>.<body>" with
+    the provider's webhook_secret from AdvancedMediaService.providers.
+    Deliveries are de-duplicated by event ID and applied through the task
+    state machine in MediaTaskService, so retries from the provider are safe.
+    """
+
+    SIGNATURE_HEADER = 'X-Webhook-Signature'
+    TIMESTAMP_HEADER = 'X-Webhook-Timestamp'
+    EVENT_ID_HEADER = 'X-Webhook-Id'
+
+    def __init__(self):
+        self.timestamp_tolerance = int(os.getenv('WEBHOOK_TIMESTAMP_TOLERANCE', '300'))  # seconds
+        self.event_ttl = int(os.getenv('WEBHOOK_EVENT_TTL', '86400'))  # seconds
+
+    def sign(self, secret: str, timestamp: str, body: bytes) -> str:
+        """Signature header value for a payload"""
+        digest = hmac.new(secret.encode('utf-8'), f"{timestamp}.".encode('utf-8') + body, hashlib.sha256)
+        return f"sha256={digest.hexdigest()}"
+
+    def signed_headers(self, secret: str, body: bytes, event_id: str = None) -> Dict[str, str]:
+        """Headers for sending a signed callback"""
+        timestamp = str(int(time.time()))
+        headers = {
+            'Content-Type': 'application/json',
+            self.TIMESTAMP_HEADER: timestamp,
+            self.SIGNATURE_HEADER: self.sign(secret, timestamp, body)
+        }
+        if event_id:
+            headers[self.EVENT_ID_HEADER] = event_id
+        return headers
+
+    def verify(self, secret: str, body: bytes, headers) -> Optional[str]:
+        """Check signature and timestamp; returns an error message or None"""
+        timestamp = headers.get(self.TIMESTAMP_HEADER, '')
+        signature = headers.get(self.SIGNATURE_HEADER, '')
+        if not timestamp or not signature:
+            return 'Missing signature'
+
+        try:
+            age = abs(time.time() - int(timestamp))
+        except ValueError:
+            return 'Invalid timestamp'
+        if age > self.timestamp_tolerance:
+            return 'Timestamp outside tolerance'
+
+        if not hmac.compare_digest(self.sign(secret, timestamp, body), signature):
+            return 'Invalid signature'
+        return None
+
+    def handle(self, provider: str, body: bytes, headers) -> Tuple[Dict[str, Any], int]:
+        """Verify and apply one callback; returns (response body, status code)"""
+        from src.services.advanced_media_service import advanced_media_service
+
+        # Only configured providers accept callbacks
+        config = advanced_media_service.providers.get(provider, {})
+        secret = config.get('webhook_secret')
+        if not secret or not config.get('api_key'):
+            return {'error': 'Unknown webhook provider'}, 404
+
+        error = self.verify(secret, body, headers)
+        if error:
+            logging.warning(f"Rejected {provider} webhook: {error}")
+            return {'error': error}, 401
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return {'error': 'Invalid JSON'}, 400
+
+        event = advanced_media_service.parse_webhook(provider, payload)
+        if not event['provider_task_id']:
+            return {'error': 'Missing task ID'}, 400
+
+        # Same delivery twice: acknowledge without touching the task
+        event_id = headers.get(self.EVENT_ID_HEADER) or hashlib.sha256(body).hexdigest()
+        event_key = f"webhook_event:{provider}:{event_id}"
+        if not self._claim_event(event_key):
+            return {'status': 'duplicate'}, 200
+
+        try:
+            result = media_task_service.apply_event(
+                provider, event['provider_task_id'], event['state'],
+                output_url=event['output_url'], error=event['error']
+            )
+        except Exception:
+            self._release_event(event_key)
+            raise
+
+        if result['outcome'] == 'unknown_task':
+            # Possibly delivered before the submit committed; let the provider retry
+            self._release_event(event_key)
+            return {'error': 'Unknown task'}, 404
+
+        return {'status': result['outcome'], 'task_id': result['task_id']}, 200
+
+    def _claim_event(self, key: str) -> bool:
+        if not database_service.redis_client:
+            # The task state machine still keeps redeliveries harmless
+            return True
+        try:
+            return bool(database_service.redis_client.set(key, '1', nx=True, ex=self.event_ttl))
+        except Exception as e:
+            logging.error(f"Webhook event de-duplication failed: {str(e)}")
+            return True
+
+    def _release_event(self, key: str):
+        if database_service.redis_client:
+            try:
+                database_service.redis_client.delete(key)
+            except Exception as e:
+                logging.error(f"Webhook event release failed: {str(e)}")
+
+
+# Service instance
+webhook_service = WebhookService()
@@ -0,0 +1,63 @@
+"""
+Celery tasks for the AI Social Media Creator backend.
+
+Start a worker pool (scaled independently of the web tier) with:
+
+    celery -A src.tasks:celery_app worker -Q generation --concurrency 4
+
+Trend ingestion runs on the beat schedule (one beat process per deployment):
+
+    celery -A src.tasks:celery_app beat
+    celery -A src.tasks:celery_app worker -Q trends --concurrency 1
+"""
+
+import logging
+from celery.signals import worker_process_init
+from src.services.database_service import database_service
+from src.services.generation_job_service import generation_job_service
+from src.services.openai_client_service import openai_client_service
+from src.services.trend_store_service import trend_store_service
+
+celery_app = database_service.celery_app
+
+
+@worker_process_init.connect
+def reset_clients_after_fork(**kwargs):
+    """Give each forked worker process its own OpenAI connection pool"""
+    openai_client_service.reset()
+
+
+def get_flask_app():
+    """Get the Flask app used for database access inside workers"""
+    from src.main import app
+    return app
+
+
+@celery_app.task(bind=True, name='src.tasks.run_generation_job', max_retries=None)
+def run_generation_job(self, job_id):
+    """Run a durable content generation job with exponential backoff retries"""
+    app = get_flask_app()
+
+    try:
+        return generation_job_service.execute(app, job_id)
+    except Exception as e:
+        logging.error(f"Generation job {job_id} attempt failed: {str(e)}")
+
+        if not generation_job_service.can_retry(app, job_id):
+            generation_job_service.mark_failed(app, job_id, e)
+            raise
+
+        countdown = generation_job_service.mark_retrying(app, job_id, e)
+        raise self.retry(exc=e, countdown=countdown)
+
+
+@celery_app.task(name='src.tasks.ingest_trends', ignore_result=True)
+def ingest_trends():
+    """Pull trending topics from every source into the trend store"""
+    app = get_flask_app()
+
+    results = {}
+    with app.app_context():
+        for location in trend_store_service.locations:
+            results[location] = trend_store_service.ingest(location)
+    return results
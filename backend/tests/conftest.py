@@ -0,0 +1,84 @@
+"""
+Test setup: every service runs against local stand-ins.
+
+Redis is fakeredis, Celery runs tasks eagerly on an in-memory broker,
+SQLite replaces PostgreSQL and media is stored under a temporary
+directory. Services read their configuration at import, so the
+environment is set before anything from src is imported.
+
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+
+import os
+import hashlib
+import tempfile
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='media-tests-')
+
+os.environ.update({
+    'OPENAI_API_KEY': 'test-key',
+    'REDIS_URL': 'fakeredis://',
+    'CELERY_BROKER_URL': 'memory://',
+    'CELERY_RESULT_BACKEND': 'cache+memory://',
+    'CELERY_TASK_ALWAYS_EAGER': 'true',
+    'MEDIA_STORAGE_PATH': MEDIA_ROOT,
+    'MEDIA_STORAGE_BACKEND': 'local',
+    'MEDIA_POLLER_IN_PROCESS': 'false',
+    'MEDIA_VARIANTS_ENABLED': 'false',
+    'MEDIA_FAKE_PROVIDER': 'true',
+    'FAKE_PROVIDER_WEBHOOK_SECRET': 'test-webhook-secret',
+    'SECRET_KEY': 'test-secret',
+})
+os.environ.pop('S3_BUCKET', None)
+
+import pytest
+from flask import Flask
+from src.models.user import db, User
+from src.services.database_service import database_service
+from src.services.download_service import download_service
+from src.services.fake_media_provider_service import fake_media_provider_service
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Flask app on a file-backed SQLite database (nested app contexts share it)"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = 'test-secret'
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+    database_service.redis_client.flushall()
+
+
+@pytest.fixture
+def user(app):
+    """A stored user"""
+    user = User(email='creator@example.com', first_name='Test', last_name='Creator', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    """Serve fake provider outputs instead of fetching them; records the URLs"""
+    urls = []
+
+    def download(url, file_path, headers=None):
+        urls.append(url)
+        data = fake_media_provider_service.render(url, size=64)
+        with open(file_path, 'wb') as f:
+            f.write(data)
+        return {'file_path': file_path, 'file_size': len(data), 'sha256': hashlib.sha256(data).hexdigest(),
+                'content_type': 'image/png', 'resumed': 0}
+
+    monkeypatch.setattr(download_service, 'download', download)
+    return urls
@@ -0,0 +1,116 @@
+import pytest
+import fakeredis
+import src.tasks as tasks
+import src.routes.content as content_routes
+from src.models.user import ContentProject, GenerationJob, db
+from src.services.database_service import database_service
+from src.services.generation_job_service import generation_job_service
+
+PARAMETERS = {'prompt': 'Launch post', 'platforms': ['instagram'], 'content_types': ['text']}
+
+
+@pytest.fixture
+def project(user):
+    project = ContentProject(user_id=user.id, title='Launch', original_prompt='Launch post',
+                             target_platforms=['instagram'])
+    db.session.add(project)
+    db.session.commit()
+    return project
+
+
+@pytest.fixture
+def generation(app, monkeypatch):
+    """Fake content generation: fails the first `failures` runs, records finish calls"""
+    state = {'failures': 0, 'runs': 0, 'finished': []}
+
+    def run_project_generation(app, project_id, *args):
+        state['runs'] += 1
+        return [('instagram', 'text')] if state['runs'] <= state['failures'] else []
+
+    def finish_project_generation(app, project_id, failed):
+        state['finished'].append(failed)
+
+    monkeypatch.setattr(tasks, 'get_flask_app', lambda: app)
+    monkeypatch.setattr(content_routes, 'run_project_generation', run_project_generation)
+    monkeypatch.setattr(content_routes, 'finish_project_generation', finish_project_generation)
+    monkeypatch.setattr(generation_job_service, 'max_attempts', 3)
+    return state
+
+
+def test_runs_against_local_stand_ins():
+    assert isinstance(database_service.redis_client, fakeredis.FakeRedis)
+    assert database_service.celery_app.conf.task_always_eager
+
+
+def test_submit_is_idempotent(app, user, project, generation):
+    job, created = generation_job_service.submit(app, project.id, user.id, 'generate', PARAMETERS, 'key-1')
+    again, created_again = generation_job_service.submit(app, project.id, user.id, 'generate', PARAMETERS, 'key-1')
+
+    assert created and not created_again
+    assert again.id == job.id
+    assert GenerationJob.query.count() == 1
+    assert generation['runs'] == 1
+    assert db.session.get(GenerationJob, job.id).status == 'succeeded'
+
+
+def test_request_losing_the_idempotency_race_keeps_no_project(app, generation, monkeypatch):
+    app.register_blueprint(content_routes.content_bp, url_prefix='/api/content')
+    client = app.test_client()
+    body = {'prompt': 'Launch post', 'platforms': ['instagram'], 'content_types': ['text']}
+    first = client.post('/api/content/generate', json=body, headers={'Idempotency-Key': 'key-race'})
+
+    # The second request checks the key before the first one commits
+    find = generation_job_service.find_by_idempotency_key
+    lookups = []
+
+    def find_after_commit(*args):
+        lookups.append(args)
+        return find(*args) if len(lookups) > 2 else None
+
+    monkeypatch.setattr(generation_job_service, 'find_by_idempotency_key', find_after_commit)
+    second = client.post('/api/content/generate', json=body, headers={'Idempotency-Key': 'key-race'})
+
+    assert first.status_code == 202
+    assert second.status_code == 200
+    assert second.get_json()['job_id'] == first.get_json()['job_id']
+    assert second.get_json()['project_id'] == first.get_json()['project_id']
+    assert len(lookups) == 3
+    assert ContentProject.query.count() == 1
+    assert GenerationJob.query.count() == 1
+
+
+def test_failed_attempts_are_retried(app, user, project, generation):
+    generation['failures'] = 2
+
+    job, _ = generation_job_service.submit(app, project.id, user.id, 'generate', PARAMETERS, 'key-2')
+
+    db.session.expire_all()
+    job = db.session.get(GenerationJob, job.id)
+    assert job.status == 'succeeded'
+    assert job.attempts == 3
+    assert job.last_error is None
+    assert generation['finished'] == [[]]
+
+
+def test_exhausted_job_is_marked_failed(app, user, project, generation):
+    generation['failures'] = 10
+
+    job, _ = generation_job_service.submit(app, project.id, user.id, 'generate', PARAMETERS, 'key-3')
+
+    db.session.expire_all()
+    job = db.session.get(GenerationJob, job.id)
+    assert job.status == 'failed'
+    assert job.attempts == 3
+    assert 'instagram/text' in job.last_error
+    assert job.finished_at is not None
+    assert generation['finished'] == [True]
+
+
+def test_retry_countdown_backs_off_within_bounds(monkeypatch):
+    monkeypatch.setattr(generation_job_service, 'retry_backoff_base', 10)
+    monkeypatch.setattr(generation_job_service, 'retry_backoff_max', 60)
+
+    for attempts, ceiling in ((1, 10), (2, 20), (3, 40), (4, 60), (10, 60)):
+        countdowns = {generation_job_service.retry_countdown(attempts) for _ in range(50)}
+        assert min(countdowns) >= 10
+        assert max(countdowns) <= ceiling
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+import pytest
+from src.services.llm_cache_service import llm_cache_service
+
+
+class FakeClient:
+    """Chat completions client that answers with a new text on every call"""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **params):
+        self.calls += 1
+        message = SimpleNamespace(content=f"answer {self.calls}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason='stop')], usage=None)
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setattr(llm_cache_service, 'enabled', True)
+    llm_cache_service._lru.clear()
+    return FakeClient()
+
+
+def complete(client, temperature, **kwargs):
+    return llm_cache_service.cached_completion(
+        client, call_site='test', ttl=60, model='gpt-test', temperature=temperature,
+        messages=[{'role': 'user', 'content': f"prompt at {temperature}"}], **kwargs
+    )
+
+
+def test_deterministic_calls_are_cached(client):
+    assert complete(client, 0) == complete(client, 0)
+    assert client.calls == 1
+
+
+def test_creative_calls_bypass_the_cache(client):
+    assert complete(client, 0.8) != complete(client, 0.8)
+    assert client.calls == 2
+
+
+def test_creative_calls_are_cached_when_the_caller_opts_in(client):
+    assert complete(client, 0.3, cache_creative=True) == complete(client, 0.3, cache_creative=True)
+    assert client.calls == 1
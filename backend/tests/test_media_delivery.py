@@ -0,0 +1,70 @@
+import os
+import pytest
+import src.routes.content as content_routes
+from src.models.user import ContentProject, db
+from src.routes.media import media_bp
+from src.services.fake_media_provider_service import fake_media_provider_service
+from src.services.media_delivery_service import media_delivery_service
+from src.services.storage_service import storage_service
+
+
+@pytest.fixture
+def accel(app, monkeypatch):
+    monkeypatch.setattr(media_delivery_service, 'accel_prefix', '/_media/')
+    path = os.path.join(storage_service.storage_base_path, 'accel.png')
+    with open(path, 'wb') as f:
+        f.write(b'png')
+    yield path
+    os.remove(path)
+
+
+def respond(app, path, download_name):
+    with app.test_request_context('/api/media/1'):
+        return media_delivery_service._respond(path, 'image/png', 'abc', None, download_name, 'private', 60)
+
+
+def test_accel_redirect_quotes_the_download_name(app, accel):
+    response = respond(app, accel, 'a"b;\r\nX-Injected: 1.png')
+
+    assert response.headers['X-Accel-Redirect'] == '/_media/accel.png'
+    assert response.headers['Content-Disposition'] == 'inline; filename="a\\"b;X-Injected: 1.png"'
+    assert 'X-Injected' not in response.headers
+
+
+def test_accel_redirect_adds_utf8_filename_for_non_ascii_names(app, accel):
+    response = respond(app, accel, 'café €.png')
+
+    assert response.headers['Content-Disposition'] == (
+        "inline; filename=\"cafe .png\"; filename*=UTF-8''caf%C3%A9%20%E2%82%AC.png"
+    )
+
+
+@pytest.fixture
+def client(app):
+    app.register_blueprint(content_routes.content_bp, url_prefix='/api/content')
+    app.register_blueprint(media_bp, url_prefix='/api')
+    return app.test_client()
+
+
+def test_generated_image_is_served_by_signed_url(app, user, downloads, client, monkeypatch):
+    monkeypatch.setattr(content_routes.ai_content_service, 'generate_image_prompt', lambda **kwargs: 'A lighthouse')
+    monkeypatch.setattr(content_routes.media_generation_service, 'generate_image',
+                        lambda **kwargs: {'image_url': 'https://images.example.com/lighthouse.png'})
+    project = ContentProject(user_id=user.id, title='Launch', original_prompt='Launch post',
+                             target_platforms=['instagram'])
+    db.session.add(project)
+    db.session.commit()
+
+    content = content_routes._build_generated_content(project.id, 'Launch post', 'instagram', 'image', None, None)
+    db.session.add(content)
+    db.session.commit()
+    stored_url = content.media_urls[0]
+
+    listed = client.get(f"/api/content/projects/{project.id}/content").get_json()
+    media_url = listed[0]['media_url']
+    image = client.get(media_url)
+
+    assert stored_url.startswith('/api/media/s/local/')
+    assert media_url.startswith('/api/media/s/local/')
+    assert image.status_code == 200
+    assert image.data == fake_media_provider_service.render('https://images.example.com/lighthouse.png', size=64)
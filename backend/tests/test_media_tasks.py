@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta
+from src.models.user import MediaFile, MediaGenerationTask, db
+from src.services.download_service import download_service
+from src.services.media_task_service import media_task_service
+
+
+def webhook_task(user, task_id='fake-1', output_url='http://provider.test/out.png'):
+    task = media_task_service.create_task('fake', task_id, 'image', user.id, {'prompt': 'a cat'}, delivery='webhook')
+    media_task_service.apply_event('fake', task_id, 'succeeded', output_url=output_url)
+    return task.id
+
+
+def claim(app):
+    claimed, _ = media_task_service._claim_due(app, 10)
+    return claimed
+
+
+def release_lease(task_id):
+    """Let the current lease run out"""
+    MediaGenerationTask.query.filter_by(id=task_id).update({'next_poll_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+
+def test_poller_whose_lease_ran_out_does_not_store_again(app, user, downloads):
+    task_id = webhook_task(user)
+
+    [first] = claim(app)
+    release_lease(task_id)
+    [second] = claim(app)
+
+    async def finish(snapshot):
+        await media_task_service._download_and_complete(asyncio.get_running_loop(), app, snapshot,
+                                                        snapshot['output_url'])
+
+    for snapshot in (second, first):
+        asyncio.run(finish(snapshot))
+
+    db.session.expire_all()
+    task = db.session.get(MediaGenerationTask, task_id)
+    assert task.status == 'succeeded'
+    assert MediaFile.query.count() == 1
+    assert len(downloads) == 1
+
+
+def test_download_lease_keeps_other_pollers_out(app, user):
+    task_id = webhook_task(user)
+
+    [snapshot] = claim(app)
+    lease = media_task_service._extend_lease(app, task_id, snapshot['lease'])
+
+    assert lease is not None
+    assert claim(app) == []
+    # The stale lease can't be extended twice
+    assert media_task_service._extend_lease(app, task_id, snapshot['lease']) is None
+
+
+def test_undownloadable_output_fails_once_expired(app, user, monkeypatch):
+    def download(url, file_path, headers=None):
+        raise RuntimeError('output gone')
+
+    monkeypatch.setattr(download_service, 'download', download)
+    task_id = webhook_task(user)
+
+    asyncio.run(media_task_service._poll_task(None, app, claim(app)[0]))
+    db.session.expire_all()
+    assert db.session.get(MediaGenerationTask, task_id).status == 'processing'
+
+    MediaGenerationTask.query.filter_by(id=task_id).update({'expires_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+    release_lease(task_id)
+    asyncio.run(media_task_service._poll_task(None, app, claim(app)[0]))
+
+    db.session.expire_all()
+    task = db.session.get(MediaGenerationTask, task_id)
+    assert task.status == 'failed'
+    assert task.last_error == 'Output could not be downloaded'
@@ -0,0 +1,62 @@
+import time
+import pytest
+from src.services.advanced_media_service import advanced_media_service
+
+# Seconds each fake provider takes
+DELAYS = {'openai': 0.5, 'stability': 0.0}
+
+
+@pytest.fixture
+def providers(app, monkeypatch):
+    started = []
+
+    def run_provider(app, provider, media_type, prompt, style, quality, user_id, should_stop):
+        started.append(provider)
+        finish_at = time.monotonic() + DELAYS[provider]
+        while time.monotonic() < finish_at:
+            if should_stop():
+                return {'success': False, 'provider': provider, 'error': 'Generation cancelled', 'cancelled': True}
+            time.sleep(0.01)
+        return {'success': True, 'provider': provider}
+
+    for provider in DELAYS:
+        monkeypatch.setitem(advanced_media_service.providers[provider], 'api_key', 'test')
+    monkeypatch.setattr(advanced_media_service, '_run_provider', run_provider)
+    return started
+
+
+def generate(**kwargs):
+    result = advanced_media_service.generate_media_multi_provider('A lighthouse', providers=list(DELAYS), **kwargs)
+    return {r['provider']: r for r in result['results']}
+
+
+def test_sequential_applies_each_provider_budget(providers):
+    results = generate(policy='sequential', provider_timeouts={'openai': 0.1})
+
+    assert results['openai'] == {'success': False, 'provider': 'openai',
+                                 'error': 'Provider timeout exceeded', 'timed_out': True}
+    assert results['stability']['success']
+
+
+def test_sequential_stops_at_the_deadline(providers):
+    results = generate(policy='sequential', deadline=0.1)
+
+    assert results['openai']['error'] == 'Deadline exceeded'
+    assert results['stability']['error'] == 'Deadline exceeded'
+    assert providers == ['openai']
+
+
+def test_first_success_cancels_the_rest(providers):
+    results = generate(policy='first_success')
+
+    assert results['stability']['success']
+    assert results['openai']['cancelled']
+    assert results['openai']['error'] == 'Cancelled after first success'
+
+
+def test_concurrent_run_reports_the_deadline(providers):
+    results = generate(policy='all_within_deadline', deadline=0.1)
+
+    assert results['openai']['timed_out']
+    assert results['openai']['error'] == 'Deadline exceeded'
+    assert results['stability']['success']
@@ -0,0 +1,24 @@
+import asyncio
+import os
+from src.services.openai_client_service import openai_client_service
+
+
+async def async_client():
+    first = openai_client_service.get_async_client()
+    await asyncio.sleep(0)
+    return first, openai_client_service.get_async_client()
+
+
+def test_async_client_is_shared_within_a_loop_only():
+    first, again = asyncio.run(async_client())
+    other, _ = asyncio.run(async_client())
+
+    assert first is again
+    assert other is not first
+
+
+def test_clients_are_rebuilt_after_a_fork(monkeypatch):
+    sync_client = openai_client_service.get_client()
+    monkeypatch.setattr(os, 'getpid', lambda: -1)
+
+    assert openai_client_service.get_client() is not sync_client
@@ -0,0 +1,53 @@
+from sqlalchemy import inspect, text
+from src.models.user import MediaFile, db
+from src.services.database_service import database_service
+
+# media_files as created before variants, dedup and blob storage
+LEGACY_MEDIA_FILES = """
+CREATE TABLE media_files (
+    id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL REFERENCES users (id),
+    filename VARCHAR(255) NOT NULL,
+    original_filename VARCHAR(255),
+    file_type VARCHAR(50) NOT NULL,
+    file_size BIGINT NOT NULL,
+    storage_path TEXT NOT NULL,
+    storage_provider VARCHAR(50) NOT NULL,
+    mime_type VARCHAR(100),
+    dimensions JSON,
+    duration INTEGER,
+    file_metadata JSON,
+    created_at DATETIME NOT NULL
+)
+"""
+
+
+def legacy_database(user):
+    db.session.execute(text('DROP TABLE media_generation_tasks'))
+    db.session.execute(text('DROP TABLE media_files'))
+    db.session.execute(text(LEGACY_MEDIA_FILES))
+    db.session.execute(text(
+        "INSERT INTO media_files (id, user_id, filename, file_type, file_size, storage_path, storage_provider, "
+        "created_at) VALUES ('old-1', :user_id, 'old.png', 'image', 10, '/srv/old.png', 'local', '2024-01-01')"
+    ), {'user_id': user.id})
+    db.session.commit()
+
+
+def test_adds_new_columns_to_existing_tables(app, user):
+    legacy_database(user)
+
+    statements = database_service.upgrade_schema()
+
+    columns = {column['name'] for column in inspect(db.engine).get_columns('media_files')}
+    assert {'content_hash', 'prompt_fingerprint', 'parent_id', 'variant_platform',
+            'variant_content_type', 'variant_format'} <= columns
+    assert 'media_generation_tasks' in inspect(db.engine).get_table_names()
+    assert any('unique_media_variant' in statement for statement in statements)
+
+    media_file = db.session.get(MediaFile, 'old-1')
+    assert media_file.parent_id is None
+    assert media_file.variants == []
+
+
+def test_current_schema_needs_no_statements(app):
+    assert database_service.upgrade_schema() == []
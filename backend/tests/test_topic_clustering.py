@@ -0,0 +1,36 @@
+import pytest
+from src.services.sentiment_scraper_service import sentiment_scraper_service
+
+
+def clustered(*topics):
+    return [[topics[index] for index in members] for members in sentiment_scraper_service.cluster_topics(list(topics))]
+
+
+def test_spelling_variants_are_merged():
+    assert clustered('AI Technology', '#AITechnology', 'ai tech', 'World Cup', '#worldcup', 'Covid 19', '#Covid19') == [
+        ['AI Technology', '#AITechnology', 'ai tech'],
+        ['World Cup', '#worldcup'],
+        ['Covid 19', '#Covid19'],
+    ]
+
+
+@pytest.mark.parametrize('first, second', [
+    ('Apple announces new iPhone', 'Apple announces new iPad'),
+    ('Apple stock falls', 'Apple stock rises'),
+    ('iPhone', 'iPad'),
+    ('eBay', 'Bay Area'),
+])
+def test_topics_differing_in_a_key_word_stay_apart(first, second):
+    assert clustered(first, second) == [[first], [second]]
+
+
+def test_topics_do_not_chain_through_a_shared_parent():
+    # Each is close to "World Cup", but not to each other
+    assert clustered('World Cup', 'World Cup final', 'World Cup draw') == [
+        ['World Cup', 'World Cup final'], ['World Cup draw']
+    ]
+
+
+def test_brand_words_are_not_split():
+    assert sentiment_scraper_service.topic_tokens('Apple announces new iPhone') == ['apple', 'announces', 'iphone']
+    assert sentiment_scraper_service.topic_tokens('#WWDC2024Keynote') == ['wwdc', '2024', 'keynote']
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import pytest
+from src.models.user import TrendObservation, db
+from src.services.database_service import database_service
+from src.services.sentiment_scraper_service import sentiment_scraper_service
+from src.services.trend_store_service import EPOCH, trend_store_service
+
+
+@pytest.fixture
+def queued(app, monkeypatch):
+    def fetch(*args, **kwargs):
+        raise AssertionError('requests must not ingest')
+
+    tasks = []
+    monkeypatch.setattr(sentiment_scraper_service, 'fetch_trending_data', fetch)
+    monkeypatch.setattr(database_service, 'queue_task', lambda name, *args, **kwargs: tasks.append(name))
+    return tasks
+
+
+def observe(topic, score, observed_at, source='reddit'):
+    db.session.add(TrendObservation(topic_key=trend_store_service.topic_key(topic), topic=topic, source=source,
+                                    location='worldwide', score=score, observed_at=observed_at))
+    db.session.commit()
+
+
+def window_start(offset):
+    """Start of the window `offset` windows from the current one"""
+    window = trend_store_service.velocity_window
+    current = int((datetime.utcnow() - EPOCH).total_seconds() // window)
+    return EPOCH + timedelta(seconds=(current + offset) * window)
+
+
+def test_momentum_ignores_the_partial_current_window(app):
+    for offset, score in ((-3, 10.0), (-2, 20.0), (-1, 30.0)):
+        observe('Python', score, window_start(offset) + timedelta(seconds=1))
+    # The current window has only seen its first run
+    observe('Python', 1.0, datetime.utcnow())
+
+    key = trend_store_service.topic_key('Python')
+    scores = trend_store_service.window_scores([key], 'worldwide')
+    hours = trend_store_service.velocity_window / 3600
+
+    assert scores[key] == [10.0, 20.0, 30.0]
+    assert trend_store_service.momentum(scores)[key] == {'velocity': round(10 / hours, 3), 'acceleration': 0.0}
+
+
+def test_empty_store_queues_one_ingest_instead_of_ingesting_inline(queued):
+    first = trend_store_service.get_trending_topics()
+    second = trend_store_service.get_trending_topics()
+
+    assert first['success'] and first['stale'] and first['trending_topics'] == []
+    assert second['success']
+    assert queued == ['src.tasks.ingest_trends']
+
+
+def test_stale_store_serves_the_last_run(queued):
+    observe('Python', 5.0, datetime.utcnow() - timedelta(seconds=trend_store_service.max_age + 60))
+
+    result = trend_store_service.get_trending_topics()
+
+    assert result['stale']
+    assert [trend['topic'] for trend in result['trending_topics']] == ['Python']
+    assert queued == ['src.tasks.ingest_trends']
+
+
+def test_current_store_does_not_queue(queued):
+    observe('Python', 5.0, datetime.utcnow())
+
+    result = trend_store_service.get_trending_topics()
+
+    assert not result['stale']
+    assert queued == []
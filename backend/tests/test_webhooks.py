@@ -0,0 +1,135 @@
+import json
+import time
+import asyncio
+import pytest
+from src.models.user import MediaFile, MediaGenerationTask, db
+from src.routes.webhooks import webhooks_bp
+from src.services.advanced_media_service import AdvancedMediaService, advanced_media_service
+from src.services.media_task_service import media_task_service
+from src.services.webhook_service import webhook_service
+from test_media_tasks import claim, release_lease
+
+SECRET = 'test-webhook-secret'
+
+
+@pytest.fixture
+def client(app):
+    app.register_blueprint(webhooks_bp, url_prefix='/api')
+    return app.test_client()
+
+
+def post(client, event, event_id=None, secret=SECRET, timestamp=None):
+    body = json.dumps(event).encode('utf-8')
+    headers = webhook_service.signed_headers(secret, body, event_id)
+    if timestamp is not None:
+        headers[webhook_service.TIMESTAMP_HEADER] = str(timestamp)
+        headers[webhook_service.SIGNATURE_HEADER] = webhook_service.sign(secret, str(timestamp), body)
+    return client.post('/api/webhooks/fake', data=body, headers=headers)
+
+
+def fake_task(user, task_id='fake-1', delivery='webhook'):
+    return media_task_service.create_task('fake', task_id, 'image', user.id, {'prompt': 'a cat'}, delivery=delivery).id
+
+
+def task_status(task_id):
+    db.session.expire_all()
+    return db.session.get(MediaGenerationTask, task_id)
+
+
+def test_rejects_bad_signature(client, user):
+    task_id = fake_task(user)
+
+    response = post(client, {'task_id': 'fake-1', 'status': 'failed'}, secret='guessed')
+
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Invalid signature'
+    assert task_status(task_id).status == 'pending'
+
+
+def test_rejects_timestamp_outside_window(client, user):
+    fake_task(user)
+    stale = int(time.time()) - webhook_service.timestamp_tolerance - 10
+
+    response = post(client, {'task_id': 'fake-1', 'status': 'processing'}, timestamp=stale)
+
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Timestamp outside tolerance'
+
+
+def test_duplicate_event_id_is_acknowledged_once(client, user):
+    task_id = fake_task(user)
+    event = {'task_id': 'fake-1', 'status': 'processing'}
+
+    first = post(client, event, event_id='evt-1')
+    second = post(client, event, event_id='evt-1')
+
+    assert first.get_json()['status'] == 'applied'
+    assert second.status_code == 200
+    assert second.get_json()['status'] == 'duplicate'
+    assert task_status(task_id).status == 'processing'
+
+
+def test_out_of_order_events_change_the_task_once(client, user):
+    task_id = fake_task(user)
+
+    succeeded = post(client, {'task_id': 'fake-1', 'status': 'succeeded', 'output_url': 'http://provider.test/1.png'})
+    late_processing = post(client, {'task_id': 'fake-1', 'status': 'processing'})
+    late_failure = post(client, {'task_id': 'fake-1', 'status': 'failed', 'error': 'late'})
+
+    assert succeeded.get_json()['status'] == 'applied'
+    assert late_processing.get_json()['status'] == 'duplicate'
+    assert late_failure.get_json()['status'] == 'duplicate'
+    task = task_status(task_id)
+    assert task.status == 'processing'
+    assert task.output_url == 'http://provider.test/1.png'
+    assert task.last_error is None
+
+
+def test_unknown_task_is_not_marked_seen(client, user):
+    event = {'task_id': 'fake-early', 'status': 'processing'}
+
+    early = post(client, event, event_id='evt-early')
+    task_id = fake_task(user, 'fake-early')
+    retried = post(client, event, event_id='evt-early')
+
+    assert early.status_code == 404
+    assert retried.get_json()['status'] == 'applied'
+    assert task_status(task_id).status == 'processing'
+
+
+def test_webhook_racing_the_poller_stores_once(app, client, user, downloads):
+    task_id = fake_task(user, delivery='poll')
+    release_lease(task_id)
+    [polled] = claim(app)
+
+    # The callback lands while the poller is still checking the provider
+    post(client, {'task_id': 'fake-1', 'status': 'succeeded', 'output_url': 'http://provider.test/1.png'})
+    [from_webhook] = claim(app)
+
+    async def finish(snapshot, output_url):
+        await media_task_service._download_and_complete(asyncio.get_running_loop(), app, snapshot, output_url)
+
+    asyncio.run(finish(polled, 'http://provider.test/polled.png'))
+    asyncio.run(finish(from_webhook, from_webhook['output_url']))
+
+    assert task_status(task_id).status == 'succeeded'
+    assert MediaFile.query.count() == 1
+    assert downloads == ['http://provider.test/1.png']
+
+
+def test_disabled_provider_has_no_webhook(client, monkeypatch):
+    monkeypatch.setitem(advanced_media_service.providers, 'fake',
+                        dict(advanced_media_service.providers['fake'], api_key=None))
+
+    response = post(client, {'task_id': 'fake-1', 'status': 'processing'})
+
+    assert response.status_code == 404
+
+
+def test_fake_provider_needs_an_explicit_secret(monkeypatch):
+    monkeypatch.delenv('FAKE_PROVIDER_WEBHOOK_SECRET')
+
+    fake = AdvancedMediaService().providers['fake']
+
+    assert fake['webhook_secret'] is None
+    assert fake['api_key'] is None
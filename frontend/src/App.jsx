@@ -550,10 +550,8 @@ function App() {
                             {content.media_url && (
                               <div className="mt-4">
                                 {(() => {
-                                  // Use backend URL directly as workaround for nginx proxy issues
-                                  const imageUrl = content.media_url.startsWith('/media/') 
-                                    ? `http://localhost:3088${content.media_url}` 
-                                    : content.media_url;
+                                  // Signed media URL; loads without an auth header
+                                  const imageUrl = apiService.mediaUrl(content.media_url);
                                   console.log('🖼️ Rendering image:', imageUrl);
                                   return (
                                     <img 
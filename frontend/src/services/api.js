@@ -49,6 +49,11 @@ class ApiService {
     }
   }
 
+  // Media URLs from the API (signed /api/media/s/... paths) resolved against the API host
+  mediaUrl(path) {
+    return path && path.startsWith('/api/') ? `${API_BASE_URL}${path.slice(4)}` : path;
+  }
+
   // Authentication methods
   async register(userData) {
     return this.request('/auth/register', {